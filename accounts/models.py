@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -12,5 +13,15 @@ class CustomUser(AbstractUser):
     first_name = models.CharField(max_length=30)
     last_name = models.CharField(max_length=30) 
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # picker prefix search (farm.autocomplete)
+            models.Index(Lower("username"), name="user_username_lower_idx"),
+            models.Index(Lower("first_name"), name="user_first_name_lower_idx"),
+            models.Index(Lower("last_name"), name="user_last_name_lower_idx"),
+            # keyset pagination of the user list (UserListView.cursor_ordering)
+            models.Index(fields=["date_joined", "id"], name="user_date_joined_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.username}"
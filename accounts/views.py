@@ -5,14 +5,17 @@ from django.views import generic
 from django.urls import reverse_lazy
 from .models import CustomUser as User
 
+from core.pagination import CursorPaginationMixin
 from .form import UserForm
 
 
-class UserListView(LoginRequiredMixin, generic.ListView):
+class UserListView(LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     model = User
     template_name = "users/index.html"
     context_object_name = "users"
     paginate_by = 25
+    cursor_ordering = ("-date_joined", "-id")
+    cursor_approximate_total = 1000
 
 class UserCreateView(LoginRequiredMixin, generic.CreateView):
     model = User
@@ -4,5 +4,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Each async request runs its queries in its own thread, and a persistent
+# connection would stay open per thread; use DB_POOL=1 to reuse connections
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,130 @@
+"""
+Async list and detail views, for serving under ASGI (core.asgi).
+
+An async view waits for the database on the event loop instead of holding a
+worker thread for the whole request, so one worker can keep many slow
+clients connected. Django's generic views are synchronous; the classes here
+keep their API (templates, context names, pagination, `get_queryset()`) but
+read rows with the async ORM:
+
+- `aprepare()` runs first and loads whatever the sync hooks would otherwise
+  query lazily: the user (`request.auser()`), and in farm views the user's
+  farm scope. After it, `get_queryset()` and `get_context_data()` must only
+  build querysets, never evaluate them.
+- List pages are read with `async for` / `acount()`, single objects with
+  `aget()`, and mixins may add `apaginate_queryset()` / `aget_context_data()`
+  steps through `super()`.
+
+Django renders a TemplateResponse in a thread after an async view returns,
+so templates may still follow relations; select_related keeps that to the
+page query. Under WSGI (runserver, the test client) Django runs these views
+through async_to_sync, unchanged.
+"""
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.views import generic
+
+
+async def alist(queryset):
+    """Evaluate `queryset` through the async ORM."""
+    return [obj async for obj in queryset]
+
+
+class AsyncViewMixin:
+    """Runs `aprepare()` before the (async) handler."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        await self.aprepare()
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def aprepare(self):
+        """Load what the sync hooks read from the database; extend through super()."""
+        # request.user is lazy and its first use queries the session
+        self.request.user = await self.request.auser()
+
+
+class AsyncListView(AsyncViewMixin, generic.ListView):
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        if not self.get_allow_empty() and not await self.object_list.aexists():
+            raise Http404(f"Empty list and “{type(self).__name__}.allow_empty” is False.")
+        context = await self.aget_context_data()
+        return self.render_to_response(context)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """MultipleObjectMixin.paginate_queryset(), counting and reading the page asynchronously."""
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        # Paginator only counts synchronously; seed its cached count
+        paginator.__dict__["count"] = await queryset.acount()
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page_number = int(page)
+        except ValueError:
+            if page != "last":
+                raise Http404("Page is not “last”, nor can it be converted to an int.")
+            page_number = paginator.num_pages
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise Http404(f"Invalid page ({page_number}): {exc}")
+        page.object_list = await alist(page.object_list)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    async def aget_context_data(self, **kwargs):
+        queryset = kwargs.pop("object_list", self.object_list)
+        page_size = self.get_paginate_by(queryset)
+        if page_size:
+            self.page_result = await self.apaginate_queryset(queryset, page_size)
+        else:
+            self.page_result = (None, None, await alist(queryset), False)
+        return self.get_context_data(**kwargs)
+
+    def get_context_data(self, **kwargs):
+        # MultipleObjectMixin.get_context_data() over the page aget_context_data() read
+        paginator, page, object_list, is_paginated = self.page_result
+        context = {
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": is_paginated,
+            "object_list": object_list,
+        }
+        context_object_name = self.get_context_object_name(self.object_list)
+        if context_object_name is not None:
+            context[context_object_name] = object_list
+        context.update(kwargs)
+        return super(generic.list.MultipleObjectMixin, self).get_context_data(**context)
+
+
+class AsyncDetailView(AsyncViewMixin, generic.DetailView):
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        context = await self.aget_context_data(object=self.object)
+        return self.render_to_response(context)
+
+    async def aget_object(self, queryset=None):
+        """SingleObjectMixin.get_object() through `aget()`."""
+        if queryset is None:
+            queryset = self.get_queryset()
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        slug = self.kwargs.get(self.slug_url_kwarg)
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        if slug is not None and (pk is None or self.query_pk_and_slug):
+            queryset = queryset.filter(**{self.get_slug_field(): slug})
+        if pk is None and slug is None:
+            raise AttributeError(
+                f"Generic detail view {type(self).__name__} must be called with either an object pk or a slug "
+                "in the URLconf."
+            )
+        try:
+            return await queryset.aget()
+        except queryset.model.DoesNotExist:
+            raise Http404(f"No {queryset.model._meta.verbose_name} found matching the query")
+
+    async def aget_context_data(self, **kwargs):
+        """Extend to load extra context asynchronously, then defer to get_context_data()."""
+        return self.get_context_data(**kwargs)
+
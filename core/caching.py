@@ -0,0 +1,54 @@
+"""
+Environment-driven cache settings (CACHES['default']).
+
+The dashboard counts, farm scopes, rendered pages and picker lookups are
+cached until a write retires them, and the write retires them only in the
+cache it can reach. They are therefore correct only when every process
+serving requests shares one cache. `CACHE_URL` selects it:
+
+- `redis://host:6379/0` (or `rediss://`): Django's Redis cache (needs the
+  `redis` package).
+- `memcached://host:11211`: pymemcache (needs `pymemcache`).
+- `db://table_name`: the database cache; create the table with
+  `manage.py createcachetable`.
+- unset, or `locmem://`: a per-process LocMemCache, fine for one process
+  (runserver, a single worker).
+
+`WEB_CONCURRENCY` (the worker count, as gunicorn and uvicorn read it)
+tells a per-process cache with several workers apart from a safe one; see
+is_shared().
+"""
+import os
+from urllib.parse import urlsplit
+
+LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def _int(env, name, default):
+    value = env.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def config(env=os.environ):
+    url = env.get("CACHE_URL", "")
+    scheme = urlsplit(url).scheme
+    if scheme in ("", "locmem"):
+        return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "nec-portal"}
+    if scheme in ("redis", "rediss"):
+        return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url}
+    if scheme == "memcached":
+        return {"BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache", "LOCATION": urlsplit(url).netloc}
+    if scheme == "db":
+        return {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": urlsplit(url).netloc}
+    raise ValueError(f"Unsupported CACHE_URL scheme {scheme!r}; use redis, memcached, db or locmem.")
+
+
+def is_shared(config, env=os.environ):
+    """
+    True when every process serving requests sees the same cache: a shared
+    backend, or a per-process one with a single worker.
+    """
+    return config["BACKEND"] not in LOCAL_BACKENDS or _int(env, "WEB_CONCURRENCY", 1) <= 1
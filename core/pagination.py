@@ -0,0 +1,237 @@
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """
+    A keyset page. Unlike Django's `Page` it knows nothing about page numbers or
+    the total row count; it only carries the tokens for its neighbours.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, approximate_total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_total = approximate_total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator: each page is `WHERE (key) < (last key seen) ORDER BY key LIMIT n`,
+    so page 1000 costs the same index range scan as page 1.
+
+    `ordering` must end in a unique column (normally the pk), e.g. ("-visit_date", "-id").
+    """
+
+    def __init__(self, queryset, per_page, ordering, approximate_total_cap=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.approximate_total_cap = approximate_total_cap
+        opts = queryset.model._meta
+        self.fields = [opts.get_field(name.lstrip('-')) for name in self.ordering]
+
+    # Tokens -----------------------------------------------------------------
+
+    def encode_cursor(self, obj, reverse=False):
+        values = [field.value_to_string(obj) for field in self.fields]
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = [field.to_python(v) for field, v in zip(self.fields, payload['v'], strict=True)]
+            return values, bool(payload.get('r'))
+        except Exception as exc:
+            raise InvalidCursor(token) from exc
+
+    # Query building ---------------------------------------------------------
+
+    def _seek(self, values, reverse):
+        """Build `(a, b) < (x, y)` as `a < x OR (a = x AND b < y)` honouring each column's direction."""
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            column = name.lstrip('-')
+            term = Q(**{f'{column}__{lookup}': values[i]})
+            for prior, value in zip(self.ordering[:i], values[:i]):
+                term &= Q(**{prior.lstrip('-'): value})
+            condition |= term
+        return condition
+
+    def _ordering(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering)
+
+    def approximate_count(self):
+        """Count at most `approximate_total_cap` + 1 rows; callers render "N+" past the cap."""
+        if not self.approximate_total_cap:
+            return None
+        return self._capped().count()
+
+    async def aapproximate_count(self):
+        if not self.approximate_total_cap:
+            return None
+        return await self._capped().acount()
+
+    def _capped(self):
+        return self.queryset.order_by()[:self.approximate_total_cap + 1]
+
+    def _page_queryset(self, token):
+        reverse = False
+        qs = self.queryset
+        if token:
+            values, reverse = self.decode_cursor(token)
+            qs = qs.filter(self._seek(values, reverse))
+        return qs.order_by(*self._ordering(reverse))[:self.per_page + 1], reverse
+
+    def _build_page(self, rows, token, reverse, total):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        # Walking forwards, having started from a token means a previous page
+        # exists; walking backwards the same holds for the next page.
+        if reverse:
+            has_next, has_previous = bool(token), has_more
+        else:
+            has_next, has_previous = has_more, bool(token)
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return CursorPage(rows, next_cursor, previous_cursor, total)
+
+    def page(self, token=None):
+        qs, reverse = self._page_queryset(token)
+        rows = list(qs)
+        total = self.approximate_count() if not token else None
+        return self._build_page(rows, token, reverse, total)
+
+    async def apage(self, token=None):
+        """page() through the async ORM."""
+        qs, reverse = self._page_queryset(token)
+        rows = [obj async for obj in qs]
+        total = await self.aapproximate_count() if not token else None
+        return self._build_page(rows, token, reverse, total)
+
+
+class CursorPaginationMixin:
+    """
+    Opt-in keyset pagination for `ListView`s.
+
+    Views opt in by declaring `cursor_ordering`; pages are then addressed by
+    `?cursor=<token>` instead of `?page=<n>`. A `?page=` request still goes through
+    Django's offset paginator so existing links keep working.
+    """
+    cursor_ordering = None
+    cursor_approximate_total = None
+
+    def use_cursor_pagination(self):
+        return bool(self.cursor_ordering) and self.page_kwarg not in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            page = self.get_cursor_paginator(queryset, page_size).page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        self.cursor_page = page
+        return (None, page, page.object_list, False)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """paginate_queryset() for async views (core.asyncviews)."""
+        if not self.use_cursor_pagination():
+            return await super().apaginate_queryset(queryset, page_size)
+        try:
+            page = await self.get_cursor_paginator(queryset, page_size).apage(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        self.cursor_page = page
+        return (None, page, page.object_list, False)
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(queryset, page_size, self.cursor_ordering, self.cursor_approximate_total)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        page = getattr(self, 'cursor_page', None)
+        if page is not None:
+            ctx.update({
+                'cursor_page': page,
+                'cursor_total_cap': self.cursor_approximate_total,
+            })
+        return ctx
+
+
+def estimated_count(model, using="default"):
+    """
+    The table's row count from the database's own bookkeeping, without a
+    COUNT(*) scan: PostgreSQL's planner statistics, or SQLite's highest
+    integer primary key. None when no estimate is available.
+    """
+    connection = connections[using]
+    opts = model._meta
+    table = connection.ops.quote_name(opts.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            # 0, or -1 on PostgreSQL 14+, until the table is first analysed
+            return row[0] if row and row[0] > 0 else None
+        if connection.vendor == "sqlite" and opts.pk.get_internal_type() in ("AutoField", "BigAutoField"):
+            cursor.execute(f"SELECT MAX({connection.ops.quote_name(opts.pk.column)}) FROM {table}")
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large unfiltered tables (admin changelists): the whole table
+    is counted from estimated_count() once it holds `estimate_threshold` rows
+    or more. Filtered querysets and smaller tables are counted exactly. Past
+    the real last page an estimate may yield an empty page.
+    """
+    estimate_threshold = 10_000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where and not qs.query.distinct and not qs.query.is_sliced:
+            estimate = estimated_count(qs.model, qs.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
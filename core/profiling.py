@@ -0,0 +1,221 @@
+"""
+Per-request performance instrumentation.
+
+`ProfilingMiddleware` measures, for every request that resolves to a named URL:
+wall time, number and total time of DB queries, template render time and
+response size. Identical SQL run repeatedly within one request (the usual N+1
+shape: one query per row of a list) is flagged as a duplicate.
+
+Each request is logged as a structured loguru record (`settings.LOGGER`, bound
+with `perf=<dict>`) and kept in an in-process rolling window per URL name, which
+the admin performance page reads to show p50/p95/p99. The window is per worker
+process and resets on restart; the log records are the durable trail.
+"""
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_WINDOW = 500
+DEFAULT_DUPLICATE_THRESHOLD = 5
+DEFAULT_SLOW_MS = 1000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class QueryRecorder:
+    """`connection.execute_wrapper` that counts and times queries by SQL text."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            # `sql` still has placeholders, so the same query for different
+            # rows counts as one statement.
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        return [
+            {"count": count, "sql": sql[:300]}
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+class RequestStats:
+    """Rolling window of recent request samples per URL name."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def add(self, view_name, sample):
+        with self.lock:
+            self.samples[view_name].append(sample)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def summary(self):
+        """One row per URL name with wall-time percentiles and averaged breakdowns."""
+        with self.lock:
+            snapshot = {name: list(samples) for name, samples in self.samples.items()}
+
+        rows = []
+        for name, samples in snapshot.items():
+            if not samples:
+                continue
+            n = len(samples)
+            walls = sorted(s["wall_ms"] for s in samples)
+            sizes = [s["size"] for s in samples if s["size"] is not None]
+            rows.append({
+                "view": name,
+                "samples": n,
+                "p50": percentile(walls, 50),
+                "p95": percentile(walls, 95),
+                "p99": percentile(walls, 99),
+                "max": walls[-1],
+                "queries": sum(s["queries"] for s in samples) / n,
+                "db_ms": sum(s["db_ms"] for s in samples) / n,
+                "template_ms": sum(s["template_ms"] for s in samples) / n,
+                "size_kb": sum(sizes) / len(sizes) / 1024 if sizes else None,
+                "duplicate_hits": sum(1 for s in samples if s["duplicates"]),
+            })
+        rows.sort(key=lambda row: row["p95"], reverse=True)
+        return rows
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+stats = RequestStats(_setting("PROFILING_WINDOW", DEFAULT_WINDOW))
+
+
+class ProfilingMiddleware:
+    """
+    Place first in MIDDLEWARE so the wall time covers the whole stack.
+    Disabled with `PROFILING_ENABLED = False`. Sync and async capable, so it
+    does not push async views back into a thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.enabled = _setting("PROFILING_ENABLED", True)
+        self.exclude_namespaces = set(_setting("PROFILING_EXCLUDE_NAMESPACES", ("admin",)))
+        self.duplicate_threshold = _setting("PROFILING_DUPLICATE_QUERY_THRESHOLD", DEFAULT_DUPLICATE_THRESHOLD)
+        self.slow_ms = _setting("PROFILING_SLOW_REQUEST_MS", DEFAULT_SLOW_MS)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._profiling_template_time = 0.0
+        start = time.perf_counter()
+        with self.recording(recorder):
+            response = self.get_response(request)
+        wall = time.perf_counter() - start
+
+        self.record(request, response, recorder, wall)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._profiling_template_time = 0.0
+        start = time.perf_counter()
+        # Connections are per thread, and the ORM (async query methods and
+        # sync code under the view) runs in sync_to_async's thread-sensitive
+        # thread, one per request under Django's ASGI handler. Install the
+        # wrappers on that thread's connections, not on the event loop's.
+        recording = await sync_to_async(self.recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+        wall = time.perf_counter() - start
+
+        self.record(request, response, recorder, wall)
+        return response
+
+    @staticmethod
+    def recording(recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def process_template_response(self, request, response):
+        # TemplateResponse renders after the view returns; time that step.
+        render = response.render
+
+        def timed_render():
+            start = time.perf_counter()
+            try:
+                return render()
+            finally:
+                request._profiling_template_time += time.perf_counter() - start
+
+        response.render = timed_render
+        return response
+
+    def record(self, request, response, recorder, wall):
+        match = getattr(request, "resolver_match", None)
+        if match is None or not match.url_name or self.exclude_namespaces & set(match.namespaces):
+            return
+
+        duplicates = recorder.duplicates(self.duplicate_threshold)
+        sample = {
+            "view": match.view_name,
+            "method": request.method,
+            "status": response.status_code,
+            "wall_ms": round(wall * 1000, 2),
+            "queries": recorder.count,
+            "db_ms": round(recorder.duration * 1000, 2),
+            "template_ms": round(request._profiling_template_time * 1000, 2),
+            "size": None if response.streaming else len(response.content),
+            "duplicates": duplicates,
+        }
+        stats.add(match.view_name, sample)
+
+        LOGGER = settings.LOGGER.bind(perf=sample)
+        if duplicates:
+            LOGGER.warning(
+                "{view} {method} {wall_ms}ms, {queries} queries: possible N+1, {dup}x {sql}",
+                dup=duplicates[0]["count"], sql=duplicates[0]["sql"][:120], **sample,
+            )
+        elif sample["wall_ms"] >= self.slow_ms:
+            LOGGER.warning("{view} {method} slow: {wall_ms}ms, {queries} queries in {db_ms}ms", **sample)
+        else:
+            LOGGER.debug("{view} {method} {wall_ms}ms, {queries} queries in {db_ms}ms", **sample)
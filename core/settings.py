@@ -3,6 +3,8 @@ import os
 from pathlib import Path
 import loguru
 
+from core import caching, database
+
 
 LOGGER = loguru.logger
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,9 +39,11 @@ INSTALLED_APPS = [
     'accounts',
     'dashboard',
     'farm',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,13 +89,68 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend" if DEBUG == Tru
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Configured from the environment (DATABASE_URL, DB_* and SQLITE_*), see core/database.py.
+# Without DATABASE_URL this is db.sqlite3 in WAL mode with a busy timeout.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database.config(BASE_DIR),
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Configured from the environment (CACHE_URL, WEB_CONCURRENCY), see core/caching.py.
+# Without CACHE_URL every process keeps its own LocMemCache.
+CACHES = {
+    'default': caching.config(),
+}
+
+# Whether every serving process sees the same cache. Caches that writes invalidate
+# (dashboard counts, farm scopes, rendered pages, picker lookups) are only used when it does.
+CACHE_SHARED = caching.is_shared(CACHES['default'])
+
+# Where background jobs (jobs app) write downloadable output such as CSV exports
+JOBS_OUTPUT_DIR = BASE_DIR / 'job_files'
+# Seconds between a running job's heartbeats; `run_jobs --requeue-stale` must allow several
+JOBS_HEARTBEAT_SECONDS = 60
+
+# Seconds the aggregated dashboard counts are cached per scope; writes invalidate earlier.
+DASHBOARD_STATS_CACHE_TIMEOUT = 300
+
+# Seconds a manager's farm-id set (farm.scoping) is cached; ownership changes invalidate earlier.
+# Not cached at all unless CACHE_SHARED.
+FARM_SCOPE_CACHE_TIMEOUT = 600
+
+# Rendered list/detail page bodies and list rows (farm.rendercache); model signals invalidate earlier.
+# Only cached when CACHE_SHARED.
+RENDER_CACHE_ENABLED = True
+RENDER_CACHE_TIMEOUT = 600
+
+# Form pickers (farm.autocomplete): choices per lookup, and seconds a lookup is cached per role and scope
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_CACHE_TIMEOUT = 300
+
+# Site-visit scheduling (farm.schedule): open visits an agent may have per day / week, longest timeline
+SCHEDULE_MAX_VISITS_PER_DAY = 4
+SCHEDULE_MAX_VISITS_PER_WEEK = 15
+SCHEDULE_MAX_DAYS = 366
+SCHEDULE_MAX_PROPOSALS = 1000  # visits per load-check request
+SCHEDULE_MAX_PROPOSAL_DAYS = 366  # days between the first and last visit of a load-check request
+
+# Compliance report (farm.compliance): months before the current one checked for missing employee returns
+COMPLIANCE_MONTHS = 60
+
+# Request profiling (core.profiling): timings per URL name, shown at /dashboard/performance/
+PROFILING_ENABLED = True
+PROFILING_WINDOW = 500  # samples kept per URL name
+PROFILING_DUPLICATE_QUERY_THRESHOLD = 5  # same SQL this often in one request = possible N+1
+PROFILING_SLOW_REQUEST_MS = 1000
+PROFILING_EXCLUDE_NAMESPACES = ('admin',)
+
+# Delta sync for offline clients (farm.sync, /api/v1/sync/)
+SYNC_PAGE_SIZE = 500  # rows per resource per response
+SYNC_SETTLE_SECONDS = 5  # the sync window ends this far behind the clock
+SYNC_TOMBSTONE_DAYS = 90  # older watermarks get a full re-download
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
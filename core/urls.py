@@ -3,11 +3,16 @@ from django.contrib import admin
 from django.views.generic import RedirectView
 from django.urls import include, path
 
+from core.views import service_worker
+
 urlpatterns = [
     path('', RedirectView.as_view(url='/auth/login/', permanent=False)),
+    path('service-worker.js', service_worker, name='service_worker'),
     path('optimus/', admin.site.urls),
     path('auth/', include('allauth.urls')),
     path('dashboard/', include('dashboard.urls')),
     path('farm/', include(('farm.urls', 'farm'), namespace='farm')),
     path('users/', include(('accounts.urls', 'user'), namespace='user')),
+    path('jobs/', include(('jobs.urls', 'jobs'), namespace='jobs')),
+    path('api/v1/', include(('farm.api_urls', 'api'), namespace='api-v1')),
 ]
@@ -0,0 +1,25 @@
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import Http404, HttpResponse
+
+
+def service_worker(request):
+    """
+    Serve static/service-worker.js from the site root. A worker's scope is
+    limited to the path it is served from, so under /static/ it could not
+    handle page navigations or offline form posts.
+    """
+    path = finders.find("service-worker.js")
+    try:
+        if path:
+            with open(path, "rb") as fh:
+                content = fh.read()
+        else:
+            with staticfiles_storage.open("service-worker.js") as fh:
+                content = fh.read()
+    except FileNotFoundError:
+        raise Http404("No service worker.")
+    response = HttpResponse(content, content_type="application/javascript")
+    response["Cache-Control"] = "no-cache"
+    response["Service-Worker-Allowed"] = "/"
+    return response
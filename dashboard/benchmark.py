@@ -0,0 +1,196 @@
+"""
+Benchmarks of the portal's hot pages (`manage.py benchmark`).
+
+Each scenario is one GET, issued through the test client as a real user so
+that middleware, role scoping and template rendering all count. For every
+scenario the runner records wall-clock latency over several repeats, the
+number of SQL queries and the peak Python memory allocated while serving
+the request (tracemalloc, measured in a separate pass so it does not skew
+the timings). Results are plain JSON; `compare()` diffs two result files so
+runs on different commits can be checked for regressions.
+"""
+import datetime
+import html
+import json
+import re
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.profiling import percentile
+from farm.models import Farm, FarmEmployeeStats, Notice, SiteVisit, Statement
+
+NEXT_LINK_RE = re.compile(r'href="([^"]*)"\s+aria-label="Next"')
+# Pages read by the list scenarios, with the model their detail scenario samples
+LISTS = {
+    "farms": ("farm:farm_list", "farm:farm_detail", Farm),
+    "sitevisits": ("farm:sitevisit_list", "farm:sitevisit_detail", SiteVisit),
+    "statements": ("farm:statement_list", "farm:statement_detail", Statement),
+    "employee_stats": ("farm:farmemployeestats_list", "farm:farmemployeestats_detail", FarmEmployeeStats),
+    "notices": ("farm:notice_list", "farm:notice_detail", Notice),
+}
+EXPORTS = ("farms", "sitevisits", "statements", "employee_stats")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Runner:
+    def __init__(self, user, repeat=5, depth=50, memory=True):
+        self.user = user
+        self.repeat = repeat
+        self.depth = depth
+        self.memory = memory
+        self.client = Client(HTTP_HOST=self.host())
+        self.client.force_login(user)
+
+    @staticmethod
+    def host():
+        # With DEBUG and no ALLOWED_HOSTS Django accepts localhost
+        return next((host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"), "localhost")
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        if response.streaming:
+            body = b"".join(response.streaming_content)
+        else:
+            body = response.content
+        return response, body
+
+    def measure(self, name, url):
+        self.fetch(url)  # warm caches and connections
+        timings, queries = [], []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response, body = self.fetch(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+
+        peak = None
+        if self.memory:
+            tracemalloc.start()
+            self.fetch(url)
+            peak = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            "name": name,
+            "url": url,
+            "status": response.status_code,
+            "bytes": len(body),
+            "latency_ms": {
+                "min": round(timings[0], 2),
+                "median": round(statistics.median(timings), 2),
+                "p95": round(percentile(timings, 95), 2),
+                "max": round(timings[-1], 2),
+            },
+            "queries": max(queries),
+            "peak_kib": peak,
+        }
+
+    def deep_cursor_url(self, url):
+        """Follow the list's Next links `depth` pages in; None if the list is shorter."""
+        path = url
+        for _ in range(self.depth):
+            _, body = self.fetch(url)
+            match = NEXT_LINK_RE.search(body.decode())
+            if match is None:
+                return None
+            href = html.unescape(match.group(1))
+            url = path + href if href.startswith("?") else href
+        return url
+
+    def scenarios(self):
+        yield "dashboard", reverse("dashboard")
+        for name, (list_name, detail_name, model) in LISTS.items():
+            url = reverse(list_name)
+            yield f"{name}/list", url
+            deep = self.deep_cursor_url(url)
+            if deep:
+                yield f"{name}/list-deep", deep
+                yield f"{name}/list-deep-offset", f"{url}?page={self.depth + 1}"
+            pk = model.objects.for_user(self.user).order_by("-pk").values_list("pk", flat=True).first()
+            if pk is not None:
+                yield f"{name}/detail", reverse(detail_name, args=[pk])
+            if name in EXPORTS:
+                yield f"{name}/export", f"{url}?export=csv"
+
+    def run(self, only=None):
+        results = []
+        for name, url in self.scenarios():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            results.append(self.measure(name, url))
+        return results
+
+
+def dataset():
+    return {model._meta.model_name: model.objects.count()
+            for model in (Farm, SiteVisit, Statement, FarmEmployeeStats, Notice)}
+
+
+def run(users, repeat=5, depth=50, memory=True, only=None):
+    """Benchmark every scenario as each of `users`; returns the JSON-ready report."""
+    report = {
+        "commit": git_revision(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "dataset": dataset(),
+        "repeat": repeat,
+        "depth": depth,
+        "results": [],
+    }
+    for user in users:
+        for result in Runner(user, repeat, depth, memory).run(only):
+            result["user"] = user.username
+            result["role"] = user.role
+            report["results"].append(result)
+    return report
+
+
+def compare(baseline, current, threshold=20.0):
+    """
+    Rows of (key, metric, before, after, change %, regressed) for scenarios in
+    both reports. Latency regresses when the median grows by more than
+    `threshold` percent; more queries or a different status code always regress.
+    """
+    before = {(r["user"], r["name"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = (result["user"], result["name"])
+        old = before.get(key)
+        if old is None:
+            continue
+        label = f"{result['user']}:{result['name']}"
+        old_ms, new_ms = old["latency_ms"]["median"], result["latency_ms"]["median"]
+        change = (new_ms - old_ms) / old_ms * 100 if old_ms else 0.0
+        rows.append((label, "median_ms", old_ms, new_ms, round(change, 1), change > threshold))
+        if old["queries"] != result["queries"]:
+            rows.append((label, "queries", old["queries"], result["queries"], None,
+                         result["queries"] > old["queries"]))
+        if old["status"] != result["status"]:
+            rows.append((label, "status", old["status"], result["status"], None, True))
+    return rows
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
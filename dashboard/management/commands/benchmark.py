@@ -0,0 +1,75 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import benchmark
+from farm.datagen import PREFIX
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency, query counts and peak memory of the dashboard, list pages (first and deep "
+        "pages), detail pages and CSV exports, and write the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", action="append", dest="users", metavar="USERNAME",
+            help=f"Benchmark as this user (repeatable). Default: {PREFIX}admin-0 and {PREFIX}manager-0 "
+                 "from generate_data.",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Timed requests per scenario.")
+        parser.add_argument("--depth", type=int, default=50, help="How many pages in the deep-page scenarios read.")
+        parser.add_argument("--only", action="append", metavar="PREFIX",
+                            help="Only run scenarios whose name starts with this, e.g. 'sitevisits/' (repeatable).")
+        parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass.")
+        parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout).")
+        parser.add_argument("--compare", metavar="BASELINE", help="Compare against an earlier JSON report.")
+        parser.add_argument("--threshold", type=float, default=20.0,
+                            help="Median latency increase (percent) reported as a regression.")
+        parser.add_argument("--fail-on-regression", action="store_true",
+                            help="Exit with an error when --compare finds a regression.")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1 or options["depth"] < 1:
+            raise CommandError("--repeat and --depth must be at least 1.")
+        User = get_user_model()
+        usernames = options["users"] or [f"{PREFIX}admin-0", f"{PREFIX}manager-0"]
+        users = list(User.objects.filter(username__in=usernames))
+        missing = set(usernames) - {user.username for user in users}
+        if missing:
+            raise CommandError(
+                f"Unknown users: {', '.join(sorted(missing))}. Run generate_data or pass --user."
+            )
+        users.sort(key=lambda user: usernames.index(user.username))
+
+        report = benchmark.run(
+            users, repeat=options["repeat"], depth=options["depth"],
+            memory=not options["no_memory"], only=options["only"],
+        )
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload + "\n")
+            self.stderr.write(f"Wrote {len(report['results'])} results to {options['output']}.")
+        else:
+            self.stdout.write(payload)
+
+        if options["compare"]:
+            self.report_comparison(benchmark.load(options["compare"]), report, options)
+
+    def report_comparison(self, baseline, report, options):
+        rows = benchmark.compare(baseline, report, options["threshold"])
+        regressions = [row for row in rows if row[-1]]
+        out = self.stderr
+        out.write(f"Compared with {baseline.get('commit') or options['compare']}:")
+        for label, metric, before, after, change, regressed in rows:
+            if not regressed and metric == "median_ms" and abs(change) <= options["threshold"]:
+                continue
+            suffix = f" ({change:+.1f}%)" if change is not None else ""
+            line = f"  {label} {metric}: {before} -> {after}{suffix}"
+            out.write(self.style.ERROR(line) if regressed else self.style.SUCCESS(line))
+        out.write(f"{len(regressions)} regression(s) across {len(rows)} compared metrics.")
+        if regressions and options["fail_on_regression"]:
+            raise CommandError("Benchmark regressions found.")
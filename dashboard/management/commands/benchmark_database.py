@@ -0,0 +1,189 @@
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from core import database
+from core.profiling import percentile
+
+TABLE = "bench_dbload"
+DDL = {
+    "sqlite": f"CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, worker INTEGER NOT NULL, "
+              "payload TEXT NOT NULL, created REAL NOT NULL)",
+    "postgresql": f"CREATE TABLE {TABLE} (id BIGSERIAL PRIMARY KEY, worker INTEGER NOT NULL, "
+                  "payload TEXT NOT NULL, created DOUBLE PRECISION NOT NULL)",
+}
+PAYLOAD = "x" * 200
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare database throughput under concurrent, request-shaped load: each operation is one "
+        "simulated request (a read, or a write in a transaction) followed by the connection handling "
+        "Django does when a request finishes. SQLite compares Django's defaults with the tuned profile "
+        "(core.database) on scratch files; PostgreSQL compares a connection per request, persistent "
+        "connections and, when psycopg_pool is installed, the connection pool, on the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent workers.")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Run time per profile.")
+        parser.add_argument("--write-ratio", type=float, default=0.3, help="Share of operations that write.")
+        parser.add_argument("--output", "-o", help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["seconds"] <= 0 or not 0 <= options["write_ratio"] <= 1:
+            raise CommandError("--threads must be >= 1, --seconds > 0 and --write-ratio within 0..1.")
+
+        vendor = connections["default"].vendor
+        if vendor == "sqlite":
+            with tempfile.TemporaryDirectory() as tmp:
+                profiles = {
+                    "sqlite-default": database.sqlite_config(Path(tmp) / "default.db", tuned=False),
+                    "sqlite-tuned": database.sqlite_config(Path(tmp) / "tuned.db"),
+                }
+                results = self.run_profiles(profiles, options)
+        elif vendor == "postgresql":
+            base = {**connections.settings["default"], "OPTIONS": dict(connections.settings["default"]["OPTIONS"])}
+            base["OPTIONS"].pop("pool", None)
+            profiles = {
+                "postgres-per-request": {**base, "CONN_MAX_AGE": 0},
+                "postgres-persistent": {**base, "CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+            }
+            try:
+                import psycopg_pool  # noqa: F401
+            except ImportError:
+                self.stderr.write("psycopg_pool is not installed; skipping the pooled profile.")
+            else:
+                pooled = {**base, "CONN_MAX_AGE": 0, "OPTIONS": {**base["OPTIONS"], "pool": {
+                    "min_size": options["threads"], "max_size": options["threads"]}}}
+                profiles["postgres-pool"] = pooled
+            results = self.run_profiles(profiles, options)
+        else:
+            raise CommandError(f"No benchmark profiles for the {vendor} backend.")
+
+        self.report(results)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump({"vendor": vendor, "threads": options["threads"], "seconds": options["seconds"],
+                           "write_ratio": options["write_ratio"], "results": results}, fh, indent=2)
+                fh.write("\n")
+
+    # Running -------------------------------------------------------------------
+
+    def run_profiles(self, profiles, options):
+        results = []
+        for name, settings_dict in profiles.items():
+            alias = f"bench_{name.replace('-', '_')}"
+            configured = connections.configure_settings(
+                {"default": connections.settings["default"], alias: dict(settings_dict)}
+            )
+            connections.settings[alias] = configured[alias]
+            try:
+                self.setup_table(alias)
+                results.append({"profile": name, **self.run_load(alias, options)})
+            finally:
+                self.drop_table(alias)
+                connection = connections[alias]
+                connection.close()
+                if hasattr(connection, "close_pool"):
+                    connection.close_pool()
+                connections.settings.pop(alias, None)
+        return results
+
+    def setup_table(self, alias):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            cursor.execute(DDL[connection.vendor])
+            cursor.execute(f"CREATE INDEX {TABLE}_worker ON {TABLE} (worker, id)")
+
+    def drop_table(self, alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+    def operation(self, alias, worker, write):
+        """One simulated request."""
+        connection = connections[alias]
+        if write:
+            with transaction.atomic(using=alias), connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {TABLE} (worker, payload, created) VALUES (%s, %s, %s)",
+                               [worker, PAYLOAD, time.time()])
+                cursor.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE worker = %s", [worker])
+                cursor.fetchone()
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT id, payload FROM {TABLE} WHERE worker = %s ORDER BY id DESC LIMIT 20",
+                               [worker])
+                cursor.fetchall()
+
+    def run_load(self, alias, options):
+        deadline = time.perf_counter() + options["seconds"]
+        lock = threading.Lock()
+        latencies, counts = [], {"ops": 0, "writes": 0, "errors": 0}
+
+        def worker(number):
+            rng = random.Random(number)
+            mine, done, writes, errors = [], 0, 0, 0
+            try:
+                while time.perf_counter() < deadline:
+                    write = rng.random() < options["write_ratio"]
+                    start = time.perf_counter()
+                    try:
+                        self.operation(alias, number, write)
+                    except OperationalError:
+                        # e.g. "database is locked"
+                        errors += 1
+                    else:
+                        done += 1
+                        writes += write
+                        mine.append((time.perf_counter() - start) * 1000)
+                    # What request_finished does: drop the connection unless it may persist
+                    connections[alias].close_if_unusable_or_obsolete()
+            finally:
+                connections[alias].close()
+            with lock:
+                latencies.extend(mine)
+                counts["ops"] += done
+                counts["writes"] += writes
+                counts["errors"] += errors
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            **counts,
+            "ops_per_second": round(counts["ops"] / elapsed, 1),
+            "latency_ms": {
+                "median": round(statistics.median(latencies), 2) if latencies else None,
+                "p95": round(percentile(latencies, 95), 2) if latencies else None,
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+        }
+
+    def report(self, results):
+        self.stdout.write(f"{'profile':<24}{'ops/s':>10}{'ops':>9}{'writes':>9}{'errors':>9}"
+                          f"{'p50 ms':>10}{'p95 ms':>10}")
+        for row in results:
+            latency = row["latency_ms"]
+            self.stdout.write(
+                f"{row['profile']:<24}{row['ops_per_second']:>10}{row['ops']:>9}{row['writes']:>9}"
+                f"{row['errors']:>9}{latency['median'] or '-':>10}{latency['p95'] or '-':>10}"
+            )
+        if len(results) > 1 and results[0]["ops_per_second"]:
+            best = max(results, key=lambda row: row["ops_per_second"])
+            ratio = best["ops_per_second"] / results[0]["ops_per_second"]
+            self.stdout.write(self.style.SUCCESS(f"{best['profile']}: {ratio:.1f}x the throughput of "
+                                                 f"{results[0]['profile']}."))
@@ -0,0 +1,131 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Func
+
+from farm.models import Farm, SiteVisit, Statement, FarmEmployeeStats
+
+
+STATS_CACHE_PREFIX = "dashboard:stats"
+STATS_VERSION_KEY = f"{STATS_CACHE_PREFIX}:version"
+STATS_FIELDS = ('users', 'farms', 'sitevisits', 'statements', 'employee_stats')
+
+
+def get_scope(user):
+    """
+    Return the farm-owner id the dashboard is scoped to, or None for "all farms".
+    Managers only see farms they own; everyone else sees the whole portfolio.
+    """
+    if getattr(user, 'role', None) == 'Manager':
+        return user.pk
+    return None
+
+
+def _stats_querysets(owner_id=None):
+    """The querysets counted for each dashboard counter."""
+    User = get_user_model()
+    farms = Farm.objects.all()
+    visits = SiteVisit.objects.all()
+    statements = Statement.objects.all()
+    employee_stats = FarmEmployeeStats.objects.all()
+
+    if owner_id is not None:
+        farms = farms.filter(owner_id=owner_id)
+        visits = visits.filter(farm__owner_id=owner_id)
+        statements = statements.filter(farm__owner_id=owner_id)
+        employee_stats = employee_stats.filter(farm__owner_id=owner_id)
+
+    return {
+        'users': User.objects.all(),
+        'farms': farms,
+        'sitevisits': visits,
+        'statements': statements,
+        'employee_stats': employee_stats,
+    }
+
+
+def _stats_sql(owner_id=None):
+    """`SELECT (SELECT COUNT(*) ...) AS users, ...`: one row of independent scalar subqueries."""
+    columns, params = [], []
+    for name, qs in _stats_querysets(owner_id).items():
+        sql, qs_params = qs.order_by().annotate(n=Func(F('pk'), function='COUNT')).values('n').query.sql_with_params()
+        columns.append(f"({sql}) AS {connection.ops.quote_name(name)}")
+        params.extend(qs_params)
+    return f"SELECT {', '.join(columns)}", params
+
+
+def compute_stats(owner_id=None):
+    """
+    Compute every dashboard counter for a scope in a single query.
+
+    The counts are scalar subqueries of a FROM-less select, so each one is
+    evaluated on its own and an empty table only zeroes its own count.
+    """
+    sql, params = _stats_sql(owner_id)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return {name: value or 0 for name, value in zip(STATS_FIELDS, row)}
+
+
+async def acompute_stats(owner_id=None):
+    return await sync_to_async(compute_stats)(owner_id)
+
+
+def _new_version():
+    # Seed from the clock so a lost version key never resurrects stale entries.
+    return int(time.time())
+
+
+def _cache_key(owner_id, version=None):
+    # The version is bumped on every relevant write, which retires the keys of
+    # every scope at once without having to know which owners were affected.
+    if version is None:
+        version = cache.get_or_set(STATS_VERSION_KEY, _new_version, None)
+    scope = 'all' if owner_id is None else f'owner:{owner_id}'
+    return f"{STATS_CACHE_PREFIX}:{version}:{scope}"
+
+
+def _timeout():
+    return getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 300)
+
+
+def get_stats(user):
+    """
+    Return the dashboard counts for the given user's scope, cached when every
+    process shares the cache (settings.CACHE_SHARED).
+    """
+    owner_id = get_scope(user)
+    if not settings.CACHE_SHARED:
+        return compute_stats(owner_id)
+    key = _cache_key(owner_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(owner_id)
+        cache.set(key, stats, _timeout())
+    return stats
+
+
+async def aget_stats(user):
+    """get_stats() through the async cache and ORM."""
+    owner_id = get_scope(user)
+    if not settings.CACHE_SHARED:
+        return await acompute_stats(owner_id)
+    key = _cache_key(owner_id, await cache.aget_or_set(STATS_VERSION_KEY, _new_version, None))
+    stats = await cache.aget(key)
+    if stats is None:
+        stats = await acompute_stats(owner_id)
+        await cache.aset(key, stats, _timeout())
+    return stats
+
+
+def invalidate_stats(**kwargs):
+    """Signal receiver: retire every cached scope after a relevant write."""
+    try:
+        cache.incr(STATS_VERSION_KEY)
+    except ValueError:
+        cache.set(STATS_VERSION_KEY, _new_version(), None)
@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+
+from farm.models import Farm, SiteVisit, Statement, FarmEmployeeStats
+from farm.signals import bulk_changed
+from dashboard.services import invalidate_stats
+
+
+def connect():
+    """Invalidate cached dashboard counts whenever a counted row changes."""
+    for model in (get_user_model(), Farm, SiteVisit, Statement, FarmEmployeeStats):
+        uid = f"dashboard-stats-{model._meta.label_lower}"
+        post_save.connect(invalidate_stats, sender=model, dispatch_uid=f"{uid}-save")
+        post_delete.connect(invalidate_stats, sender=model, dispatch_uid=f"{uid}-delete")
+        bulk_changed.connect(invalidate_stats, sender=model, dispatch_uid=f"{uid}-bulk")
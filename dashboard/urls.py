@@ -1,9 +1,10 @@
 from django.urls import path
-from dashboard.views import DashboardView
+from dashboard.views import DashboardView, PerformanceView
 
 
 urlpatterns = [
     path('', DashboardView.as_view(), name='dashboard'),
+    path('performance/', PerformanceView.as_view(), name='performance'),
 #    path('admin-dash', AdminDashboardView.as_view(), name='admin_dashboard'),
 
 ]
\ No newline at end of file
@@ -1,17 +1,22 @@
+import asyncio
 from datetime import datetime
 from typing import Any
-from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
-from django.shortcuts import reverse
+from django.shortcuts import redirect, reverse
+from django.core.exceptions import PermissionDenied
 
 # import models used to build dashboard stats
-from farm.models import Farm, SiteVisit, Notice, Statement, FarmEmployeeStats
+from farm.models import Farm, SiteVisit, Notice, Statement
+from farm import ledger, scoping
+from dashboard.services import aget_stats, get_scope
+from core import profiling
+from core.asyncviews import AsyncViewMixin, alist
 
 
 @method_decorator(login_required, name='dispatch')
-class DashboardView(TemplateView):
+class DashboardView(AsyncViewMixin, TemplateView):
     """
     Dashboard view that shows top-level counts and a small carousel of active notices.
 
@@ -19,46 +24,66 @@ class DashboardView(TemplateView):
     - If the current user has role == 'Manager' (CustomUser.role), they see counts only for
       farms they own and related objects.
     - Other users see global counts.
+
+    Async (core.asyncviews): the independent reads are awaited together.
     """
     template_name = 'dashboard/index.html'
 
-    def get_context_data(self, **kwargs: Any):
-        ctx = super().get_context_data(**kwargs)
-        User = get_user_model()
-        user = self.request.user
+    async def get(self, request, *args, **kwargs):
+        user = request.user
 
         # Determine farm scope: managers only see their own farms
-        if getattr(user, 'role', None) == 'Manager':
-            farm_qs = Farm.objects.filter(owner=user)
-        else:
-            farm_qs = Farm.objects.all()
+        owner_id = get_scope(user)
+        await scoping.afarm_ids_for(user)
+
+        # Django's async ORM still hands each query to the request's connection
+        # thread, so these take turns on it; gathering them keeps the event loop
+        # free meanwhile and lets them overlap once the backend is async-native.
+        counts, ledger_totals, recent_farms, recent_visits, recent_statements, active_notices = await asyncio.gather(
+            # Counts come from a single aggregated query, cached per scope
+            aget_stats(user),
+            ledger.atotals(owner_id),
+            # Recent items (latest 5)
+            alist(Farm.objects.for_user(user).order_by('-created')[:5]),
+            alist(SiteVisit.objects.for_user(user).select_related('farm').order_by('-visit_date')[:5]),
+            alist(Statement.objects.for_user(user).select_related('farm').order_by('-created')[:5]),
+            alist(Notice.objects.filter(is_active=True).select_related('issued_by').order_by('-created')[:6]),
+        )
+
+        return self.render_to_response(self.get_context_data(
+            counts=counts,
+            ledger_totals=ledger_totals,
+            is_manager_scope=owner_id is not None,
+            recent_farms=recent_farms,
+            recent_visits=recent_visits,
+            recent_statements=recent_statements,
+            active_notices=active_notices,
+            **kwargs,
+        ))
+
+
+@method_decorator(login_required, name='dispatch')
+class PerformanceView(TemplateView):
+    """
+    Admin-only view of the request timings collected by core.profiling:
+    rolling p50/p95/p99 wall time per URL name, with average query count,
+    DB time, template time and response size. POST clears the window.
+    """
+    template_name = 'dashboard/performance.html'
 
-        # Counts
-        farms_count = farm_qs.count()
-        users_count = User.objects.count()
-        sitevisits_count = SiteVisit.objects.filter(farm__in=farm_qs).count()
-        statements_count = Statement.objects.filter(farm__in=farm_qs).count()
-        employee_stats_count = FarmEmployeeStats.objects.filter(farm__in=farm_qs).count()
-        active_notices = Notice.objects.filter(is_active=True).order_by('-created')[:6]
+    def dispatch(self, request, *args, **kwargs):
+        if not (request.user.is_staff or request.user.role == 'Admin'):
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
 
-        # Recent items (latest 5)
-        recent_farms = farm_qs.order_by('-created')[:5]
-        recent_visits = SiteVisit.objects.filter(farm__in=farm_qs).order_by('-visit_date')[:5]
-        recent_statements = Statement.objects.filter(farm__in=farm_qs).order_by('-created')[:5]
+    def post(self, request, *args, **kwargs):
+        profiling.stats.clear()
+        return redirect('performance')
 
+    def get_context_data(self, **kwargs: Any):
+        ctx = super().get_context_data(**kwargs)
         ctx.update({
-            'counts': {
-                'users': users_count,
-                'farms': farms_count,
-                'sitevisits': sitevisits_count,
-                'statements': statements_count,
-                'employee_stats': employee_stats_count,
-            },
-            'recent_farms': recent_farms,
-            'recent_visits': recent_visits,
-            'recent_statements': recent_statements,
-            'active_notices': active_notices,
+            'rows': profiling.stats.summary(),
+            'window': profiling.stats.window,
         })
-
         return ctx
-
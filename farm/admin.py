@@ -1,51 +1,106 @@
 from django.contrib import admin
 from django.db import models
-from django.http import HttpResponse
-import csv
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import redirect
 
+from core.pagination import EstimatedCountPaginator
+from . import search
+from .exports import display_field, stream_csv
+from .tasks import enqueue_export
 from .models import Farm, SiteVisit, Notice, Statement, FarmEmployeeStats
 
 # List of models to register
 MODELS = [Farm, SiteVisit, Notice, Statement, FarmEmployeeStats]
 
+# Rows shown per inline on a parent's change page; the rest are a changelist away
+INLINE_MAX_ROWS = 20
+
 
 def export_as_csv_action(description="Export selected objects as CSV",
                          fields=None):
     """
-    Returns an admin action which exports selected model instances as CSV.
+    Returns an admin action which streams selected model instances as CSV.
     `fields` is iterable of field names; if None uses model._meta.fields.
     """
     def export_as_csv(modeladmin, request, queryset):
-        model = modeladmin.model
-        opts = model._meta
-        field_names = list(fields) if fields else [f.name for f in opts.fields]
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename={opts.label_lower}.csv'
-        writer = csv.writer(response)
-
-        writer.writerow(field_names)
-        for obj in queryset:
-            row = []
-            for field in field_names:
-                try:
-                    val = getattr(obj, field)
-                except Exception:
-                    val = ''
-                # For callable / related objects, try to stringify
-                if callable(val):
-                    try:
-                        val = val()
-                    except Exception:
-                        val = str(val)
-                row.append(val)
-            writer.writerow(row)
-        return response
+        return stream_csv(queryset, list(fields) if fields else None)
 
     export_as_csv.short_description = description
     return export_as_csv
 
 
+def export_as_csv_job_action(description="Export selected objects as CSV (background job)",
+                             fields=None):
+    """
+    Returns an admin action which queues the export as a background job and
+    sends the user to the job's status page, where the file can be downloaded.
+    """
+    def export_as_csv_job(modeladmin, request, queryset):
+        job = enqueue_export(queryset, list(fields) if fields else None, created_by=request.user)
+        return redirect("jobs:job_detail", pk=job.pk)
+
+    export_as_csv_job.short_description = description
+    return export_as_csv_job
+
+
+class CappedInlineFormSet(BaseInlineFormSet):
+    """Inline formset over the newest INLINE_MAX_ROWS children instead of all of them."""
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            self._queryset = super().get_queryset().order_by("-pk")[:INLINE_MAX_ROWS]
+        return self._queryset
+
+
+class RelatedSearchFilter(admin.SimpleListFilter):
+    """
+    Filter on a foreign key by typing its id or (part of) its name, instead
+    of a sidebar listing every related row. Built per field by search_filter().
+    """
+    template = "admin/farm/related_search_filter.html"
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # Only "All", carrying the other active filters for the form's hidden inputs
+        choice = next(super().choices(changelist))
+        choice["query_parts"] = [
+            (key, value)
+            for key, values in changelist.get_filters_params().items() if key != self.parameter_name
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        yield choice
+
+    def queryset(self, request, queryset):
+        value = (self.value() or "").strip()
+        if not value:
+            return queryset
+        if value.isdigit():
+            return queryset.filter(**{f"{self.parameter_name}_id": int(value)})
+        return queryset.filter(**{f"{self.parameter_name}__{self.lookup}__icontains": value})
+
+
+def search_filter(field):
+    return type(f"{field.name.title()}SearchFilter", (RelatedSearchFilter,), {
+        "title": field.verbose_name,
+        "parameter_name": field.name,
+        "lookup": display_field(field.related_model),
+    })
+
+
+def pick_autocomplete_fields(model, exclude=()):
+    # Every FK as a search-as-you-type box: the related admins (farms, users) define search_fields
+    return tuple(
+        f.name for f in model._meta.fields
+        if isinstance(f, models.ForeignKey) and f.editable and f.name not in exclude
+    )
+
+
 # Build inlines for models that have FK -> other models (specifically Farm)
 inlines_for = {m: [] for m in MODELS}
 for child in MODELS:
@@ -60,6 +115,9 @@ for child in MODELS:
                 'extra': 0,
                 'fields': [fld.name for fld in child._meta.fields if fld.editable][:6],
                 'show_change_link': True,
+                'formset': CappedInlineFormSet,
+                'autocomplete_fields': pick_autocomplete_fields(child, exclude=(f.name,)),
+                'verbose_name_plural': f"{child._meta.verbose_name_plural} (newest {INLINE_MAX_ROWS})",
             })
             inlines_for[parent].append(inline)
 
@@ -81,11 +139,20 @@ def pick_search_fields(model, max_fields: int = 6) -> tuple[str, ...]:
 
 def pick_list_filter(model, max_fields=6):
     return tuple(
-        f.name for f in model._meta.fields
+        search_filter(f) if isinstance(f, models.ForeignKey) else f.name
+        for f in model._meta.fields
         if isinstance(f, (models.BooleanField, models.DateField, models.DateTimeField, models.ForeignKey))
     )[:max_fields]
 
 
+def pick_list_select_related(model, list_display):
+    # Join the FK columns the changelist shows, and only those
+    return tuple(
+        f.name for f in model._meta.fields
+        if f.name in list_display and isinstance(f, models.ForeignKey)
+    )
+
+
 # Register each model with a generated ModelAdmin
 for model in MODELS:
     list_display = pick_list_display(model)
@@ -98,11 +165,16 @@ for model in MODELS:
 
     admin_attrs = {
         'list_display': list_display,
+        'list_select_related': pick_list_select_related(model, list_display),
         'search_fields': search_fields,
         'list_filter': list_filter,
+        'autocomplete_fields': pick_autocomplete_fields(model),
+        # Large tables: estimate the unfiltered total and skip the second COUNT(*) when filtering
+        'paginator': EstimatedCountPaginator,
+        'show_full_result_count': False,
         'readonly_fields': readonly_fields,
         'ordering': ('-pk',),
-        'actions': [export_as_csv_action(fields=list_display)],
+        'actions': [export_as_csv_action(fields=list_display), export_as_csv_job_action(fields=list_display)],
     }
 
     # Add inlines if any
@@ -130,6 +202,14 @@ for model in MODELS:
             super(self.__class__, self).save_model(request, obj, form, change)
         return save_model
 
+    # Search indexed models through the full-text index instead of icontains scans
+    def make_get_search_results(kind):
+        def get_search_results(self, request, queryset, search_term):
+            if not search_term.strip():
+                return queryset, False
+            return queryset.filter(pk__in=search.matching_ids(kind, search_term)), False
+        return get_search_results
+
     # Build ModelAdmin subclass
     admin_name = f"{model.__name__}Admin"
     admin_class = type(admin_name, (admin.ModelAdmin,), admin_attrs)
@@ -138,6 +218,10 @@ for model in MODELS:
     if any(f.name == 'owner' for f in model._meta.fields):
         admin_class.save_model = make_save_model()
 
+    kind = search.kind_of(model)
+    if kind:
+        admin_class.get_search_results = make_get_search_results(kind)
+
     # Finally register
     try:
         admin.site.register(model, admin_class)
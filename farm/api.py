@@ -0,0 +1,330 @@
+"""
+Read-only JSON API (v1) for farms, site visits, statements, notices and
+employee stats.
+
+Collections accept:
+
+- `fields=a,b`       only return (and only load) these fields
+- `farm=1,2`         only rows of these farms
+- `since`/`until`    inclusive date range (YYYY-MM-DD) on the resource's date field
+- `limit`, `cursor`  keyset pagination (core.pagination), newest first
+
+Every response carries an ETag. With a shared cache (settings.CACHE_SHARED)
+it is derived from the render cache's model versions (farm.rendercache),
+which every save, delete and bulk change bumps, so a matching If-None-Match
+is answered with 304 without querying the collection at all. Otherwise it is
+derived from `max(updated)` and the row count of the filtered collection (the
+count catches deletions, which leave `max(updated)` unchanged), one aggregate
+query. There is no Last-Modified: a timestamp cannot show a deletion.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+
+from core.pagination import CursorPaginator, InvalidCursor
+from farm import autocomplete, rendercache, schedule, sync
+from farm.models import Farm, FarmEmployeeStats, Notice, SiteVisit, Statement
+
+API_VERSION = "v1"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiView(View):
+    """Session-authenticated JSON endpoint with ApiError handling."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({"error": str(exc)}, status=exc.status)
+
+
+class ResourceView(ApiView):
+    """Base class for one API resource; subclasses set the class attributes."""
+    model = None
+    fields = ()
+    farm_lookup = "farm"      # how `?farm=` reaches the Farm
+    date_field = "created"    # `?since=` / `?until=` filter on this
+    ordering = ("-created", "-id")
+
+    # Queryset ----------------------------------------------------------------
+
+    def get_queryset(self):
+        # Managers only see their own farms' data; notices are shared
+        return self.model._default_manager.for_user(self.request.user)
+
+    def filter_queryset(self, qs):
+        params = self.request.GET
+        farms = [f for f in params.get("farm", "").split(",") if f]
+        if farms:
+            if not self.farm_lookup:
+                raise ApiError("This resource cannot be filtered by farm.")
+            if not all(f.isdigit() for f in farms):
+                raise ApiError("`farm` must be a comma-separated list of ids.")
+            qs = qs.filter(**{f"{self.farm_lookup}__in": farms})
+
+        for param, lookup in (("since", "gte"), ("until", "lte")):
+            if params.get(param):
+                try:
+                    day = datetime.date.fromisoformat(params[param])
+                except ValueError:
+                    raise ApiError(f"`{param}` must be a date (YYYY-MM-DD).")
+                field = self.date_field
+                if isinstance(self.model._meta.get_field(field), models.DateTimeField):
+                    field = f"{field}__date"
+                qs = qs.filter(**{f"{field}__{lookup}": day})
+        return qs
+
+    def selected_fields(self):
+        requested = [f for f in self.request.GET.get("fields", "").split(",") if f]
+        if not requested:
+            return list(self.fields)
+        unknown = set(requested) - set(self.fields)
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+        return ["id"] + [f for f in requested if f != "id"]
+
+    def get_limit(self):
+        try:
+            return max(1, min(int(self.request.GET.get("limit", DEFAULT_LIMIT)), MAX_LIMIT))
+        except ValueError:
+            raise ApiError("`limit` must be a number.")
+
+    # Serialisation -------------------------------------------------------------
+
+    def serialize(self, obj, fields):
+        data = {}
+        for name in fields:
+            field = self.model._meta.get_field(name)
+            # foreign keys are returned as ids, never followed
+            data[name] = getattr(obj, field.attname)
+        return data
+
+    def load_columns(self, fields):
+        ordering = [name.lstrip("-") for name in self.ordering]
+        return list(dict.fromkeys(fields + ordering))
+
+    # Conditional responses -----------------------------------------------------
+
+    def validator(self, qs):
+        """What the ETag is derived from: model versions, or the collection's state."""
+        if settings.CACHE_SHARED:
+            # The scope follows farm ownership and the user's role
+            return rendercache.versions([self.model, Farm, get_user_model()])
+        state = qs.order_by().aggregate(last=Max("updated"), count=Count("pk"))
+        return f"{state['last'] and state['last'].isoformat()}:{state['count']}"
+
+    def conditional(self, qs):
+        """
+        Return (response_or_None, headers). The response is a 304/412 when the
+        client's ETag still matches the collection.
+        """
+        raw = "|".join(str(part) for part in (
+            API_VERSION, self.model._meta.label, self.request.user.pk, self.request.get_full_path(),
+            self.validator(qs),
+        ))
+        etag = f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        response = get_conditional_response(self.request, etag=etag)
+        if response is not None:
+            for name, value in headers.items():
+                response[name] = value
+        return response, headers
+
+    # Handlers ------------------------------------------------------------------
+
+    def get(self, request, pk=None):
+        if pk is not None:
+            return self.get_object(pk)
+
+        fields = self.selected_fields()
+        limit = self.get_limit()
+        qs = self.filter_queryset(self.get_queryset())
+
+        not_modified, headers = self.conditional(qs)
+        if not_modified is not None:
+            return not_modified
+
+        paginator = CursorPaginator(qs.only(*self.load_columns(fields)), limit, self.ordering)
+        try:
+            page = paginator.page(request.GET.get("cursor"))
+        except InvalidCursor:
+            raise ApiError("Invalid cursor.")
+
+        response = JsonResponse({
+            "results": [self.serialize(obj, fields) for obj in page],
+            "next": self.page_url(page.next_cursor),
+            "previous": self.page_url(page.previous_cursor),
+        })
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def get_object(self, pk):
+        fields = self.selected_fields()
+        qs = self.get_queryset().filter(pk=pk)
+        if not qs.exists():
+            raise ApiError("Not found.", status=404)
+        not_modified, headers = self.conditional(qs)
+        if not_modified is not None:
+            return not_modified
+        obj = qs.only(*self.load_columns(fields)).first()
+        response = JsonResponse(self.serialize(obj, fields))
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params["cursor"] = cursor
+        return self.request.build_absolute_uri(f"{self.request.path}?{params.urlencode()}")
+
+
+class FarmResource(ResourceView):
+    model = Farm
+    fields = ("id", "name", "owner", "address", "size_in_hectares", "telephone", "account_number",
+              "email", "sector", "created", "updated")
+    farm_lookup = "pk"
+
+
+class SiteVisitResource(ResourceView):
+    model = SiteVisit
+    fields = ("id", "farm", "agent", "purpose", "visit_date", "notes", "status", "resolution_notes",
+              "created", "updated")
+    date_field = "visit_date"
+    ordering = ("-visit_date", "-id")
+
+
+class StatementResource(ResourceView):
+    model = Statement
+    fields = ("id", "farm", "currency", "period_start", "period_end", "total_sales", "total_expenses",
+              "balance", "created", "updated")
+    date_field = "period_end"
+
+
+class NoticeResource(ResourceView):
+    model = Notice
+    fields = ("id", "title", "message", "issued_by", "is_active", "created", "updated")
+    farm_lookup = None
+
+
+class FarmEmployeeStatsResource(ResourceView):
+    model = FarmEmployeeStats
+    fields = tuple(
+        ["id", "farm", "reporting_month", "employment_type"]
+        + [f.name for f in FarmEmployeeStats._meta.fields if f.name not in (
+            "id", "farm", "reporting_month", "employment_type", "created_by")]
+    )
+    date_field = "reporting_month"
+
+
+class SyncView(ApiView):
+    """
+    Delta sync (farm.sync): `GET ?since=<watermark>` returns the farms, site
+    visits and notices changed since that watermark plus deletion tombstones.
+    Keep calling with the returned `watermark` while `more` is true.
+    """
+
+    def get(self, request):
+        try:
+            limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+        except ValueError:
+            raise ApiError("`limit` must be a number.")
+        try:
+            data = sync.changes(request.user, request.GET.get("since") or None,
+                                limit=limit and max(1, min(limit, 1000)))
+        except sync.InvalidToken:
+            raise ApiError("Invalid watermark.")
+        return JsonResponse(data)
+
+
+class SiteVisitOutboxView(ApiView):
+    """
+    Bulk apply of offline SiteVisit writes:
+    `POST {"operations": [{"op": "create"|"update", "client_id": uuid, "id": pk,
+    "base_updated": iso, "data": {...}}]}`. Returns one result per operation.
+    """
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            raise ApiError("Request body must be JSON.")
+        operations = payload.get("operations") if isinstance(payload, dict) else None
+        if not isinstance(operations, list):
+            raise ApiError("`operations` must be a list.")
+        return JsonResponse({"results": sync.apply_visit_operations(request.user, operations)})
+
+
+class AutocompleteView(ApiView):
+    """
+    Picker choices (farm.autocomplete): `GET ?q=<prefix>` returns
+    `{"results": [{"id", "text"}]}` for the farms, agents or users the form
+    widgets search.
+    """
+
+    def get(self, request, kind):
+        if kind not in autocomplete.SOURCES:
+            raise ApiError(f"Unknown picker: {kind}.", status=404)
+        return JsonResponse({"results": autocomplete.lookup(kind, request.user, request.GET.get("q", ""))})
+
+
+class ScheduleView(ApiView):
+    """
+    Agent workload (farm.schedule): `GET ?start=&end=&by=day|week` returns the
+    open and total visits of each agent per bucket.
+    """
+
+    def get(self, request):
+        try:
+            start, end, bucket = schedule.parse_window(request.GET)
+        except ValueError as exc:
+            raise ApiError(str(exc))
+        data = schedule.timeline(schedule.visits_for(request.user), start, end, bucket)
+        for agent in data["agents"]:
+            agent["overloaded"] = [cell["date"] for cell in agent["cells"] if cell["overloaded"]]
+        return JsonResponse({"start": start, "end": end, "by": bucket, **data})
+
+
+class ScheduleCheckView(ApiView):
+    """
+    Load check for planned visits: `POST {"visits": [{"farm": pk, "agent": pk,
+    "visit_date": "YYYY-MM-DD"}]}` returns `{"ok", "problems"}` per visit, in
+    order, counting each accepted visit against the ones after it.
+    """
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            raise ApiError("Request body must be JSON.")
+        visits = payload.get("visits") if isinstance(payload, dict) else None
+        if not isinstance(visits, list):
+            raise ApiError("`visits` must be a list.")
+        limit = getattr(settings, "SCHEDULE_MAX_PROPOSALS", 1000)
+        if len(visits) > limit:
+            raise ApiError(f"Check at most {limit} visits at a time.")
+        try:
+            results = schedule.check_proposals(visits)
+        except ValueError as exc:
+            raise ApiError(str(exc))
+        return JsonResponse({"results": results})
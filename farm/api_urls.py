@@ -0,0 +1,25 @@
+from django.urls import path
+
+from farm import api
+
+RESOURCES = [
+    ("farms", api.FarmResource),
+    ("sitevisits", api.SiteVisitResource),
+    ("statements", api.StatementResource),
+    ("notices", api.NoticeResource),
+    ("farm-employee-stats", api.FarmEmployeeStatsResource),
+]
+
+urlpatterns = [
+    path("sync/", api.SyncView.as_view(), name="sync"),
+    path("sync/sitevisits/", api.SiteVisitOutboxView.as_view(), name="sync_sitevisits"),
+    path("schedule/", api.ScheduleView.as_view(), name="schedule"),
+    path("schedule/check/", api.ScheduleCheckView.as_view(), name="schedule_check"),
+    path("autocomplete/<slug:kind>/", api.AutocompleteView.as_view(), name="autocomplete"),
+]
+for prefix, view in RESOURCES:
+    name = prefix.replace("-", "_")
+    urlpatterns += [
+        path(f"{prefix}/", view.as_view(), name=f"{name}_list"),
+        path(f"{prefix}/<int:pk>/", view.as_view(), name=f"{name}_detail"),
+    ]
@@ -1,6 +1,86 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 
 
 class FarmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'farm'
+
+    def ready(self):
+        from farm import compliance, ledger, rendercache, rollups, scoping, search, summaries, sync
+        from farm.models import Farm, FarmEmployeeStats, FarmSummary, Notice, SiteVisit, Statement
+        from farm.signals import bulk_changed, farm_post_delete, farm_pre_delete
+
+        # Mark farms being deleted, so their children's per-row delete receivers
+        # leave the cascade to the farm-level ones (farm.signals.deleted_with_farm)
+        pre_delete.connect(farm_pre_delete, sender=Farm, dispatch_uid="farm-pre-delete")
+        post_delete.connect(farm_post_delete, sender=Farm, dispatch_uid="farm-post-delete")
+
+        # Keep the monthly employee/payroll rollups in step with their source rows
+        pre_save.connect(rollups.stats_pre_save, sender=FarmEmployeeStats, dispatch_uid="rollups-stats-pre-save")
+        post_save.connect(rollups.stats_post_save, sender=FarmEmployeeStats, dispatch_uid="rollups-stats-save")
+        post_delete.connect(rollups.stats_post_delete, sender=FarmEmployeeStats, dispatch_uid="rollups-stats-delete")
+        bulk_changed.connect(rollups.stats_bulk_changed, sender=FarmEmployeeStats, dispatch_uid="rollups-stats-bulk")
+        pre_save.connect(rollups.farm_pre_save, sender=Farm, dispatch_uid="rollups-farm-pre-save")
+        post_save.connect(rollups.farm_post_save, sender=Farm, dispatch_uid="rollups-farm-save")
+        pre_delete.connect(rollups.farm_pre_delete, sender=Farm, dispatch_uid="rollups-farm-pre-delete")
+
+        # Keep the materialized missing-returns table (compliance report) current
+        pre_save.connect(compliance.stats_pre_save, sender=FarmEmployeeStats, dispatch_uid="compliance-stats-pre-save")
+        post_save.connect(compliance.stats_post_save, sender=FarmEmployeeStats, dispatch_uid="compliance-stats-save")
+        post_delete.connect(compliance.stats_post_delete, sender=FarmEmployeeStats,
+                            dispatch_uid="compliance-stats-delete")
+        bulk_changed.connect(compliance.stats_bulk_changed, sender=FarmEmployeeStats,
+                             dispatch_uid="compliance-stats-bulk")
+
+        # Keep the statement ledgers' period totals and running balances current
+        pre_save.connect(ledger.statement_pre_save, sender=Statement, dispatch_uid="ledger-statement-pre-save")
+        post_save.connect(ledger.statement_post_save, sender=Statement, dispatch_uid="ledger-statement-save")
+        post_delete.connect(ledger.statement_post_delete, sender=Statement, dispatch_uid="ledger-statement-delete")
+        bulk_changed.connect(ledger.statements_bulk_changed, sender=Statement, dispatch_uid="ledger-statement-bulk")
+        pre_delete.connect(ledger.farm_pre_delete, sender=Farm, dispatch_uid="ledger-farm-pre-delete")
+
+        # Keep each farm's detail-page summary in step with its visits and returns
+        for model in (SiteVisit, FarmEmployeeStats):
+            label = model._meta.model_name
+            pre_save.connect(summaries.child_pre_save, sender=model, dispatch_uid=f"summary-{label}-pre-save")
+            post_save.connect(summaries.child_post_save, sender=model, dispatch_uid=f"summary-{label}-save")
+            post_delete.connect(summaries.child_post_delete, sender=model, dispatch_uid=f"summary-{label}-delete")
+            bulk_changed.connect(summaries.children_bulk_changed, sender=model, dispatch_uid=f"summary-{label}-bulk")
+
+        # Keep the full-text search entries in step with the searchable models
+        for model in (Farm, SiteVisit, Notice, Statement):
+            label = model._meta.model_name
+            post_save.connect(search.object_post_save, sender=model, dispatch_uid=f"search-{label}-save")
+            post_delete.connect(search.object_post_delete, sender=model, dispatch_uid=f"search-{label}-delete")
+            bulk_changed.connect(search.objects_bulk_changed, sender=model, dispatch_uid=f"search-{label}-bulk")
+        pre_save.connect(search.farm_pre_save, sender=Farm, dispatch_uid="search-farm-pre-save")
+        post_save.connect(search.farm_post_save, sender=Farm, dispatch_uid="search-farm-rename")
+
+        # Deletion tombstones for delta-sync clients
+        for model in (Farm, SiteVisit, Notice):
+            post_delete.connect(sync.record_tombstone, sender=model,
+                                dispatch_uid=f"sync-{model._meta.model_name}-tombstone")
+        pre_delete.connect(sync.farm_pre_delete, sender=Farm, dispatch_uid="sync-farm-pre-delete")
+        # ... and for rows that leave a user's scope without being deleted
+        pre_save.connect(sync.farm_pre_save, sender=Farm, dispatch_uid="sync-farm-pre-save")
+        post_save.connect(sync.farm_post_save, sender=Farm, dispatch_uid="sync-farm-save")
+        pre_save.connect(sync.visit_pre_save, sender=SiteVisit, dispatch_uid="sync-sitevisit-pre-save")
+        post_save.connect(sync.visit_post_save, sender=SiteVisit, dispatch_uid="sync-sitevisit-save")
+
+        # Forget cached farm-ownership sets when farms change hands
+        pre_save.connect(scoping.farm_pre_save, sender=Farm, dispatch_uid="scope-farm-pre-save")
+        post_save.connect(scoping.farm_post_save, sender=Farm, dispatch_uid="scope-farm-save")
+        post_delete.connect(scoping.farm_post_delete, sender=Farm, dispatch_uid="scope-farm-delete")
+        bulk_changed.connect(scoping.farms_bulk_changed, sender=Farm, dispatch_uid="scope-farm-bulk")
+
+        # Retire cached page and row fragments built from changed models
+        for model in (Farm, SiteVisit, Statement, FarmEmployeeStats, Notice, FarmSummary):
+            label = model._meta.model_name
+            post_save.connect(rendercache.model_changed, sender=model, dispatch_uid=f"render-{label}-save")
+            post_delete.connect(rendercache.model_changed, sender=model, dispatch_uid=f"render-{label}-delete")
+            bulk_changed.connect(rendercache.model_changed, sender=model, dispatch_uid=f"render-{label}-bulk")
+        User = get_user_model()
+        post_save.connect(rendercache.user_changed, sender=User, dispatch_uid="render-user-save")
+        post_delete.connect(rendercache.model_changed, sender=User, dispatch_uid="render-user-delete")
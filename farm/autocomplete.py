@@ -0,0 +1,125 @@
+"""
+Searchable farm and user pickers for the create/update forms.
+
+A form field using `AutocompleteSelect` renders only its selected option; the
+script in static/assets/js/autocomplete.js fills the list from
+`/api/v1/autocomplete/<kind>/?q=` as the user types. Submitting still goes
+through the field's ModelChoiceField, which validates the one posted pk
+against its queryset (a single `pk=` lookup), so the endpoint only decides
+what is offered, never what is accepted.
+
+Lookups are prefix matches on LOWER(column), written as a range
+(`>= term` and `< term + U+10FFFF`) so the expression indexes on
+Farm.name and the user name columns serve them; `istartswith` then rechecks
+the rows under the backend's own case rules. Results are cached per kind,
+role and farm scope (rendercache.scope_of) under the source model's render
+version, so saving a farm or user retires them, when the cache is shared
+(see rendercache.enabled()).
+"""
+import hashlib
+
+from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.urls import reverse
+
+from farm import rendercache
+from farm.models import Farm
+
+User = get_user_model()
+PREFIX = "autocomplete"
+USER_COLUMNS = ("username", "first_name", "last_name")
+
+
+def limit():
+    return getattr(settings, "AUTOCOMPLETE_LIMIT", 20)
+
+
+def timeout():
+    return getattr(settings, "AUTOCOMPLETE_CACHE_TIMEOUT", 300)
+
+
+class Source:
+    """What one picker offers: `queryset(user)` searched on `columns`, labelled by `label` (the field's str())."""
+
+    def __init__(self, model, queryset, columns, label, ordering):
+        self.model = model
+        self.queryset = queryset
+        self.columns = columns
+        self.label = label
+        self.ordering = ordering
+
+    def search(self, user, term):
+        qs = self.queryset(user)
+        term = term.lower()
+        if term:
+            # "\U0010ffff" sorts after every character, closing the prefix range
+            match = Q()
+            for column in self.columns:
+                qs = qs.alias(**{f"{column}_lower": Lower(column)})
+                match |= (Q(**{f"{column}_lower__gte": term, f"{column}_lower__lt": term + "\U0010ffff"})
+                          & Q(**{f"{column}__istartswith": term}))
+            qs = qs.filter(match)
+        rows = qs.order_by(*self.ordering).values("pk", self.label)[:limit()]
+        return [{"id": row["pk"], "text": row[self.label]} for row in rows]
+
+
+SOURCES = {
+    # Managers are offered their own farms, everyone else every farm
+    "farms": Source(Farm, lambda user: Farm.objects.for_user(user), ("name",), "name", ("name", "pk")),
+    "agents": Source(User, lambda user: User.objects.filter(role="Designated Agent"), USER_COLUMNS,
+                     "username", ("username",)),
+    "users": Source(User, lambda user: User.objects.all(), USER_COLUMNS, "username", ("username",)),
+}
+
+
+def _cache_key(kind, user, term, version):
+    digest = hashlib.sha1(term.lower().encode()).hexdigest()
+    return f"{PREFIX}:{kind}:{rendercache.scope_of(user)}:{version}:{digest}"
+
+
+def lookup(kind, user, term):
+    """Up to limit() {"id", "text"} choices of `kind` starting with `term`; raises KeyError for unknown kinds."""
+    source = SOURCES[kind]
+    term = term.strip()
+    if not settings.CACHE_SHARED:
+        return source.search(user, term)
+    key = _cache_key(kind, user, term, rendercache.versions([source.model]))
+    results = cache.get(key)
+    if results is None:
+        results = source.search(user, term)
+        cache.set(key, results, timeout())
+    return results
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    A <select> rendering only the selected choice (one query by pk, none when
+    empty) instead of iterating the whole queryset; autocomplete.js offers the
+    rest from the `kind` endpoint.
+    """
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-autocomplete"] = reverse("api-v1:autocomplete", args=[self.kind])
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        field = getattr(self.choices, "field", None)
+        if field is None:
+            return super().optgroups(name, value, attrs)
+        options = []
+        if field.empty_label is not None:
+            options.append(self.create_option(name, "", field.empty_label, not any(value), 0))
+        pks = [v for v in value if str(v).isdigit()]
+        if pks:
+            for obj in self.choices.queryset.filter(pk__in=pks):
+                options.append(self.create_option(name, obj.pk, field.label_from_instance(obj), True, len(options)))
+        return [(None, options, 0)]
@@ -0,0 +1,231 @@
+"""
+Bulk actions for the list pages: change or delete many selected rows at once.
+
+Each action reads the selected rows the user may change (one SELECT of ids,
+farms and whatever the derived tables need) and applies itself with a single
+`UPDATE ... WHERE id IN (...)` or `DELETE`. Query-level writes skip the
+per-row save/delete signals, so every action sends `bulk_changed` once for
+the batch instead; the page caches, search index, summaries, rollups,
+ledgers and dashboard counts all follow it. Deletes of synced resources
+write their tombstones in one insert, and so does reassigning visits, for the
+agents they are taken from.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from farm import ledger, sync
+from farm.models import FarmEmployeeStats, Notice, SiteVisit, Statement
+from farm.signals import bulk_changed
+
+User = get_user_model()
+STATEMENT_FIELDS = ("farm_id", "currency", "period_end", "total_sales", "total_expenses")
+# Ids per DELETE statement, within every backend's limit on query parameters
+DELETE_BATCH = 500
+
+
+class BulkActionError(Exception):
+    """The action can't be applied as requested; the message is shown to the user."""
+
+
+def max_rows():
+    return getattr(settings, "BULK_ACTION_MAX_ROWS", 1000)
+
+
+# Writes ------------------------------------------------------------------------
+
+def _rows(queryset):
+    model = queryset.model
+    fields = ["pk"]
+    if model is Statement:
+        fields += STATEMENT_FIELDS
+    elif model is not Notice:
+        fields.append("farm_id")
+    if model is FarmEmployeeStats:
+        fields.append("reporting_month")
+    if model is SiteVisit:
+        # whose sync scope the visits are in (sync tombstones)
+        fields.append("agent_id")
+        return list(queryset.order_by().values(*fields, owner_id=F("farm__owner_id")))
+    return list(queryset.order_by().values(*fields))
+
+
+def _notify(model, rows, **kwargs):
+    kwargs["pks"] = [row["pk"] for row in rows]
+    if model in (SiteVisit, FarmEmployeeStats):
+        kwargs["farm_ids"] = {row["farm_id"] for row in rows}
+    if model is FarmEmployeeStats:
+        kwargs["months"] = {row["reporting_month"] for row in rows}
+    bulk_changed.send(sender=model, **kwargs)
+
+
+def update(queryset, **values):
+    """Set `values` on every row of `queryset` with one UPDATE; returns the number of rows."""
+    return _update(queryset.model, _rows(queryset), **values)
+
+
+def _update(model, rows, **values):
+    if not rows:
+        return 0
+    with transaction.atomic():
+        # update() skips auto_now, and sync clients and row caches follow `updated`
+        count = model._default_manager.filter(pk__in=[row["pk"] for row in rows]).update(
+            updated=timezone.now(), **values,
+        )
+        _notify(model, rows)
+    return count
+
+
+def _delete_pks(model, pks):
+    """`DELETE ... WHERE id IN (...)` on `model`'s table, DELETE_BATCH ids at a time; returns the number of rows."""
+    quote = connection.ops.quote_name
+    count = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), DELETE_BATCH):
+            batch = pks[start:start + DELETE_BATCH]
+            cursor.execute(
+                f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} "
+                f"IN ({', '.join(['%s'] * len(batch))})",
+                batch,
+            )
+            count += cursor.rowcount
+    return count
+
+
+def delete(queryset):
+    """Delete every row of `queryset` with one DELETE; returns the number of rows."""
+    model = queryset.model
+    if model._meta.related_objects:
+        # A single DELETE would skip the cascade to the dependent rows
+        raise ValueError(f"{model.__name__} has dependent rows; use QuerySet.delete().")
+    rows = _rows(queryset)
+    if not rows:
+        return 0
+    pks = [row["pk"] for row in rows]
+    extra = {}
+    if model is Statement:
+        extra["removed"] = [
+            ledger.snapshot(Statement(**{name: row[name] for name in STATEMENT_FIELDS})) for row in rows
+        ]
+    with transaction.atomic():
+        # QuerySet.delete() fetches the rows again to send pre/post_delete for each
+        count = _delete_pks(model, pks)
+        sync.record_tombstones(model, rows)
+        _notify(model, rows, **extra)
+    return count
+
+
+# Actions ---------------------------------------------------------------------
+
+class Action:
+    """
+    One bulk action. `run(queryset, data)` applies it to the selected rows and
+    returns their number; `field` / `choices` describe the value it takes
+    from the form, if any.
+    """
+
+    def __init__(self, name, label, done, roles, run, field=None, choices=None):
+        self.name = name
+        self.label = label
+        self.done = done
+        self.roles = roles
+        self.run = run
+        self.field = field
+        self.choices = choices
+
+    def allowed(self, user):
+        return user.is_authenticated and (user.is_staff or getattr(user, "role", None) in self.roles)
+
+    def get_choices(self):
+        return self.choices() if callable(self.choices) else self.choices
+
+
+def set_visit_status(queryset, data):
+    status = data.get("status")
+    if status not in dict(SiteVisit.STATUS_CHOICES):
+        raise BulkActionError("Pick a valid status.")
+    return update(queryset, status=status)
+
+
+def agent_choices():
+    return User.objects.filter(role="Designated Agent").order_by("first_name", "last_name").values_list(
+        "pk", "username"
+    )
+
+
+def reassign_visits(queryset, data):
+    agent_id = data.get("agent", "")
+    agent = agent_choices().filter(pk=agent_id).first() if agent_id.isdigit() else None
+    if agent is None:
+        raise BulkActionError("Pick a designated agent.")
+    rows = _rows(queryset)
+    with transaction.atomic():
+        count = _update(SiteVisit, rows, agent_id=agent[0])
+        # The visits leave their previous agents' sync scope
+        sync.record_tombstones(SiteVisit, [
+            {"pk": row["pk"], "agent_id": row["agent_id"]} for row in rows if row["agent_id"] not in (None, agent[0])
+        ], moved=True)
+    return count
+
+
+def activate(queryset, data):
+    return update(queryset, is_active=True)
+
+
+def deactivate(queryset, data):
+    return update(queryset, is_active=False)
+
+
+def delete_rows(queryset, data):
+    return delete(queryset)
+
+
+ACTIONS = {
+    SiteVisit: [
+        Action("set_status", "Set status", "updated", ("Admin", "Designated Agent"), set_visit_status,
+               field="status", choices=SiteVisit.STATUS_CHOICES),
+        Action("reassign", "Reassign to", "reassigned", ("Admin",), reassign_visits,
+               field="agent", choices=agent_choices),
+        Action("delete", "Delete", "deleted", ("Admin",), delete_rows),
+    ],
+    Notice: [
+        Action("activate", "Activate", "activated", ("Admin",), activate),
+        Action("deactivate", "Deactivate", "deactivated", ("Admin",), deactivate),
+        Action("delete", "Delete", "deleted", ("Admin",), delete_rows),
+    ],
+    Statement: [
+        Action("delete", "Delete", "deleted", ("Admin", "Accountant"), delete_rows),
+    ],
+    FarmEmployeeStats: [
+        Action("delete", "Delete", "deleted", ("Admin", "Accountant", "Manager"), delete_rows),
+    ],
+}
+
+
+def available(model, user):
+    """The actions `user` may run on `model`'s list page."""
+    return [action for action in ACTIONS.get(model, ()) if action.allowed(user)]
+
+
+def get_action(model, name):
+    return next((action for action in ACTIONS.get(model, ()) if action.name == name), None)
+
+
+def selection(model, user, pks):
+    """The rows among `pks` that `user` may change: their farm scope, and an agent's own visits."""
+    qs = model._default_manager.for_user(user).filter(pk__in=pks)
+    if model is SiteVisit and getattr(user, "role", None) == "Designated Agent":
+        qs = qs.filter(agent=user)
+    return qs
+
+
+def apply(action, model, user, data):
+    """Run `action` over the rows selected in `data` (the POST); returns the number changed."""
+    pks = sorted({int(pk) for pk in data.getlist("pk") if pk.isdigit()})
+    if not pks:
+        raise BulkActionError("Select at least one row.")
+    if len(pks) > max_rows():
+        raise BulkActionError(f"Select at most {max_rows()} rows at a time.")
+    return action.run(selection(model, user, pks), data)
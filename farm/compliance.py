@@ -0,0 +1,205 @@
+"""
+Compliance report: farms that filed no monthly employee return
+(MissingEmployeeReturn).
+
+The missing (farm, month) pairs are found set-based, in the database: one
+`INSERT ... SELECT` crosses the farms with the due months and keeps the
+pairs for which `NOT EXISTS` a FarmEmployeeStats row of that (normalized)
+month, an equality probe of the (farm, reporting_month, employment_type)
+unique index. The table is kept
+current incrementally:
+
+- saving a return deletes its (farm, month) row;
+- deleting (or moving) one re-checks only its old (farm, month);
+- bulk writes re-check the farms and months they touched;
+- `ensure_current()`, called by the report, builds every due month not
+  recorded in ComplianceMonth yet (the month that becomes due at each month
+  end, or all of them on a fresh database) and drops the ones that leave the
+  window.
+
+Filters on a farm's sector and owner join the farm table. A filter on one
+employment type is answered live for the selected month with the same
+anti-join, since a farm may legitimately file only some types.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from farm.models import ComplianceMonth, Farm, FarmEmployeeStats, MissingEmployeeReturn, month_of
+from farm.signals import deleted_with_farm
+
+STATE_KEY = "compliance:through"
+FARM_BATCH = 500
+
+
+def window():
+    return getattr(settings, "COMPLIANCE_MONTHS", 60)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def added_before(month):
+    """The moment `month` ends: farms added before it owe a return for it."""
+    return timezone.make_aware(datetime.datetime.combine(add_months(month, 1), datetime.time.min))
+
+
+def due_months(today=None):
+    """The months returns are due for: the window() months before the current one, oldest first."""
+    current = month_of(today or timezone.localdate())
+    return [add_months(current, -count) for count in range(window(), 0, -1)]
+
+
+# Materializing -----------------------------------------------------------------
+
+def _insert_missing(months, farm_ids=None):
+    """INSERT ... SELECT the (farm, month) pairs without a return; returns the number of rows."""
+    quote = connection.ops.quote_name
+    months_sql = " UNION ALL ".join(["SELECT %s AS month, %s AS ends"] * len(months))
+    params = [
+        value for month in months
+        for value in (month, connection.ops.adapt_datetimefield_value(added_before(month)))
+    ]
+    farm_filter = ""
+    if farm_ids is not None:
+        farm_filter = f" AND f.id IN ({', '.join(['%s'] * len(farm_ids))})"
+        params += list(farm_ids)
+    sql = (
+        f"INSERT INTO {quote(MissingEmployeeReturn._meta.db_table)} (farm_id, month) "
+        f"SELECT f.id, m.month FROM {quote(Farm._meta.db_table)} f CROSS JOIN ({months_sql}) m "
+        f"WHERE f.created < m.ends{farm_filter} AND NOT EXISTS ("
+        f"SELECT 1 FROM {quote(FarmEmployeeStats._meta.db_table)} s "
+        f"WHERE s.farm_id = f.id AND s.reporting_month = m.month)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def rebuild(farm_ids=None, months=None):
+    """
+    Recompute the missing returns of the given farms and months (None = all,
+    within the window). Returns the number of rows written. A rebuild of all
+    farms records its months as built.
+    """
+    due = due_months()
+    selected = due if months is None else sorted({month_of(month) for month in months} & set(due))
+    if farm_ids is not None:
+        farm_ids = sorted(set(farm_ids))
+    if not selected or farm_ids == []:
+        return 0
+
+    existing = MissingEmployeeReturn.objects.all()
+    built = ComplianceMonth.objects.all()
+    if farm_ids is not None:
+        existing = existing.filter(farm_id__in=farm_ids)
+    if months is not None:
+        # A rebuild of every month also drops the ones that left the window
+        existing = existing.filter(month__in=selected)
+        built = built.filter(month__in=selected)
+    with transaction.atomic():
+        existing.delete()
+        if farm_ids is None:
+            built.delete()
+            ComplianceMonth.objects.bulk_create([ComplianceMonth(month=month) for month in selected])
+            return _insert_missing(selected)
+        return sum(
+            _insert_missing(selected, farm_ids[start:start + FARM_BATCH])
+            for start in range(0, len(farm_ids), FARM_BATCH)
+        )
+
+
+def ensure_current():
+    """
+    Materialize the due months that have not been built (ComplianceMonth)
+    and drop the ones that left the window. The cache only remembers that
+    this check already ran for the latest due month.
+    """
+    due = due_months()
+    if cache.get(STATE_KEY) == due[-1]:
+        return
+    with transaction.atomic():
+        MissingEmployeeReturn.objects.filter(month__lt=due[0]).delete()
+        ComplianceMonth.objects.filter(month__lt=due[0]).delete()
+        built = set(ComplianceMonth.objects.values_list("month", flat=True))
+        missing = [month for month in due if month not in built]
+        if missing:
+            rebuild(months=missing)
+    cache.set(STATE_KEY, due[-1], None)
+
+
+# Report ----------------------------------------------------------------------
+
+def _farm_filters(prefix="", sector=None, owner=None):
+    filters = {}
+    if sector:
+        filters[f"{prefix}sector"] = sector
+    if owner:
+        filters[f"{prefix}owner"] = owner
+    return filters
+
+
+def month_counts(user, sector=None, owner=None):
+    """{month: farms missing a return} over the window, newest first."""
+    rows = (
+        MissingEmployeeReturn.objects.for_user(user).filter(**_farm_filters("farm__", sector, owner))
+        .order_by().values_list("month").annotate(farms=Count("pk"))
+    )
+    return dict(sorted(rows, reverse=True))
+
+
+def missing_farms(user, month, employment_type=None, sector=None, owner=None):
+    """The farms (visible to `user`) that filed no return for `month`, or none of `employment_type`."""
+    farms = Farm.objects.for_user(user).filter(**_farm_filters("", sector, owner))
+    if not employment_type:
+        return farms.filter(missing_returns__month=month)
+    filed = FarmEmployeeStats.objects.for_month(month).filter(farm=OuterRef("pk"), employment_type=employment_type)
+    return farms.filter(created__lt=added_before(month)).exclude(Exists(filed))
+
+
+# Signal receivers ------------------------------------------------------------
+
+def filed(farm_id, day):
+    MissingEmployeeReturn.objects.filter(farm_id=farm_id, month=month_of(day)).delete()
+
+
+def withdrawn(farm_id, day):
+    rebuild(farm_ids=[farm_id], months=[day])
+
+
+def stats_pre_save(sender, instance, raw=False, **kwargs):
+    instance._compliance_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._compliance_previous = (
+        sender.objects.filter(pk=instance.pk).values_list("farm_id", "reporting_month").first()
+    )
+
+
+def stats_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    filed(instance.farm_id, instance.reporting_month)
+    previous = getattr(instance, "_compliance_previous", None)
+    if previous is not None and (previous[0], month_of(previous[1])) != (
+        instance.farm_id, month_of(instance.reporting_month)
+    ):
+        withdrawn(*previous)
+
+
+def stats_post_delete(sender, instance, origin=None, **kwargs):
+    # The farm's missing-return rows go with it in the cascade
+    if deleted_with_farm(instance, origin):
+        return
+    farm_id, day = instance.farm_id, instance.reporting_month
+    transaction.on_commit(lambda: withdrawn(farm_id, day))
+
+
+def stats_bulk_changed(sender, farm_ids=None, months=None, **kwargs):
+    rebuild(farm_ids, months)
@@ -0,0 +1,243 @@
+"""
+Synthetic datasets for load testing (`manage.py generate_data`).
+
+Every generated user's username starts with PREFIX, so a dataset can be
+removed again with `clear()` (farms and everything under them, a table at a
+time).
+Rows are written with bulk_create in batches straight from generators, so a
+million-visit dataset never sits in memory. Bulk writes skip the per-row
+signals, so `generate()` finishes by sending `bulk_changed` for every
+model; that rebuilds the rollups, ledgers, farm summaries and search index
+and retires cached dashboard counts and farm scopes.
+"""
+import datetime
+import random
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from farm.models import (
+    Farm, FarmEmployeeStats, FarmSummary, MissingEmployeeReturn, Notice, SearchEntry, SiteVisit, Statement,
+    StatementLedger,
+)
+from farm.signals import bulk_changed
+
+PREFIX = "bench-"
+PASSWORD = "bench-password"
+
+# name -> (farms, site visits, years of monthly returns)
+SCALES = {
+    "small": (200, 5_000, 1),
+    "medium": (2_000, 100_000, 3),
+    "large": (10_000, 1_000_000, 5),
+}
+
+SECTORS = [value for value, _ in Farm._meta.get_field("sector").choices]
+EMPLOYMENT_TYPES = [value for value, _ in FarmEmployeeStats.EMPLOYMENT_TYPES]
+VISIT_STATUSES = [value for value, _ in SiteVisit.STATUS_CHOICES]
+PURPOSES = ["General Inspection", "Compliance Check", "Arrears Follow-up", "Registration", "Audit"]
+PLACES = ["Mazowe", "Chipinge", "Marondera", "Chegutu", "Kariba", "Mutare", "Bindura", "Triangle", "Nyanga"]
+WORDS = ["irrigation", "payroll", "contributions", "arrears", "seasonal", "workers", "harvest",
+         "records", "registration", "housing", "inspection", "tobacco", "maize", "citrus"]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def month_start(day, months_back):
+    index = day.year * 12 + day.month - 1 - months_back
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+class Generator:
+    def __init__(self, farms, visits, years, managers=None, agents=None, seed=0, batch_size=5000, log=None):
+        self.farms = farms
+        self.visits = visits
+        self.years = years
+        self.managers = managers or max(1, farms // 20)
+        self.agents = agents or max(1, farms // 100)
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.today = datetime.date.today()
+
+    def sentence(self, words=8):
+        return " ".join(self.random.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def money(self, low, high):
+        return Decimal(self.random.randint(low * 100, high * 100)) / 100
+
+    # Rows ----------------------------------------------------------------------
+
+    def users(self):
+        User = get_user_model()
+        password = make_password(PASSWORD)
+        accounts = [("admin", "Admin", 1), ("accountant", "Accountant", 1),
+                    ("manager", "Manager", self.managers), ("agent", "Designated Agent", self.agents)]
+        for label, role, count in accounts:
+            for n in range(count):
+                yield User(username=f"{PREFIX}{label}-{n}", password=password, role=role,
+                           first_name=label.title(), last_name=str(n), email=f"{label}{n}@example.com",
+                           is_staff=role == "Admin")
+
+    def farm_rows(self, owner_ids):
+        for n in range(self.farms):
+            place = self.random.choice(PLACES)
+            yield Farm(
+                name=f"{place} {self.random.choice(['Estates', 'Farm', 'Holdings', 'Ranch'])} {n}",
+                owner_id=owner_ids[n % len(owner_ids)],
+                address=f"{self.random.randint(1, 400)} {place} Road",
+                size_in_hectares=self.money(5, 5000),
+                telephone=f"+263 77 {self.random.randint(1000000, 9999999)}",
+                account_number=f"ACC-{n:07d}",
+                email=f"farm{n}@example.com",
+                sector=self.random.choice(SECTORS),
+            )
+
+    def visit_rows(self, farm_ids, agent_ids):
+        days = self.years * 365
+        for _ in range(self.visits):
+            status = self.random.choice(VISIT_STATUSES)
+            yield SiteVisit(
+                farm_id=self.random.choice(farm_ids),
+                agent_id=self.random.choice(agent_ids),
+                purpose=self.random.choice(PURPOSES),
+                visit_date=self.today - datetime.timedelta(days=self.random.randint(-30, days)),
+                notes=self.sentence(12),
+                status=status,
+                resolution_notes=self.sentence(6) if status in ("Resolved", "Completed") else "",
+            )
+
+    def statement_rows(self, farm_ids):
+        # One monthly statement per farm, mostly USD with some ZWL
+        for farm_id in farm_ids:
+            currency = "ZWL" if self.random.random() < 0.3 else "USD"
+            for back in range(self.years * 12):
+                start = month_start(self.today, back + 1)
+                sales, expenses = self.money(1_000, 250_000), self.money(500, 200_000)
+                # bulk_create skips Statement.save(), which derives the balance
+                yield Statement(
+                    farm_id=farm_id, currency=currency,
+                    period_start=start, period_end=month_start(start, -1) - datetime.timedelta(days=1),
+                    total_sales=sales, total_expenses=expenses, balance=sales - expenses,
+                )
+
+    def stats_rows(self, farm_ids, creator_id):
+        for farm_id in farm_ids:
+            size = self.random.randint(5, 400)
+            for back in range(self.years * 12):
+                month = month_start(self.today, back + 1)
+                for employment_type in EMPLOYMENT_TYPES:
+                    people = [max(0, int(size * share * self.random.uniform(0.8, 1.2)))
+                              for share in (0.45, 0.35, 0.12, 0.08)]
+                    basic = Decimal(sum(people) * self.random.randint(150, 400))
+                    employee, employer = basic * Decimal("0.045"), basic * Decimal("0.045")
+                    arrears = self.money(0, 500) if self.random.random() < 0.1 else Decimal(0)
+                    yield FarmEmployeeStats(
+                        farm_id=farm_id, reporting_month=month, employment_type=employment_type,
+                        citizen_male=people[0], citizen_female=people[1],
+                        expatriate_male=people[2], expatriate_female=people[3],
+                        basic_pay_usd=basic, basic_pay_zwl=basic * 25,
+                        employees_contribution_usd=employee, employees_contribution_zwl=employee * 25,
+                        employers_contribution_usd=employer, employers_contribution_zwl=employer * 25,
+                        arrears_usd=arrears, arrears_zwl=arrears * 25,
+                        total_contribution_usd=employee + employer + arrears,
+                        total_contribution_zwl=(employee + employer + arrears) * 25,
+                        created_by_id=creator_id,
+                    )
+
+    def notice_rows(self, admin_id):
+        for n in range(50):
+            yield Notice(title=f"Notice {n}: {self.random.choice(WORDS)}", message=self.sentence(30),
+                         issued_by_id=admin_id, is_active=n < 10)
+
+    # Writing -------------------------------------------------------------------
+
+    def write(self, model, rows):
+        total = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+        self.log(f"{model._meta.verbose_name_plural}: {total}")
+        return total
+
+    def run(self):
+        User = get_user_model()
+        self.write(User, self.users())
+        users = User.objects.filter(username__startswith=PREFIX)
+        admin_id = users.get(username=f"{PREFIX}admin-0").pk
+        manager_ids = list(users.filter(role="Manager").order_by("pk").values_list("pk", flat=True))
+        agent_ids = list(users.filter(role="Designated Agent").order_by("pk").values_list("pk", flat=True))
+
+        self.write(Farm, self.farm_rows(manager_ids))
+        farm_ids = list(Farm.objects.filter(owner_id__in=manager_ids).order_by("pk").values_list("pk", flat=True))
+        counts = {
+            "farms": len(farm_ids),
+            "sitevisits": self.write(SiteVisit, self.visit_rows(farm_ids, agent_ids)),
+            "statements": self.write(Statement, self.statement_rows(farm_ids)),
+            "employee_stats": self.write(FarmEmployeeStats, self.stats_rows(farm_ids, admin_id)),
+            "notices": self.write(Notice, self.notice_rows(admin_id)),
+        }
+
+        self.log("Rebuilding derived tables...")
+        for model in (Farm, SiteVisit, Statement, FarmEmployeeStats, Notice):
+            bulk_changed.send(sender=model, pks=None)
+        return counts
+
+
+def generate(farms, visits, years, **options):
+    """Write a synthetic dataset; returns {table: rows written}."""
+    return Generator(farms, visits, years, **options).run()
+
+
+def _delete(queryset):
+    """`DELETE ... WHERE id IN (<queryset>)` in one statement: no rows loaded, no signals sent."""
+    model = queryset.model
+    quote = connection.ops.quote_name
+    sql, params = queryset.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({sql})", params,
+        )
+        return cursor.rowcount
+
+
+def clear():
+    """
+    Delete every generated user, with their farms and everything under them.
+
+    The farms' rows are removed with one DELETE per table rather than the ORM
+    cascade, which would run every farm's pre_delete receivers and write a
+    sync tombstone per row for a dataset no client has synced. The derived
+    rows of those farms go with them; the portfolio-wide rollups and ledger
+    are rebuilt once at the end.
+    """
+    User = get_user_model()
+    users = User.objects.filter(username__startswith=PREFIX)
+    farms = Farm.objects.filter(owner__in=users)
+    notices = Notice.objects.filter(issued_by__in=users)
+    deleted = 0
+    with transaction.atomic():
+        # Derived rows first, then the rows they are derived from
+        deleted += _delete(SearchEntry.objects.filter(farm__in=farms))
+        deleted += _delete(SearchEntry.objects.filter(kind="notice", object_id__in=notices.values("pk")))
+        for model in (FarmSummary, MissingEmployeeReturn, StatementLedger, SiteVisit, Statement, FarmEmployeeStats):
+            deleted += _delete(model.objects.filter(farm__in=farms))
+        deleted += _delete(farms)
+        deleted += _delete(notices)
+        # A few thousand users: the ORM clears their other references
+        deleted += users.delete()[0]
+
+    # Nothing is left to index or summarize for the deleted farms; the rollups
+    # and portfolio ledger (farm_ids / months None) are rebuilt from what remains
+    for model in (Farm, SiteVisit, Notice, Statement):
+        bulk_changed.send(sender=model, pks=[], farm_ids=set())
+    bulk_changed.send(sender=FarmEmployeeStats, pks=[], farm_ids=set(), months=None)
+    return deleted
@@ -0,0 +1,127 @@
+"""
+Streaming CSV export shared by the admin export action and the list views.
+
+Rows are read with `values_list(...).iterator()` (`aiterator()` under ASGI) so only one chunk of tuples is in
+memory at a time, foreign keys are rendered through a JOINed column instead of a
+per-row related-object fetch, and the CSV is written straight into a
+StreamingHttpResponse.
+"""
+import csv
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import FieldDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+
+EXPORT_CHUNK_SIZE = 2000
+# Models a background export job may read (the job's arguments name the model)
+EXPORTABLE_MODELS = ("farm.Farm", "farm.SiteVisit", "farm.Notice", "farm.Statement", "farm.FarmEmployeeStats")
+
+
+class Echo:
+    """File-like object whose write() just returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def display_field(model):
+    """Column used to render a related object of `model` in an export."""
+    if model is get_user_model():
+        return model.USERNAME_FIELD
+    for name in ("name", "title"):
+        try:
+            model._meta.get_field(name)
+            return name
+        except FieldDoesNotExist:
+            continue
+    return model._meta.pk.name
+
+
+def export_columns(model, field_names=None):
+    """
+    Return (headers, lookups) for `model`. Forward foreign keys become a
+    `<fk>__<display field>` lookup so they are resolved by the JOIN. Raises
+    FieldDoesNotExist for a name that is not one of the model's columns.
+    """
+    opts = model._meta
+    if field_names is None:
+        field_names = [f.name for f in opts.fields]
+
+    headers, lookups = [], []
+    for name in field_names:
+        if name == "pk":
+            name = opts.pk.name
+        field = opts.get_field(name)
+        if not field.concrete or field.many_to_many:
+            raise FieldDoesNotExist(f"{model.__name__}.{name} is not a column and cannot be exported.")
+        if field.many_to_one or field.one_to_one:
+            lookups.append(f"{name}__{display_field(field.related_model)}")
+        else:
+            lookups.append(name)
+        headers.append(name)
+    return headers, lookups
+
+
+def iter_csv_rows(queryset, field_names=None, chunk_size=EXPORT_CHUNK_SIZE):
+    headers, lookups = export_columns(queryset.model, field_names)
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        yield writer.writerow(row)
+
+
+async def aiter_csv_rows(queryset, field_names=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """iter_csv_rows() reading through `aiterator()`, for responses served by async views."""
+    headers, lookups = export_columns(queryset.model, field_names)
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    # values_list().aiterator() opens its cursor on the event loop (Django 5.2); values() does not
+    async for row in queryset.values(*lookups).aiterator(chunk_size=chunk_size):
+        yield writer.writerow(row.values())
+
+
+def stream_csv(queryset, field_names=None, filename=None, asynchronous=False):
+    """
+    Return a StreamingHttpResponse exporting `queryset` as CSV. Pass
+    `asynchronous=True` when serving under ASGI, which otherwise reads a sync
+    iterator into memory whole before sending the first byte (and WSGI does
+    the same with an async one).
+    """
+    filename = filename or f"{queryset.model._meta.label_lower}.csv"
+    # Reject unknown columns now; the row generators only run once the response streams
+    export_columns(queryset.model, field_names)
+    rows = (aiter_csv_rows if asynchronous else iter_csv_rows)(queryset, field_names)
+    response = StreamingHttpResponse(rows, content_type="text/csv")
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+class CSVExportMixin:
+    """
+    Adds `?export=csv` to an AsyncListView (core.asyncviews): the view's own
+    (filtered, scoped) queryset is streamed as CSV instead of rendering the
+    page, or with `&background=1` written by a background job. `export_fields`
+    limits the columns; by default every concrete field is exported.
+    """
+    export_fields = None
+
+    async def get(self, request, *args, **kwargs):
+        if request.GET.get("export") == "csv":
+            if request.GET.get("background"):
+                from farm.tasks import enqueue_export
+
+                if not request.user.is_authenticated:
+                    # A job is only shown to, and run for, the user who queued it
+                    return redirect_to_login(request.get_full_path())
+
+                job = await sync_to_async(enqueue_export)(
+                    self.get_queryset(), self.export_fields, created_by=request.user
+                )
+                return redirect("jobs:job_detail", pk=job.pk)
+            asynchronous = isinstance(request, ASGIRequest)
+            return stream_csv(self.get_queryset(), self.export_fields, asynchronous=asynchronous)
+        return await super().get(request, *args, **kwargs)
@@ -1,5 +1,6 @@
 from django import forms
 from accounts.models import CustomUser as User
+from .autocomplete import AutocompleteSelect
 from .models import Farm, Statement, SiteVisit, FarmEmployeeStats, Notice
 
 
@@ -34,6 +35,7 @@ class StatementForm(forms.ModelForm):
             "total_sales"
         ]
         widgets = {
+            "farm": AutocompleteSelect("farms"),
             "period_start": forms.DateInput(attrs={"type": "date"}),
             "period_end": forms.DateInput(attrs={"type": "date"}),
         }
@@ -56,6 +58,8 @@ class SiteVisitForm(forms.ModelForm):
             "resolution_notes",
         ]
         widgets = {
+            "farm": AutocompleteSelect("farms"),
+            "agent": AutocompleteSelect("agents"),
             "visit_date": forms.DateInput(attrs={"type": "date"}),
         }
 
@@ -73,13 +77,42 @@ class SiteVisitForm(forms.ModelForm):
             field.widget.attrs["class"] = f"{existing_classes} form-control".strip()
 
 
+# Headcount and payroll fields on FarmEmployeeStats that may never be negative
+EMPLOYEE_COUNT_FIELDS = ["citizen_male", "citizen_female", "expatriate_male", "expatriate_female"]
+EMPLOYEE_PAYROLL_FIELDS = ["basic_pay_usd", "basic_pay_zwl",
+                           "employees_contribution_usd", "employees_contribution_zwl",
+                           "employers_contribution_usd", "employers_contribution_zwl",
+                           "arrears_usd", "arrears_zwl"]
+
+
+def non_negative_errors(cleaned):
+    """
+    Yield (field, message) for every negative headcount/payroll value.
+    Shared by FarmEmployeeStatsForm and the bulk importer so both apply the same rules.
+    """
+    for f in EMPLOYEE_COUNT_FIELDS + EMPLOYEE_PAYROLL_FIELDS:
+        v = cleaned.get(f)
+        if v is not None and v < 0:
+            yield f, "Value cannot be negative."
+
+
+def reporting_month_field():
+    """The reporting month as entered in the UI and in import files: `2025-03` or any day of it."""
+    # Only the month counts; the model stores its first day
+    return forms.DateField(
+        input_formats=["%Y-%m", "%Y-%m-%d"], help_text="The month this record applies to.",
+        widget=forms.DateInput(attrs={"type": "month", "class": "form-control"}, format="%Y-%m"),
+    )
+
+
 class FarmEmployeeStatsForm(forms.ModelForm):
+    reporting_month = reporting_month_field()
+
     class Meta:
         model = FarmEmployeeStats
         # exclude auto fields and created_by which should be set server-side
         exclude = ("created_by", "created", "updated", "total_contribution_usd", "total_contribution_zwl")
         widgets = {
-            "reporting_month": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
             "employment_type": forms.Select(attrs={"class": "form-control"}),
             "citizen_male": forms.NumberInput(attrs={"min": 0, "class": "form-control"}),
             "citizen_female": forms.NumberInput(attrs={"min": 0, "class": "form-control"}),
@@ -94,7 +127,7 @@ class FarmEmployeeStatsForm(forms.ModelForm):
             "arrears_usd": forms.NumberInput(attrs={"step": "0.01", "min": 0, "class": "form-control"}),
             "arrears_zwl": forms.NumberInput(attrs={"step": "0.01", "min": 0, "class": "form-control"}),
             "created_by": forms.HiddenInput(),
-            "farm": forms.Select(attrs={"class": "form-control"}),
+            "farm": AutocompleteSelect("farms", attrs={"class": "form-control"}),
         }
 
 
@@ -107,20 +140,8 @@ class FarmEmployeeStatsForm(forms.ModelForm):
 
     def clean(self):
         cleaned = super().clean()
-        # enforce non-negative counts/payments
-        int_fields = ["citizen_male", "citizen_female", "expatriate_male", "expatriate_female"]
-        dec_fields = ["basic_pay_usd", "basic_pay_zwl",
-                      "employees_contribution_usd", "employees_contribution_zwl",
-                      "employers_contribution_usd", "employers_contribution_zwl",
-                      "arrears_usd", "arrears_zwl"]
-        for f in int_fields:
-            v = cleaned.get(f)
-            if v is not None and v < 0:
-                self.add_error(f, "Value cannot be negative.")
-        for f in dec_fields:
-            v = cleaned.get(f)
-            if v is not None and v < 0:
-                self.add_error(f, "Value cannot be negative.")
+        for field, message in non_negative_errors(cleaned):
+            self.add_error(field, message)
         return cleaned
 
     def save(self, commit=True, created_by=None):
@@ -131,16 +152,7 @@ class FarmEmployeeStatsForm(forms.ModelForm):
         inst = super(FarmEmployeeStatsForm, self).save(commit=False)
 
         # compute totals (sum of contributions + arrears)
-        inst.total_contribution_usd = (
-            (inst.employees_contribution_usd or 0)
-            + (inst.employers_contribution_usd or 0)
-            + (inst.arrears_usd or 0)
-        )
-        inst.total_contribution_zwl = (
-            (inst.employees_contribution_zwl or 0)
-            + (inst.employers_contribution_zwl or 0)
-            + (inst.arrears_zwl or 0)
-        )
+        inst.compute_totals()
 
         if created_by and getattr(inst, "created_by", None) is None:
             try:
@@ -162,8 +174,77 @@ class NoticeForm(forms.ModelForm):
             "message",
             "issued_by"
         ]
+        widgets = {
+            "issued_by": AutocompleteSelect("users"),
+        }
 
     def __init__(self, *args, **kwargs):
         super(NoticeForm, self).__init__(*args, **kwargs)
         for _, field in self.fields.items():
-            field.widget.attrs["class"] = "form-control"
\ No newline at end of file
+            field.widget.attrs["class"] = "form-control"
+
+class FarmEmployeeStatsRowForm(forms.Form):
+    """
+    Validates one row of a bulk employee-stats import using the model's own form
+    fields and the same rules as FarmEmployeeStatsForm.clean, without any queries:
+    the farm is resolved in bulk by the importer and uniqueness is an upsert.
+    """
+
+    @classmethod
+    def clean_values(cls, values):
+        """
+        Validate a plain dict against the shared field definitions without binding
+        a form (which deep-copies every field per row). Returns (cleaned, errors)
+        where errors maps field name -> list of messages.
+        """
+        cleaned, errors = {}, {}
+        for name, field in cls.base_fields.items():
+            try:
+                cleaned[name] = field.clean(values.get(name))
+            except forms.ValidationError as exc:
+                errors[name] = exc.messages
+        if not errors:
+            for name, message in non_negative_errors(cleaned):
+                errors.setdefault(name, []).append(message)
+        return cleaned, errors
+
+
+FarmEmployeeStatsRowForm.base_fields = {
+    "reporting_month": reporting_month_field(),
+    **forms.fields_for_model(FarmEmployeeStats, fields=["employment_type"] + EMPLOYEE_COUNT_FIELDS + EMPLOYEE_PAYROLL_FIELDS),
+}
+
+
+class FarmEmployeeStatsImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV (.csv) or Excel (.xlsx) file with one row per farm, month and employment type.")
+    background = forms.BooleanField(
+        required=False, label="Run as a background job",
+        help_text="Recommended for large files; progress is shown on the job page.",
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["file"].widget.attrs["class"] = "form-control"
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not upload.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("Upload a .csv or .xlsx file.")
+        return upload
+
+
+class ComplianceFilterForm(forms.Form):
+    """Filters for the missing-returns report; every field is optional."""
+    month = forms.DateField(required=False, input_formats=["%Y-%m", "%Y-%m-%d"],
+                            widget=forms.DateInput(attrs={"type": "month"}, format="%Y-%m"))
+    employment_type = forms.ChoiceField(required=False,
+                                        choices=[("", "Any return")] + FarmEmployeeStats.EMPLOYMENT_TYPES)
+    sector = forms.ChoiceField(required=False,
+                               choices=[("", "All sectors")] + Farm._meta.get_field("sector").choices)
+    owner = forms.ModelChoiceField(required=False, queryset=User.objects.all(), widget=AutocompleteSelect("users"),
+                                   empty_label="All owners")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs["class"] = "form-control"
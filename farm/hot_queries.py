@@ -0,0 +1,83 @@
+"""
+Registry of the portal's hot queries, i.e. the filter/sort paths the list views,
+dashboard and detail pages run on every request. `manage.py explain_hot_queries`
+prints the database plan for each one so index usage can be checked per backend.
+"""
+import datetime
+
+from farm.models import Farm, SiteVisit, Notice, Statement, FarmEmployeeStats
+
+HOT_QUERIES = {}
+
+# Placeholder ids; the plan does not depend on whether the rows exist.
+SAMPLE_ID = 1
+
+
+def register(name):
+    """Register a zero-argument callable returning the QuerySet to explain."""
+    def decorator(func):
+        HOT_QUERIES[name] = func
+        return func
+    return decorator
+
+
+@register("farm_list_for_owner")
+def farm_list_for_owner():
+    return Farm.objects.filter(owner_id=SAMPLE_ID).order_by("-created")[:20]
+
+
+@register("farm_list_cursor")
+def farm_list_cursor():
+    return Farm.objects.order_by("-created", "-id")[:21]
+
+
+@register("sitevisit_list_cursor")
+def sitevisit_list_cursor():
+    return SiteVisit.objects.select_related("farm", "agent").order_by("-visit_date", "-id")[:21]
+
+
+@register("sitevisit_list_for_farm")
+def sitevisit_list_for_farm():
+    return SiteVisit.objects.filter(farm_id=SAMPLE_ID).order_by("-visit_date", "-id")[:21]
+
+
+@register("statement_list_cursor")
+def statement_list_cursor():
+    return Statement.objects.select_related("farm").order_by("-created", "-id")[:21]
+
+
+@register("statement_list_for_farm")
+def statement_list_for_farm():
+    return Statement.objects.filter(farm_id=SAMPLE_ID).order_by("-created", "-id")[:21]
+
+
+@register("employee_stats_list_for_farm")
+def employee_stats_list_for_farm():
+    return FarmEmployeeStats.objects.filter(farm_id=SAMPLE_ID).order_by("-created", "-id")[:21]
+
+
+@register("employee_stats_for_month")
+def employee_stats_for_month():
+    return FarmEmployeeStats.objects.filter(farm_id=SAMPLE_ID).for_month(datetime.date(2025, 1, 1))
+
+
+@register("employee_stats_between_months")
+def employee_stats_between_months():
+    return FarmEmployeeStats.objects.between_months(datetime.date(2024, 1, 1), datetime.date(2024, 12, 1)).filter(
+        employment_type="Permanent"
+    )
+
+
+@register("employee_stats_latest_per_farm")
+def employee_stats_latest_per_farm():
+    return FarmEmployeeStats.objects.filter(farm__owner_id=SAMPLE_ID).latest_per_farm()
+
+
+@register("active_notices")
+def active_notices():
+    return Notice.objects.filter(is_active=True).order_by("-created")[:6]
+
+
+@register("dashboard_visits_for_owner")
+def dashboard_visits_for_owner():
+    return SiteVisit.objects.filter(farm__owner_id=SAMPLE_ID).order_by("-visit_date")[:5]
@@ -0,0 +1,245 @@
+"""
+Bulk import of monthly FarmEmployeeStats returns from CSV/Excel files.
+
+Rows are streamed from the file, validated in chunks with FarmEmployeeStatsRowForm
+(the same rules as the UI form), farms are resolved with one query per chunk and
+each chunk is upserted with a single `bulk_create(update_conflicts=True)` against
+the (farm, reporting_month, employment_type) unique key. A blank numeric cell
+keeps the stored value of a return being re-imported (one more query per chunk
+when any cell is blank) and is zero in a new one. Invalid rows are reported
+with their line number and skipped; they never abort the rest of the file.
+"""
+import csv
+import io
+import zipfile
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+
+from farm.forms import EMPLOYEE_COUNT_FIELDS, EMPLOYEE_PAYROLL_FIELDS, FarmEmployeeStatsRowForm
+from farm.models import Farm, FarmEmployeeStats
+from farm.signals import bulk_changed
+
+UNIQUE_FIELDS = ["farm", "reporting_month", "employment_type"]
+NUMERIC_FIELDS = EMPLOYEE_COUNT_FIELDS + EMPLOYEE_PAYROLL_FIELDS
+UPDATE_FIELDS = NUMERIC_FIELDS + [
+    "total_contribution_usd", "total_contribution_zwl", "updated",
+]
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be read (bad format, missing columns...)."""
+
+
+@dataclass
+class RowError:
+    line: int
+    messages: list
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    imported: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def _normalize_header(name):
+    return str(name or "").strip().lower().replace(" ", "_")
+
+
+def _read_csv(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    yield [_normalize_header(h) for h in header]
+    yield from reader
+
+
+def _read_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFileError("Reading .xlsx files requires the 'openpyxl' package.")
+
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as exc:
+        raise ImportFileError("The file is not a valid Excel (.xlsx) workbook.") from exc
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield [_normalize_header(h) for h in header]
+        for row in rows:
+            yield ["" if v is None else v for v in row]
+    finally:
+        workbook.close()
+
+
+def iter_records(fileobj, filename):
+    """
+    Yield (line_number, {column: value}) for every data row of a CSV/XLSX file.
+    A file that cannot be parsed raises ImportFileError, also part way through.
+    """
+    if filename.lower().endswith(".xlsx"):
+        rows = _read_xlsx(fileobj)
+    else:
+        rows = _read_csv(fileobj)
+    try:
+        yield from _records(rows)
+    except UnicodeDecodeError as exc:
+        raise ImportFileError("The file is not UTF-8 text; save it as a UTF-8 CSV or as .xlsx.") from exc
+    except csv.Error as exc:
+        raise ImportFileError(f"The file is not a valid CSV file: {exc}.") from exc
+    except zipfile.BadZipFile as exc:
+        raise ImportFileError("The file is not a valid Excel (.xlsx) workbook.") from exc
+
+
+def _records(rows):
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError("The file is empty.")
+    if "farm" not in header and "account_number" not in header:
+        raise ImportFileError("The file needs a 'farm' (id) or 'account_number' column.")
+    missing = {"reporting_month", "employment_type"} - set(header)
+    if missing:
+        raise ImportFileError(f"Missing required columns: {', '.join(sorted(missing))}.")
+
+    for line, row in enumerate(rows, start=2):
+        if not any(str(v).strip() for v in row):
+            continue
+        yield line, dict(zip(header, row))
+
+
+def _resolve_farms(records, farm_qs):
+    """Map every farm reference in the chunk to a farm id with one query."""
+    ids, accounts = set(), set()
+    for _, data in records:
+        ref = str(data.get("farm") or "").strip()
+        if ref.isdigit():
+            ids.add(int(ref))
+        elif data.get("account_number"):
+            accounts.add(str(data["account_number"]).strip())
+
+    by_id, by_account = {}, {}
+    if ids or accounts:
+        for pk, account in farm_qs.filter(pk__in=ids).values_list("pk", "account_number").union(
+            farm_qs.filter(account_number__in=accounts).values_list("pk", "account_number")
+        ):
+            by_id[pk] = pk
+            by_account.setdefault(account, pk)
+    return by_id, by_account
+
+
+def _build(line, data, farms, created_by):
+    """Return (instance, blank numeric fields, None) for a valid row or (None, None, RowError)."""
+    by_id, by_account = farms
+    ref = str(data.get("farm") or "").strip()
+    if ref:
+        farm_id = by_id.get(int(ref)) if ref.isdigit() else None
+    else:
+        farm_id = by_account.get(str(data.get("account_number") or "").strip())
+    if farm_id is None:
+        return None, None, RowError(line, ["farm: Unknown farm or not permitted."])
+
+    # Blank numeric cells validate as zero; _keep_stored() decides what they become.
+    blanks = [name for name in NUMERIC_FIELDS if str(data.get(name, "")).strip() == ""]
+    values = {name: 0 if name in blanks else data.get(name) for name in NUMERIC_FIELDS}
+    values["reporting_month"] = data.get("reporting_month")
+    values["employment_type"] = str(data.get("employment_type") or "").strip()
+
+    cleaned, errors = FarmEmployeeStatsRowForm.clean_values(values)
+    if errors:
+        return None, None, RowError(line, [
+            f"{name}: {message}" for name, messages in errors.items() for message in messages
+        ])
+
+    obj = FarmEmployeeStats(farm_id=farm_id, created_by=created_by, **cleaned)
+    obj.normalize_month()
+    obj.compute_totals()
+    return obj, blanks, None
+
+
+def _keep_stored(batch):
+    """Give the blank cells of rows that re-import a stored return its stored values, with one query."""
+    partial = {key: (obj, blanks) for key, (obj, blanks) in batch.items() if blanks}
+    if not partial:
+        return
+    stored = FarmEmployeeStats.objects.filter(
+        farm_id__in={key[0] for key in partial}, reporting_month__in={key[1] for key in partial},
+    ).values("farm_id", "reporting_month", "employment_type", *NUMERIC_FIELDS)
+    for row in stored:
+        entry = partial.get((row["farm_id"], row["reporting_month"], row["employment_type"]))
+        if entry is None:
+            continue
+        obj, blanks = entry
+        for name in blanks:
+            setattr(obj, name, row[name])
+        obj.compute_totals()
+
+
+def import_employee_stats(fileobj, filename, farm_qs=None, created_by=None,
+                          chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Import a CSV/XLSX file of employee stats and return an ImportResult.
+
+    `farm_qs` restricts which farms rows may target (e.g. a manager's own farms).
+    `progress`, if given, is called with the running ImportResult after each chunk.
+    """
+    farm_qs = Farm.objects.all() if farm_qs is None else farm_qs
+    result = ImportResult()
+    records = iter_records(fileobj, filename)
+    months, farm_ids = set(), set()
+
+    try:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            result.rows += len(chunk)
+            farms = _resolve_farms(chunk, farm_qs)
+
+            # Last row wins when the same key appears twice in a chunk; a single
+            # INSERT ... ON CONFLICT may not touch the same row twice.
+            batch = {}
+            for line, data in chunk:
+                obj, blanks, error = _build(line, data, farms, created_by)
+                if error:
+                    result.errors.append(error)
+                else:
+                    batch[(obj.farm_id, obj.reporting_month, obj.employment_type)] = obj, blanks
+
+            if batch:
+                with transaction.atomic():
+                    _keep_stored(batch)
+                    objs = [obj for obj, _ in batch.values()]
+                    FarmEmployeeStats.objects.bulk_create(
+                        objs,
+                        update_conflicts=True,
+                        unique_fields=UNIQUE_FIELDS,
+                        update_fields=UPDATE_FIELDS,
+                    )
+                result.imported += len(batch)
+                months.update(obj.reporting_month for obj in objs)
+                farm_ids.update(obj.farm_id for obj in objs)
+            if progress:
+                progress(result)
+    finally:
+        # Chunks already committed stay when a later part of the file cannot be read
+        if result.imported:
+            bulk_changed.send(sender=FarmEmployeeStats, pks=None, months=months, farm_ids=farm_ids)
+    return result
@@ -0,0 +1,332 @@
+"""
+Statement ledger: per-farm and portfolio running balances by currency and month.
+
+Each statement contributes its sales, expenses and net (`balance`) to one
+StatementLedger row (farm, currency, month of period_end) and one
+StatementPeriodSummary row (currency, month). Writes are applied as deltas: the
+period row is adjusted and the running balance of that month and every later
+month is shifted with a single range UPDATE, so reads never re-sum statements.
+A farm's delete takes its statements out of the portfolio summary once, per
+currency and month, and lets its ledger rows go in the cascade. A delta that
+finds no row to subtract from means the account's rows no longer match the
+statements; that account is rebuilt from them instead.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from farm import scoping
+from farm.models import Statement, StatementLedger, StatementPeriodSummary
+from farm.signals import deleted_with_farm
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def snapshot(statement):
+    return {
+        "farm_id": statement.farm_id,
+        "currency": statement.currency,
+        "month": month_of(statement.period_end),
+        "total_sales": statement.total_sales or 0,
+        "total_expenses": statement.total_expenses or 0,
+        "net": (statement.total_sales or 0) - (statement.total_expenses or 0),
+    }
+
+
+def rebuild_account(model, scope):
+    """
+    Recompute the rows of one account, a farm and currency (StatementLedger)
+    or a portfolio currency (StatementPeriodSummary), from the statements.
+    """
+    grouped = (
+        Statement.objects.filter(**scope).order_by().values("period_end")
+        .annotate(sales=Sum("total_sales"), expenses=Sum("total_expenses"), count=Count("pk"))
+    )
+    months = defaultdict(lambda: {"statements": 0, "total_sales": Decimal(0), "total_expenses": Decimal(0)})
+    for group in grouped:
+        row = months[month_of(group["period_end"])]
+        row["statements"] += group["count"]
+        row["total_sales"] += group["sales"] or 0
+        row["total_expenses"] += group["expenses"] or 0
+    rows, running = [], Decimal(0)
+    for month, row in sorted(months.items()):
+        net = row["total_sales"] - row["total_expenses"]
+        running += net
+        rows.append(model(**scope, month=month, net=net, running_balance=running, **row))
+    with transaction.atomic():
+        model.objects.filter(**scope).delete()
+        model.objects.bulk_create(rows)
+
+
+def _apply(model, scope, month, values, sign):
+    """
+    Apply one delta to an account. Returns True when the account was rebuilt
+    from the statements instead, which already include the change.
+    """
+    rows = model.objects.filter(**scope)
+    changes = {
+        "statements": F("statements") + sign * values.get("statements", 1),
+        "total_sales": F("total_sales") + sign * values["total_sales"],
+        "total_expenses": F("total_expenses") + sign * values["total_expenses"],
+        "net": F("net") + sign * values["net"],
+    }
+    if not rows.filter(month=month).update(**changes):
+        if sign < 0:
+            # Nothing to subtract from: the account is out of step with the statements
+            settings.LOGGER.warning("{} {} has no {} row to subtract from; rebuilding it", model.__name__, scope, month)
+            rebuild_account(model, scope)
+            return True
+        opening = rows.filter(month__lt=month).order_by("-month").values_list("running_balance", flat=True).first()
+        model.objects.get_or_create(**scope, month=month, defaults={"running_balance": opening or 0})
+        rows.filter(month=month).update(**changes)
+    rows.filter(month__gte=month).update(running_balance=F("running_balance") + sign * values["net"])
+    if sign < 0:
+        rows.filter(month=month, statements__lte=0).delete()
+    return False
+
+
+def merge(snapshots):
+    """Sum snapshots per (farm, currency, month), counting them in `statements`."""
+    merged = {}
+    for values in snapshots:
+        key = (values["farm_id"], values["currency"], values["month"])
+        row = merged.setdefault(key, {
+            "farm_id": key[0], "currency": key[1], "month": key[2],
+            "statements": 0, "total_sales": 0, "total_expenses": 0, "net": 0,
+        })
+        row["statements"] += values.get("statements", 1)
+        for name in ("total_sales", "total_expenses", "net"):
+            row[name] += values[name]
+    return list(merged.values())
+
+
+def apply_delta(values, sign, rebuilt=None):
+    """
+    Add (sign=1) or remove (sign=-1) one statement from the farm ledger and the
+    portfolio summary, or several merged ones (see merge()). Accounts in
+    `rebuilt` (a set shared by the deltas of one change) were recomputed from
+    the statements already and are skipped; rebuilt ones are added to it.
+    """
+    rebuilt = set() if rebuilt is None else rebuilt
+    accounts = [
+        (StatementLedger, {"farm_id": values["farm_id"], "currency": values["currency"]}),
+        (StatementPeriodSummary, {"currency": values["currency"]}),
+    ]
+    with transaction.atomic():
+        for model, scope in accounts:
+            key = (model, tuple(sorted(scope.items())))
+            if key not in rebuilt and _apply(model, scope, values["month"], values, sign):
+                rebuilt.add(key)
+
+
+def rebuild():
+    """Recompute both ledgers from the statements table. Returns rows written."""
+    grouped = (
+        Statement.objects.order_by()
+        .values("farm_id", "currency", "period_end")
+        .annotate(sales=Sum("total_sales"), expenses=Sum("total_expenses"), count=Count("pk"))
+    )
+    farm_rows = defaultdict(lambda: {"statements": 0, "total_sales": Decimal(0), "total_expenses": Decimal(0)})
+    for group in grouped.iterator():
+        row = farm_rows[(group["farm_id"], group["currency"], month_of(group["period_end"]))]
+        row["statements"] += group["count"]
+        row["total_sales"] += group["sales"] or 0
+        row["total_expenses"] += group["expenses"] or 0
+
+    portfolio_rows = defaultdict(lambda: {"statements": 0, "total_sales": Decimal(0), "total_expenses": Decimal(0)})
+    for (farm_id, currency, month), row in farm_rows.items():
+        target = portfolio_rows[(currency, month)]
+        for key in target:
+            target[key] += row[key]
+
+    ledger, running = [], defaultdict(Decimal)
+    for (farm_id, currency, month), row in sorted(farm_rows.items()):
+        net = row["total_sales"] - row["total_expenses"]
+        running[(farm_id, currency)] += net
+        ledger.append(StatementLedger(
+            farm_id=farm_id, currency=currency, month=month, net=net,
+            running_balance=running[(farm_id, currency)], **row,
+        ))
+
+    summary, running = [], defaultdict(Decimal)
+    for (currency, month), row in sorted(portfolio_rows.items()):
+        net = row["total_sales"] - row["total_expenses"]
+        running[currency] += net
+        summary.append(StatementPeriodSummary(
+            currency=currency, month=month, net=net, running_balance=running[currency], **row,
+        ))
+
+    with transaction.atomic():
+        StatementLedger.objects.all().delete()
+        StatementPeriodSummary.objects.all().delete()
+        StatementLedger.objects.bulk_create(ledger, batch_size=1000)
+        StatementPeriodSummary.objects.bulk_create(summary, batch_size=1000)
+    return len(ledger) + len(summary)
+
+
+# Read API --------------------------------------------------------------------
+
+SERIES_FIELDS = ("currency", "month", "statements", "total_sales", "total_expenses", "net", "running_balance")
+
+
+def _series_rows(qs, currency):
+    if currency:
+        qs = qs.filter(currency=currency)
+    return qs.order_by("currency", "-month").values(*SERIES_FIELDS)
+
+
+def _fold_series(rows, months):
+    series = defaultdict(list)
+    # newest `months` rows per currency, returned oldest first for charting
+    for row in rows:
+        points = series[row["currency"]]
+        if len(points) < months:
+            points.append(row)
+    return {cur: points[::-1] for cur, points in series.items()}
+
+
+def _series(qs, currency, months):
+    return _fold_series(_series_rows(qs, currency), months)
+
+
+def farm_series(farm, currency=None, months=12):
+    """{currency: [period rows oldest -> newest]} for one farm."""
+    farm_id = getattr(farm, "pk", farm)
+    return _series(StatementLedger.objects.filter(farm_id=farm_id), currency, months)
+
+
+async def afarm_series(farm, currency=None, months=12):
+    farm_id = getattr(farm, "pk", farm)
+    rows = _series_rows(StatementLedger.objects.filter(farm_id=farm_id), currency)
+    return _fold_series([row async for row in rows], months)
+
+
+def portfolio_series(currency=None, months=12):
+    """{currency: [period rows oldest -> newest]} across all farms."""
+    return _series(StatementPeriodSummary.objects.all(), currency, months)
+
+
+def user_series(user, currency=None, months=12):
+    """
+    {currency: [period rows oldest -> newest]} across the farms `user` may see:
+    the portfolio summary, or for a manager their farms' ledger rows summed
+    per month with the running balance accumulated over them.
+    """
+    if not scoping.is_restricted(user):
+        return portfolio_series(currency, months)
+    qs = StatementLedger.objects.for_user(user)
+    if currency:
+        qs = qs.filter(currency=currency)
+    grouped = qs.order_by("currency", "month").values("currency", "month").annotate(
+        count=Sum("statements"), sales=Sum("total_sales"), expenses=Sum("total_expenses"), period_net=Sum("net"),
+    )
+    series, running = defaultdict(list), defaultdict(Decimal)
+    for row in grouped:
+        running[row["currency"]] += row["period_net"]
+        series[row["currency"]].append({
+            "currency": row["currency"], "month": row["month"], "statements": row["count"],
+            "total_sales": row["sales"], "total_expenses": row["expenses"], "net": row["period_net"],
+            "running_balance": running[row["currency"]],
+        })
+    return {cur: points[-months:] for cur, points in series.items()}
+
+
+def _totals_rows(owner_id):
+    if owner_id is None:
+        qs = StatementPeriodSummary.objects.all()
+    else:
+        qs = StatementLedger.objects.filter(farm__owner_id=owner_id)
+    return qs.order_by().values("currency").annotate(
+        sales=Sum("total_sales"), expenses=Sum("total_expenses"), balance=Sum("net"), statements_count=Sum("statements"),
+    )
+
+
+def _totals_dict(rows):
+    return {
+        row["currency"]: {
+            "sales": row["sales"], "expenses": row["expenses"],
+            "balance": row["balance"], "statements": row["statements_count"],
+        }
+        for row in rows
+    }
+
+
+def totals(owner_id=None):
+    """
+    {currency: {sales, expenses, balance, statements}} for the whole portfolio, or
+    for one owner's farms. Reads period rows only, never statements.
+    """
+    return _totals_dict(_totals_rows(owner_id))
+
+
+async def atotals(owner_id=None):
+    return _totals_dict([row async for row in _totals_rows(owner_id)])
+
+
+# Signal receivers ------------------------------------------------------------
+
+def statement_pre_save(sender, instance, raw=False, **kwargs):
+    instance._ledger_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = Statement.objects.filter(pk=instance.pk).only(
+        "farm_id", "currency", "period_end", "total_sales", "total_expenses"
+    ).first()
+    if previous is not None:
+        instance._ledger_previous = snapshot(previous)
+
+
+def statement_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_ledger_previous", None)
+    rebuilt = set()
+    with transaction.atomic():
+        if previous is not None:
+            apply_delta(previous, -1, rebuilt)
+        apply_delta(snapshot(instance), 1, rebuilt)
+
+
+def statement_post_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_farm(instance, origin):
+        return
+    apply_delta(snapshot(instance), -1)
+
+
+def farm_pre_delete(sender, instance, **kwargs):
+    # The farm's ledger rows cascade with it; only the portfolio needs adjusting
+    grouped = (
+        Statement.objects.filter(farm_id=instance.pk).order_by()
+        .values("currency", "period_end")
+        .annotate(sales=Sum("total_sales"), expenses=Sum("total_expenses"), count=Count("pk"))
+    )
+    removed = merge(
+        {
+            "farm_id": instance.pk, "currency": group["currency"], "month": month_of(group["period_end"]),
+            "statements": group["count"], "total_sales": group["sales"] or 0,
+            "total_expenses": group["expenses"] or 0, "net": (group["sales"] or 0) - (group["expenses"] or 0),
+        }
+        for group in grouped
+    )
+    with transaction.atomic():
+        for row in sorted(removed, key=lambda row: row["month"]):
+            scope = {"currency": row["currency"]}
+            if _apply(StatementPeriodSummary, scope, row["month"], row, -1):
+                # Rebuilt while the farm's statements are still there: take them out now
+                _apply(StatementPeriodSummary, scope, row["month"], row, -1)
+
+
+def statements_bulk_changed(sender, removed=None, **kwargs):
+    # Bulk deletes (farm.bulk) pass snapshots of the removed rows; anything else rebuilds
+    if removed is None:
+        rebuild()
+        return
+    rebuilt = set()
+    with transaction.atomic():
+        for values in merge(removed):
+            apply_delta(values, -1, rebuilt)
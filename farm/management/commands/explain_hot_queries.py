@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from farm.hot_queries import HOT_QUERIES
+
+
+class Command(BaseCommand):
+    help = "Print the database query plan (EXPLAIN / EXPLAIN QUERY PLAN) for each registered hot query."
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Only explain these queries (default: all).")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--analyze", action="store_true",
+            help="Run EXPLAIN ANALYZE (PostgreSQL only); executes the query.",
+        )
+        parser.add_argument("--list", action="store_true", help="List registered query names and exit.")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name in HOT_QUERIES:
+                self.stdout.write(name)
+            return
+
+        names = options["names"] or list(HOT_QUERIES)
+        unknown = [n for n in names if n not in HOT_QUERIES]
+        if unknown:
+            raise CommandError(f"Unknown hot queries: {', '.join(unknown)}")
+
+        using = options["database"]
+        vendor = connections[using].vendor
+        explain_options = {}
+        if options["analyze"]:
+            if vendor != "postgresql":
+                raise CommandError("--analyze is only supported on PostgreSQL.")
+            explain_options["analyze"] = True
+
+        for name in names:
+            qs = HOT_QUERIES[name]().using(using)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {name} ({vendor})"))
+            self.stdout.write(str(qs.query))
+            self.stdout.write(qs.explain(**explain_options))
+            self.stdout.write("")
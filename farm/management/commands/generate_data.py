@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from farm import datagen
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset for load testing: users, farms, site visits, monthly statements "
+        "(USD/ZWL) and monthly employee returns for every employment type."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", choices=sorted(datagen.SCALES), default="small",
+            help="Preset sizes (farms / site visits / years): "
+                 + ", ".join(f"{name}={f}/{v}/{y}" for name, (f, v, y) in datagen.SCALES.items()),
+        )
+        parser.add_argument("--farms", type=int, help="Number of farms (overrides --scale).")
+        parser.add_argument("--visits", type=int, help="Total number of site visits (overrides --scale).")
+        parser.add_argument("--years", type=int, help="Years of monthly statements and returns (overrides --scale).")
+        parser.add_argument("--managers", type=int, help="Farm-owning managers (default: one per 20 farms).")
+        parser.add_argument("--agents", type=int, help="Designated agents (default: one per 100 farms).")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--clear", action="store_true",
+            help=f"Delete a previously generated dataset ({datagen.PREFIX}* users and their farms) first.",
+        )
+
+    def handle(self, *args, **options):
+        farms, visits, years = datagen.SCALES[options["scale"]]
+        farms = options["farms"] if options["farms"] is not None else farms
+        visits = options["visits"] if options["visits"] is not None else visits
+        years = options["years"] if options["years"] is not None else years
+        if farms < 1 or visits < 0 or years < 1:
+            raise CommandError("--farms and --years must be at least 1 and --visits at least 0.")
+
+        if options["clear"]:
+            self.stdout.write(f"Deleted {datagen.clear()} rows of a previous dataset.")
+        elif get_user_model().objects.filter(username__startswith=datagen.PREFIX).exists():
+            raise CommandError("A generated dataset already exists; pass --clear to replace it.")
+
+        counts = datagen.generate(
+            farms, visits, years,
+            managers=options["managers"], agents=options["agents"], seed=options["seed"],
+            batch_size=options["batch_size"], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Generated " + ", ".join(f"{count} {name}" for name, count in counts.items())
+            + f". Users log in with password '{datagen.PASSWORD}'."
+        ))
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from farm.imports import DEFAULT_CHUNK_SIZE, ImportFileError, import_employee_stats
+
+
+class Command(BaseCommand):
+    help = "Bulk import/upsert FarmEmployeeStats rows from a CSV or Excel (.xlsx) file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to a .csv or .xlsx file.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--user", help="Username recorded as created_by on new rows.")
+        parser.add_argument("--max-errors", type=int, default=50, help="Row errors to print (default: 50).")
+
+    def handle(self, *args, **options):
+        created_by = None
+        if options["user"]:
+            User = get_user_model()
+            try:
+                created_by = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user: {options['user']}")
+
+        def progress(result):
+            self.stdout.write(f"  {result.rows} rows read, {result.imported} imported, {result.failed} failed")
+
+        try:
+            with open(options["path"], "rb") as fileobj:
+                result = import_employee_stats(
+                    fileobj, options["path"], created_by=created_by,
+                    chunk_size=options["chunk_size"], progress=progress,
+                )
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result.errors[:options["max_errors"]]:
+            self.stdout.write(self.style.WARNING(f"line {error.line}: {'; '.join(error.messages)}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} of {result.rows} rows ({result.failed} rejected)."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from farm import sync
+
+
+class Command(BaseCommand):
+    help = "Delete sync tombstones older than SYNC_TOMBSTONE_DAYS (clients that old re-download everything)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Override SYNC_TOMBSTONE_DAYS.")
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstones."))
@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from farm import rollups
+from jobs.registry import enqueue
+
+
+class Command(BaseCommand):
+    help = "Recompute the monthly FarmEmployeeStats rollups from the source table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month", action="append", dest="months", metavar="YYYY-MM",
+            help="Only rebuild this month (repeatable). Default: all months.",
+        )
+        parser.add_argument(
+            "--background", action="store_true",
+            help="Queue the rebuild for the job worker (run_jobs) instead of running it here.",
+        )
+
+    def handle(self, *args, **options):
+        months = None
+        if options["months"]:
+            try:
+                months = [datetime.datetime.strptime(m, "%Y-%m").date() for m in options["months"]]
+            except ValueError as exc:
+                raise CommandError(f"Invalid --month: {exc}")
+        if options["background"]:
+            job = enqueue("farm.rebuild_rollups", months=[m.isoformat() for m in months] if months else None)
+            self.stdout.write(self.style.SUCCESS(f"Queued job #{job.pk}."))
+            return
+        written = rollups.rebuild(months)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows."))
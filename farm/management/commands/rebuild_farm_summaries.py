@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from farm import summaries
+from jobs.registry import enqueue
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-farm detail-page summaries (visit counts, headcount, 12-month series)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--farm", action="append", dest="farms", type=int, metavar="ID",
+            help="Only rebuild this farm (repeatable). Default: every farm.",
+        )
+        parser.add_argument(
+            "--background", action="store_true",
+            help="Queue the rebuild for the job worker (run_jobs) instead of running it here.",
+        )
+
+    def handle(self, *args, **options):
+        if options["background"]:
+            job = enqueue("farm.rebuild_summaries", farm_ids=options["farms"])
+            self.stdout.write(self.style.SUCCESS(f"Queued job #{job.pk}."))
+            return
+        written = summaries.rebuild(options["farms"])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {written} farm summaries."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from farm import search
+from jobs.registry import enqueue
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search entries for farms, site visits, notices and statements."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind", action="append", dest="kinds", choices=list(search.KINDS),
+            help="Only re-index this object type (repeatable). Default: all.",
+        )
+        parser.add_argument(
+            "--background", action="store_true",
+            help="Queue the rebuild for the job worker (run_jobs) instead of running it here.",
+        )
+
+    def handle(self, *args, **options):
+        if options["background"]:
+            job = enqueue("farm.rebuild_search_index", kinds=options["kinds"])
+            self.stdout.write(self.style.SUCCESS(f"Queued job #{job.pk}."))
+            return
+        written = search.rebuild(options["kinds"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} documents."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from farm import ledger
+from jobs.registry import enqueue
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-farm and portfolio statement ledgers (running balances) from Statement rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--background", action="store_true",
+            help="Queue the rebuild for the job worker (run_jobs) instead of running it here.",
+        )
+
+    def handle(self, *args, **options):
+        if options["background"]:
+            job = enqueue("farm.rebuild_ledger")
+            self.stdout.write(self.style.SUCCESS(f"Queued job #{job.pk}."))
+            return
+        written = ledger.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} ledger rows."))
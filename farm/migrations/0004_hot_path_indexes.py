@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0003_sitevisit_purpose_alter_sitevisit_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['owner', '-created'], name='farm_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['-created', '-id'], name='farm_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmemployeestats',
+            index=models.Index(fields=['farm', '-created', '-id'], name='empstats_farm_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmemployeestats',
+            index=models.Index(fields=['-created', '-id'], name='empstats_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmemployeestats',
+            index=models.Index(fields=['reporting_month', 'employment_type'], name='empstats_month_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created'], name='notice_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sitevisit',
+            index=models.Index(fields=['farm', '-visit_date', '-id'], name='visit_farm_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sitevisit',
+            index=models.Index(fields=['-visit_date', '-id'], name='visit_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statement',
+            index=models.Index(fields=['farm', '-created', '-id'], name='statement_farm_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statement',
+            index=models.Index(fields=['-created', '-id'], name='statement_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Writes keep the rollups current with deltas, which need a complete table to start from
+    from farm import rollups
+
+    rollups.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeStatsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('sector', models.CharField(blank=True, default='', max_length=100)),
+                ('employment_type', models.CharField(blank=True, default='', max_length=20)),
+                ('records', models.IntegerField(default=0)),
+                ('citizen_male', models.BigIntegerField(default=0)),
+                ('citizen_female', models.BigIntegerField(default=0)),
+                ('expatriate_male', models.BigIntegerField(default=0)),
+                ('expatriate_female', models.BigIntegerField(default=0)),
+                ('basic_pay_usd', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('basic_pay_zwl', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('employees_contribution_usd', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('employees_contribution_zwl', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('employers_contribution_usd', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('employers_contribution_zwl', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('arrears_usd', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('arrears_zwl', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_contribution_usd', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_contribution_zwl', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sector', 'employment_type', '-month'], name='rollup_scope_month_idx')],
+                'unique_together': {('month', 'sector', 'employment_type')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
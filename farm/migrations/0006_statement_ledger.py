@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Writes keep the ledgers current with deltas, which need complete tables to start from
+    from farm import ledger
+
+    ledger.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0005_employeestatsrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementPeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10)),
+                ('month', models.DateField()),
+                ('statements', models.IntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_expenses', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('running_balance', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'unique_together': {('currency', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StatementLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10)),
+                ('month', models.DateField()),
+                ('statements', models.IntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_expenses', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('running_balance', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='farm.farm')),
+            ],
+            options={
+                'unique_together': {('farm', 'currency', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0006_statement_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmSummary',
+            fields=[
+                ('farm', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='farm.farm')),
+                ('visits_total', models.IntegerField(default=0)),
+                ('visits_by_status', models.JSONField(blank=True, default=dict)),
+                ('last_visit_date', models.DateField(blank=True, null=True)),
+                ('employee_returns', models.IntegerField(default=0)),
+                ('latest_month', models.DateField(blank=True, null=True)),
+                ('latest_headcount', models.IntegerField(default=0)),
+                ('series', models.JSONField(blank=True, default=list)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The full-text index is database specific, so it is created here rather than
+# declared on the model. farm.search picks the matching query backend.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE farm_searchentry_fts USING fts5(
+        title, body, content='farm_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER farm_searchentry_ai AFTER INSERT ON farm_searchentry BEGIN
+        INSERT INTO farm_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER farm_searchentry_ad AFTER DELETE ON farm_searchentry BEGIN
+        INSERT INTO farm_searchentry_fts(farm_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER farm_searchentry_au AFTER UPDATE ON farm_searchentry BEGIN
+        INSERT INTO farm_searchentry_fts(farm_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO farm_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS farm_searchentry_au",
+    "DROP TRIGGER IF EXISTS farm_searchentry_ad",
+    "DROP TRIGGER IF EXISTS farm_searchentry_ai",
+    "DROP TABLE IF EXISTS farm_searchentry_fts",
+]
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE farm_searchentry ADD COLUMN document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX farm_searchentry_document_idx ON farm_searchentry USING gin (document)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS farm_searchentry_document_idx",
+    "ALTER TABLE farm_searchentry DROP COLUMN IF EXISTS document",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor in statements:
+            for sql in statements[vendor]:
+                schema_editor.execute(sql)
+    return run
+
+
+create_fts_index = _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD})
+drop_fts_index = _run({"sqlite": SQLITE_REVERSE, "postgresql": POSTGRES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0007_farm_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('farm', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='farm.farm')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:08
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0009_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='farm_name_lower_idx'),
+        ),
+    ]
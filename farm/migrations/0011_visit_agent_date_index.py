@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0010_picker_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sitevisit',
+            index=models.Index(fields=['agent', 'visit_date', 'status'], name='visit_agent_date_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Materialize every due month for the existing farms and returns
+    from farm import compliance
+
+    compliance.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0011_visit_agent_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissingEmployeeReturn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='missing_returns', to='farm.farm')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['farm', 'month'], name='missing_return_farm_idx')],
+                'unique_together': {('month', 'farm')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ComplianceMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+"""
+Move every FarmEmployeeStats.reporting_month to the first of its month.
+
+Where a farm has several returns of one employment type in a month (only
+possible while the day was kept), the most recently updated one is kept
+and the others are deleted. The derived tables backfilled by earlier
+migrations were built from the stray days, so they are rebuilt afterwards;
+farm summaries are recomputed with rebuild_farm_summaries.
+"""
+from django.db import migrations
+
+
+def normalize_reporting_months(apps, schema_editor):
+    FarmEmployeeStats = apps.get_model("farm", "FarmEmployeeStats")
+    stray = (
+        FarmEmployeeStats.objects.exclude(reporting_month__day=1)
+        .order_by("-updated", "-pk").values_list("pk", "farm_id", "reporting_month", "employment_type", "updated")
+    )
+    for pk, farm_id, day, employment_type, updated in list(stray):
+        month = day.replace(day=1)
+        existing = (
+            FarmEmployeeStats.objects.filter(farm_id=farm_id, reporting_month=month, employment_type=employment_type)
+            .values_list("pk", "updated").first()
+        )
+        if existing is not None:
+            if existing[1] >= updated:
+                FarmEmployeeStats.objects.filter(pk=pk).delete()
+                continue
+            FarmEmployeeStats.objects.filter(pk=existing[0]).delete()
+        FarmEmployeeStats.objects.filter(pk=pk).update(reporting_month=month)
+
+
+def rebuild_derived(apps, schema_editor):
+    from farm import compliance, rollups
+
+    rollups.rebuild()
+    compliance.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farm", "0012_missing_employee_return"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_reporting_months, migrations.RunPython.noop),
+        migrations.RunPython(rebuild_derived, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Field choices, defaults and help text the models changed without a migration."""
+
+    dependencies = [
+        ('farm', '0013_normalize_reporting_month'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='farmemployeestats',
+            name='employment_type',
+            field=models.CharField(choices=[('Permanent', 'Permanent'), ('Seasonal', 'Seasonal'), ('Casual', 'Casual'), ('Fixed Term', 'Fixed Term')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='farmemployeestats',
+            name='reporting_month',
+            field=models.DateField(help_text='The month this record applies to. Only month and year are considered; the day will be normalized to the first of the month.'),
+        ),
+        migrations.AlterField(
+            model_name='sitevisit',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('In Progress', 'In Progress'), ('Resolved', 'Resolved'), ('Completed', 'Completed'), ('Planned', 'Planned')], default='Pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0014_alter_field_choices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='agent_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='moved',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='owner_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:30
+
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    # 0008 created the index empty: rows written before it were never indexed.
+    # rebuild() reads only search.DOCUMENT_FIELDS, so later columns don't matter.
+    from farm import search
+
+    search.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farm', '0015_tombstone_scope'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,125 @@
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.middleware.csrf import get_token
+from django.shortcuts import redirect
+from django.utils.safestring import mark_safe
+
+from farm import bulk, rendercache, scoping
+from farm.models import Farm
+
+
+class RelatedListMixin:
+    """
+    Load the relations a list template renders in bulk instead of row by row.
+
+    Views declare the relations their template dereferences:
+    - `list_select_related`: forward FKs, joined into the page query.
+    - `list_prefetch_related`: reverse/many relations, one extra query each.
+    """
+    list_select_related = ()
+    list_prefetch_related = ()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.list_select_related:
+            qs = qs.select_related(*self.list_select_related)
+        if self.list_prefetch_related:
+            qs = qs.prefetch_related(*self.list_prefetch_related)
+        return qs
+
+
+class ScopedQuerysetMixin:
+    """Limit a view's objects to what the user may see (farm.scoping)."""
+
+    async def aprepare(self):
+        # Async views (core.asyncviews): resolve the scope before get_queryset() needs it
+        await super().aprepare()
+        await scoping.afarm_ids_for(self.request.user)
+
+    def get_queryset(self):
+        return super().get_queryset().for_user(self.request.user)
+
+
+class FarmChoiceMixin:
+    """
+    Limit a form's `farm` choices: managers pick among their own farms, the
+    `farm_editor_roles` among all farms, everyone else gets no choices.
+    """
+    farm_editor_roles = ("Admin",)
+
+    def get_farm_queryset(self):
+        user = self.request.user
+        if user.is_authenticated:
+            if user.role == "Manager":
+                return Farm.objects.for_user(user)
+            elif user.role in self.farm_editor_roles:
+                return Farm.objects.all()
+        return Farm.objects.none()
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        if "farm" in form.fields:
+            form.fields["farm"].queryset = self.get_farm_queryset()
+        return form
+
+
+class BulkActionMixin:
+    """
+    Bulk actions (farm.bulk) on an async list page. The page's form posts the
+    action name, the selected `pk`s and the action's value; the action runs
+    over the selected rows the user may change and the list is shown again.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        action = bulk.get_action(self.model, request.POST.get("action"))
+        if action is None or not action.allowed(request.user):
+            raise PermissionDenied
+        try:
+            count = await sync_to_async(bulk.apply)(action, self.model, request.user, request.POST)
+        except bulk.BulkActionError as exc:
+            messages.error(request, str(exc))
+        else:
+            name = self.model._meta.verbose_name if count == 1 else self.model._meta.verbose_name_plural
+            messages.success(request, f"{count} {name} {action.done}.")
+        return redirect(request.get_full_path())
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["bulk_actions"] = bulk.available(self.model, self.request.user)
+        return ctx
+
+
+class FragmentCacheMixin:
+    """
+    Serve the page body from the render cache (farm.rendercache) when nothing
+    it shows has changed. The template wraps its body in `{% fragment %}`.
+    For async views (core.asyncviews).
+
+    - `fragment_models`: models whose changes retire the cached page.
+    - `row_models`: related models shown in `{% cachedrow %}` rows.
+    """
+    fragment_models = ()
+    row_models = ()
+
+    async def get(self, request, *args, **kwargs):
+        self.fragment_key = None
+        if rendercache.enabled() and request.user.is_authenticated:
+            version = await rendercache.aversions(self.fragment_models)
+            self.fragment_key = rendercache.page_key(
+                type(self).__name__, request, self.fragment_models, version=version,
+            )
+            html = await rendercache.afetch(self.fragment_key, str(get_token(request)))
+            if html is not None:
+                # Only the layout is rendered; the queryset is never evaluated
+                self.object = self.object_list = None
+                return self.render_to_response({"view": self, "cached_fragment": mark_safe(html)})
+        self.row_version = await rendercache.aversions(self.row_models) if self.row_models else None
+        return await super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["fragment_key"] = self.fragment_key
+        if self.row_models:
+            ctx["row_version"] = self.row_version
+        return ctx
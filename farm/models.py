@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Lower
+
+from farm.scoping import FarmQuerySet, FarmScopedQuerySet, UnscopedQuerySet
 
 User = settings.AUTH_USER_MODEL
 
@@ -18,6 +21,18 @@ class Farm(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = FarmQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "-created"], name="farm_owner_created_idx"),
+            models.Index(fields=["-created", "-id"], name="farm_created_id_idx"),
+            # delta sync: rows changed since a watermark, in (updated, id) order
+            models.Index(fields=["updated", "id"], name="farm_updated_id_idx"),
+            # picker prefix search (farm.autocomplete)
+            models.Index(Lower("name"), name="farm_name_lower_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -40,9 +55,22 @@ class SiteVisit(models.Model):
     notes = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
     resolution_notes = models.TextField(blank=True)
+    # Set by offline clients (farm.sync) so a replayed create is applied once
+    client_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = FarmScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["farm", "-visit_date", "-id"], name="visit_farm_date_idx"),
+            models.Index(fields=["-visit_date", "-id"], name="visit_date_id_idx"),
+            models.Index(fields=["updated", "id"], name="visit_updated_id_idx"),
+            # agent workload per day/week (farm.schedule)
+            models.Index(fields=["agent", "visit_date", "status"], name="visit_agent_date_idx"),
+        ]
+
     def __str__(self):
         return f"Visit to {self.farm.name} on {self.visit_date}"
 
@@ -57,6 +85,16 @@ class Notice(models.Model):
     updated = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = UnscopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-created"], name="notice_active_created_idx", condition=models.Q(is_active=True)
+            ),
+            models.Index(fields=["updated", "id"], name="notice_updated_id_idx"),
+        ]
+
     def __str__(self):
         return f"Notice: {self.title} ({self.farm.name})"
 
@@ -72,6 +110,14 @@ class Statement(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = FarmScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["farm", "-created", "-id"], name="statement_farm_created_idx"),
+            models.Index(fields=["-created", "-id"], name="statement_created_id_idx"),
+        ]
+
     def __str__(self):
         return f"Statement for {self.farm.name} ({self.period_start} - {self.period_end})"
 
@@ -81,6 +127,37 @@ class Statement(models.Model):
 
 
 
+def month_of(day):
+    """The first day of `day`'s month; reporting months are stored in this form."""
+    return day.replace(day=1)
+
+
+class EmployeeStatsQuerySet(FarmScopedQuerySet):
+    """
+    Month lookups on the normalized `reporting_month`: equality and index
+    ranges on the (farm, reporting_month, employment_type) and
+    (reporting_month, employment_type) indexes, never date functions.
+    """
+
+    def for_month(self, month):
+        return self.filter(reporting_month=month_of(month))
+
+    def between_months(self, first, last):
+        """Rows from `first`'s month through `last`'s, inclusive."""
+        return self.filter(reporting_month__range=(month_of(first), month_of(last)))
+
+    def latest_per_farm(self):
+        """
+        The rows of each farm's latest reported month. The month is one
+        covering probe of the unique index per farm.
+        """
+        latest = (
+            self.model._default_manager.filter(farm=models.OuterRef("farm"))
+            .order_by("-reporting_month").values("reporting_month")[:1]
+        )
+        return self.filter(reporting_month=models.Subquery(latest))
+
+
 class FarmEmployeeStats(models.Model):
     EMPLOYMENT_TYPES = [
         ("Permanent", "Permanent"),
@@ -122,22 +199,237 @@ class FarmEmployeeStats(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = EmployeeStatsQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Farm Employee Stats"
         unique_together = ("farm", "reporting_month", "employment_type")
+        # (farm, reporting_month, ...) lookups are already served by the unique index
+        indexes = [
+            models.Index(fields=["farm", "-created", "-id"], name="empstats_farm_created_idx"),
+            models.Index(fields=["-created", "-id"], name="empstats_created_id_idx"),
+            models.Index(fields=["reporting_month", "employment_type"], name="empstats_month_type_idx"),
+        ]
 
     def __str__(self):
         return f"{self.farm.name} - {self.employment_type} ({self.reporting_month.strftime('%B %Y')})"
 
-    def save(self, *args, **kwargs):
+    def compute_totals(self):
         """
-        Automatically calculate total contributions based on:
+        Calculate total contributions based on:
         - employee + employer contributions + arrears
         """
         self.total_contribution_usd = (
-            self.employees_contribution_usd + self.employers_contribution_usd + self.arrears_usd
+            (self.employees_contribution_usd or 0) + (self.employers_contribution_usd or 0) + (self.arrears_usd or 0)
         )
         self.total_contribution_zwl = (
-            self.employees_contribution_zwl + self.employers_contribution_zwl + self.arrears_zwl
+            (self.employees_contribution_zwl or 0) + (self.employers_contribution_zwl or 0) + (self.arrears_zwl or 0)
         )
+
+    def normalize_month(self):
+        if self.reporting_month:
+            field = self._meta.get_field("reporting_month")
+            self.reporting_month = month_of(field.to_python(self.reporting_month))
+
+    def clean(self):
+        # Runs before validate_unique(), so forms catch a second return for the month
+        self.normalize_month()
+
+    def save(self, *args, **kwargs):
+        """
+        Automatically calculate total contributions and normalize the month before saving.
+        """
+        self.compute_totals()
+        self.normalize_month()
         super().save(*args, **kwargs)
+
+
+class EmployeeStatsRollup(models.Model):
+    """
+    Precomputed per-month totals of FarmEmployeeStats, maintained by farm.rollups.
+
+    One row per (month, sector, employment_type); an empty sector or employment
+    type means "all", so ("", "") is the national total, (sector, "") a sector
+    total and ("", type) an employment-type total.
+    """
+    month = models.DateField()
+    sector = models.CharField(max_length=100, blank=True, default="")
+    employment_type = models.CharField(max_length=20, blank=True, default="")
+    records = models.IntegerField(default=0)
+
+    citizen_male = models.BigIntegerField(default=0)
+    citizen_female = models.BigIntegerField(default=0)
+    expatriate_male = models.BigIntegerField(default=0)
+    expatriate_female = models.BigIntegerField(default=0)
+
+    basic_pay_usd = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    basic_pay_zwl = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    employees_contribution_usd = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    employees_contribution_zwl = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    employers_contribution_usd = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    employers_contribution_zwl = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    arrears_usd = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    arrears_zwl = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_contribution_usd = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_contribution_zwl = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("month", "sector", "employment_type")
+        indexes = [
+            models.Index(fields=["sector", "employment_type", "-month"], name="rollup_scope_month_idx"),
+        ]
+
+    def __str__(self):
+        scope = " / ".join(filter(None, [self.sector, self.employment_type])) or "National"
+        return f"{scope} ({self.month.strftime('%B %Y')})"
+
+    @property
+    def headcount(self):
+        return self.citizen_male + self.citizen_female + self.expatriate_male + self.expatriate_female
+
+
+class StatementLedger(models.Model):
+    """
+    Per farm, currency and month (of `period_end`) statement totals with the
+    farm's cumulative balance up to and including that month. Maintained by
+    farm.ledger; never edited directly.
+    """
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name="ledger")
+    currency = models.CharField(max_length=10)
+    month = models.DateField()
+    statements = models.IntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_expenses = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    running_balance = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    objects = FarmScopedQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("farm", "currency", "month")
+
+    def __str__(self):
+        return f"{self.farm_id} {self.currency} {self.month:%Y-%m}: {self.running_balance}"
+
+
+class StatementPeriodSummary(models.Model):
+    """Portfolio-wide counterpart of StatementLedger: one row per currency and month."""
+    currency = models.CharField(max_length=10)
+    month = models.DateField()
+    statements = models.IntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_expenses = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    running_balance = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("currency", "month")
+
+    def __str__(self):
+        return f"{self.currency} {self.month:%Y-%m}: {self.running_balance}"
+
+
+class FarmSummary(models.Model):
+    """
+    Denormalised figures for the farm detail page, refreshed by farm.summaries
+    whenever one of the farm's site visits or employee returns is written.
+
+    `series` holds the 12 months up to the farm's latest activity, oldest
+    first: [{"month": "YYYY-MM-01", "headcount": n, "visits": n}, ...].
+    """
+    farm = models.OneToOneField(Farm, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    visits_total = models.IntegerField(default=0)
+    visits_by_status = models.JSONField(default=dict, blank=True)
+    last_visit_date = models.DateField(null=True, blank=True)
+    employee_returns = models.IntegerField(default=0)
+    latest_month = models.DateField(null=True, blank=True)
+    latest_headcount = models.IntegerField(default=0)
+    series = models.JSONField(default=list, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of {self.farm_id}"
+
+
+class SearchEntry(models.Model):
+    """
+    One searchable document per Farm, SiteVisit, Notice and Statement, kept in
+    sync by farm.search. The full-text index over `title` and `body` lives
+    outside the ORM (migration 0008): an FTS5 table fed by triggers on SQLite,
+    a generated tsvector column with a GIN index on PostgreSQL.
+    """
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    # scoping: managers only find documents of their own farms (null = global)
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("kind", "object_id")
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted row, or of a row that left some users' sync scope, so
+    delta-sync clients (farm.sync) can drop their copy. Pruned after
+    SYNC_TOMBSTONE_DAYS.
+    """
+    resource = models.CharField(max_length=30)
+    object_id = models.PositiveBigIntegerField()
+    deleted = models.DateTimeField(auto_now_add=True)
+    # Whose scope the row was in: its farm's owner (None for shared rows such
+    # as notices) and a visit's agent. Plain ids, so tombstones outlive users.
+    owner_id = models.PositiveBigIntegerField(null=True, blank=True)
+    agent_id = models.PositiveBigIntegerField(null=True, blank=True)
+    # The row still exists: its farm changed owner or the visit its agent
+    moved = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted", "id"], name="tombstone_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} deleted {self.deleted}"
+
+
+class MissingEmployeeReturn(models.Model):
+    """
+    A month for which a farm filed no FarmEmployeeStats at all, materialized
+    by farm.compliance for the compliance report. Covers the
+    COMPLIANCE_MONTHS before the current one, from the month the farm was
+    added.
+    """
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name="missing_returns")
+    month = models.DateField()
+
+    objects = FarmScopedQuerySet.as_manager()
+
+    class Meta:
+        # (month, farm) serves the per-month counts and listings; (farm, month)
+        # the incremental refreshes
+        unique_together = ("month", "farm")
+        indexes = [
+            models.Index(fields=["farm", "month"], name="missing_return_farm_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.farm_id} missing {self.month:%Y-%m}"
+
+
+class ComplianceMonth(models.Model):
+    """
+    A due month whose MissingEmployeeReturn rows have been materialized for
+    every farm (farm.compliance.ensure_current builds the months without one).
+    """
+    month = models.DateField(unique=True)
+
+    def __str__(self):
+        return f"Compliance built for {self.month:%Y-%m}"
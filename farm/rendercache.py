@@ -0,0 +1,149 @@
+"""
+Rendered-HTML cache for the farm list and detail pages.
+
+Two layers, both invalidated by model signals rather than by timeouts:
+
+- Page fragments (FragmentCacheMixin + `{% fragment %}`): the page's body
+  block, keyed on the view, the URL (path and query string), the user's role,
+  `is_staff` and farm scope, and a version number per model the page reads. The
+  post_save / post_delete / bulk_changed receivers below bump a model's
+  version, retiring every page built from it at once. A hit renders only the
+  layout around the cached body; the view's queryset is never evaluated.
+- Row fragments (`{% cachedrow %}`): one list row, keyed on the row's pk and
+  `updated`, what the row's conditionals test (the role, `is_staff` and the
+  bulk actions offered), and the versions of the related models it shows (the
+  farm name on a visit row, say). A page rebuilt after one row changed
+  re-renders only that row.
+
+CSRF tokens differ per visitor, so a stored fragment carries a placeholder in
+place of the token and the current request's token is put back on each hit.
+
+A bump only reaches the cache of the process that made the change, so caching
+is off unless every serving process shares the cache (settings.CACHE_SHARED);
+with a per-process cache and several workers the others would keep serving
+pages and scoped rows from before the change.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from farm import scoping
+
+PREFIX = "render"
+CSRF_PLACEHOLDER = "__render_cache_csrf__"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled():
+    return _setting("RENDER_CACHE_ENABLED", True) and _setting("CACHE_SHARED", False)
+
+
+def timeout():
+    return _setting("RENDER_CACHE_TIMEOUT", 600)
+
+
+# Versions ----------------------------------------------------------------------
+
+def _version_key(model):
+    return f"{PREFIX}:version:{model._meta.label_lower}"
+
+
+def versions(models):
+    """The current version of each model, as one string (missing keys start at 1)."""
+    keys = [_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    missing = {key: 1 for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return ".".join(str(found[key]) for key in keys)
+
+
+async def aversions(models):
+    keys = [_version_key(model) for model in models]
+    found = await cache.aget_many(keys)
+    missing = {key: 1 for key in keys if key not in found}
+    if missing:
+        await cache.aset_many(missing, None)
+        found.update(missing)
+    return ".".join(str(found[key]) for key in keys)
+
+
+def bump(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def model_changed(sender, **kwargs):
+    """Signal receiver: retire every fragment built from `sender` rows."""
+    if kwargs.get("raw"):
+        return
+    bump(sender)
+    # A request that read the old rows before our commit may store them under
+    # the new version; bump again once the write is visible
+    transaction.on_commit(lambda: bump(sender))
+
+
+def user_changed(sender, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which no page shows
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    model_changed(sender, **kwargs)
+
+
+# Keys ------------------------------------------------------------------------
+
+def scope_of(user):
+    """Part of the key that separates what different users may see."""
+    restricted = user.pk if scoping.is_restricted(user) else "all"
+    return f"{getattr(user, 'role', '')}:{int(user.is_staff)}:{restricted}"
+
+
+def capabilities(user, actions=()):
+    """Part of a row key: what the row templates test, the role, `is_staff` and the bulk actions (farm.bulk)."""
+    names = ",".join(action.name for action in actions)
+    return f"{getattr(user, 'role', '')}:{int(user.is_staff)}:{names}"
+
+
+def page_key(name, request, models, extra="", version=None):
+    """`version` may be passed in when already read (aversions() in async views)."""
+    if version is None:
+        version = versions(models)
+    raw = "|".join((
+        name, scope_of(request.user), request.path, request.GET.urlencode(), str(extra), version,
+    ))
+    return f"{PREFIX}:page:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def row_key(obj, capabilities, version):
+    return f"{PREFIX}:row:{obj._meta.label_lower}:{obj.pk}:{obj.updated.timestamp()}:{capabilities}:{version}"
+
+
+# Storage ---------------------------------------------------------------------
+
+def store(key, html, csrf_token=""):
+    if csrf_token:
+        html = html.replace(csrf_token, CSRF_PLACEHOLDER)
+    cache.set(key, html, timeout())
+
+
+def _restore(html, csrf_token):
+    if html is not None and CSRF_PLACEHOLDER in html:
+        html = html.replace(CSRF_PLACEHOLDER, csrf_token)
+    return html
+
+
+def fetch(key, csrf_token=""):
+    return _restore(cache.get(key), csrf_token)
+
+
+async def afetch(key, csrf_token=""):
+    return _restore(await cache.aget(key), csrf_token)
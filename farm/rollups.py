@@ -0,0 +1,228 @@
+"""
+Monthly rollups of FarmEmployeeStats (see EmployeeStatsRollup).
+
+Single-row writes are applied as deltas: the old row's values are subtracted from
+and the new row's values added to the affected rollup rows (sector, type,
+national) with `UPDATE ... SET x = x + delta`, netted per row so an edit that
+keeps the month, sector and type costs one UPDATE per bucket. A farm's sector
+change moves its rows between the two sector buckets, and a farm's delete
+takes its rows out with one GROUP BY over them instead of a delta per row
+in the cascade. Bulk writes and the
+rebuild command recompute whole months from the source table with one GROUP BY
+per rollup level.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from farm.forms import EMPLOYEE_COUNT_FIELDS, EMPLOYEE_PAYROLL_FIELDS
+from farm.models import Farm, FarmEmployeeStats, EmployeeStatsRollup, month_of
+from farm.signals import deleted_with_farm
+
+METRIC_FIELDS = EMPLOYEE_COUNT_FIELDS + EMPLOYEE_PAYROLL_FIELDS + [
+    "total_contribution_usd", "total_contribution_zwl",
+]
+
+# (group-by lookups, rollup columns they fill); missing columns stay "" = all
+LEVELS = [
+    (["farm__sector"], ["sector"]),
+    (["employment_type"], ["employment_type"]),
+    ([], []),
+]
+
+
+def _bucket_keys(month, sector, employment_type):
+    # A blank sector/type only counts towards the totals; as a bucket key it
+    # would collide with the "all" row.
+    keys = [(month, "", "")]
+    if sector:
+        keys.append((month, sector, ""))
+    if employment_type:
+        keys.append((month, "", employment_type))
+    return keys
+
+
+def snapshot(stats, sector=None):
+    """The rollup-relevant values of a FarmEmployeeStats row."""
+    values = {name: getattr(stats, name) or 0 for name in METRIC_FIELDS}
+    values["month"] = month_of(stats.reporting_month)
+    values["employment_type"] = stats.employment_type
+    values["farm_id"] = stats.farm_id
+    values["sector"] = (sector if sector is not None else stats.farm.sector) or ""
+    return values
+
+
+def net_deltas(*changes):
+    """
+    Sum (values, sign) changes into one delta per rollup bucket, leaving out
+    buckets they cancel out in (an edit that keeps the month, sector and type
+    only touches the metrics that changed). Values standing for several rows
+    carry their count in `records`.
+    """
+    deltas = {}
+    for values, sign in changes:
+        for key in _bucket_keys(values["month"], values["sector"], values["employment_type"]):
+            delta = deltas.setdefault(key, dict.fromkeys(METRIC_FIELDS + ["records"], 0))
+            for name in METRIC_FIELDS:
+                delta[name] += sign * values[name]
+            delta["records"] += sign * values.get("records", 1)
+    return {key: delta for key, delta in deltas.items() if any(delta.values())}
+
+
+def apply_deltas(deltas):
+    """Add each {(month, sector, employment_type): {column: delta}} to its rollup row."""
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (month, sector, employment_type), delta in deltas.items():
+            bucket = {"month": month, "sector": sector, "employment_type": employment_type}
+            changes = {name: F(name) + value for name, value in delta.items() if value}
+            if EmployeeStatsRollup.objects.filter(**bucket).update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    EmployeeStatsRollup.objects.create(**bucket, **delta)
+            except IntegrityError:
+                # Created concurrently since the UPDATE
+                EmployeeStatsRollup.objects.filter(**bucket).update(**changes)
+        emptied = {month for (month, _, _), delta in deltas.items() if delta["records"] < 0}
+        if emptied:
+            # Drop buckets whose last contributing row just went away
+            EmployeeStatsRollup.objects.filter(month__in=emptied, records__lte=0).delete()
+
+
+def apply_delta(values, sign):
+    """Add (sign=1) or subtract (sign=-1) one row's values from its rollup buckets."""
+    apply_deltas(net_deltas((values, sign)))
+
+
+def rebuild(months=None):
+    """
+    Recompute rollups from FarmEmployeeStats, for the given months only or for
+    everything. Returns the number of rollup rows written.
+    """
+    # reporting_month is stored as the month's first day (FarmEmployeeStats.save)
+    source = FarmEmployeeStats.objects.annotate(month=F("reporting_month"))
+    existing = EmployeeStatsRollup.objects.all()
+    if months is not None:
+        months = {month_of(m) for m in months}
+        if not months:
+            return 0
+        source = source.filter(month__in=months)
+        existing = existing.filter(month__in=months)
+
+    sums = {name: Sum(name) for name in METRIC_FIELDS}
+    rows = []
+    for lookups, columns in LEVELS:
+        grouped = source.order_by().values("month", *lookups).annotate(records=Count("pk"), **sums)
+        for group in grouped:
+            if any(not group[lookup] for lookup in lookups):
+                continue
+            row = EmployeeStatsRollup(month=group["month"], records=group["records"])
+            for lookup, column in zip(lookups, columns):
+                setattr(row, column, group[lookup] or "")
+            for name in METRIC_FIELDS:
+                setattr(row, name, group[name] or 0)
+            rows.append(row)
+
+    with transaction.atomic():
+        existing.delete()
+        EmployeeStatsRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# Signal receivers ------------------------------------------------------------
+
+def stats_pre_save(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = (
+        FarmEmployeeStats.objects.filter(pk=instance.pk)
+        .select_related("farm").only(*METRIC_FIELDS, "reporting_month", "employment_type", "farm__sector")
+        .first()
+    )
+    if previous is not None:
+        instance._rollup_previous = snapshot(previous)
+
+
+def stats_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is None:
+        apply_delta(snapshot(instance), 1)
+        return
+    # The row read before the save already carries its farm's sector
+    sector = previous["sector"] if previous["farm_id"] == instance.farm_id else None
+    apply_deltas(net_deltas((previous, -1), (snapshot(instance, sector), 1)))
+
+
+def stats_post_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_farm(instance, origin):
+        return
+    # A farm deleted in the same cascade may already be gone; fall back to a
+    # month rebuild, which reads the surviving source rows.
+    try:
+        values = snapshot(instance)
+    except Farm.DoesNotExist:
+        rebuild([instance.reporting_month])
+        return
+    apply_delta(values, -1)
+
+
+def farm_pre_save(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous_sector = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous_sector = (
+        Farm.objects.filter(pk=instance.pk).values_list("sector", flat=True).first()
+    )
+
+
+def farm_post_save(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, "_rollup_previous_sector", None)
+    if raw or previous is None or previous == instance.sector:
+        return
+    move_sector(instance.pk, previous, instance.sector)
+
+
+def move_sector(farm_id, old, new):
+    """
+    Move a farm's rows from the `old` sector's buckets to the `new` one's:
+    one GROUP BY over that farm's rows, then per month a delta to each of the
+    two sector buckets. The type and national totals do not change.
+    """
+    sums = {name: Sum(name) for name in METRIC_FIELDS}
+    deltas = {}
+    grouped = (
+        FarmEmployeeStats.objects.filter(farm_id=farm_id).order_by()
+        .values("reporting_month").annotate(records=Count("pk"), **sums)
+    )
+    for group in grouped:
+        values = {name: group[name] or 0 for name in METRIC_FIELDS + ["records"]}
+        for sector, sign in ((old, -1), (new, 1)):
+            if sector:
+                deltas[group["reporting_month"], sector, ""] = {name: sign * value for name, value in values.items()}
+    apply_deltas(deltas)
+
+
+def farm_pre_delete(sender, instance, **kwargs):
+    """Take a farm's rows out of the rollups before its cascade deletes them."""
+    sums = {name: Sum(name) for name in METRIC_FIELDS}
+    grouped = (
+        FarmEmployeeStats.objects.filter(farm_id=instance.pk).order_by()
+        .values("reporting_month", "employment_type").annotate(records=Count("pk"), **sums)
+    )
+    changes = [
+        ({
+            **{name: group[name] or 0 for name in METRIC_FIELDS}, "records": group["records"],
+            "month": group["reporting_month"], "employment_type": group["employment_type"],
+            "sector": instance.sector or "",
+        }, -1)
+        for group in grouped
+    ]
+    apply_deltas(net_deltas(*changes))
+
+
+def stats_bulk_changed(sender, months=None, **kwargs):
+    rebuild(months)
@@ -0,0 +1,216 @@
+"""
+Site-visit scheduling: agent workload per day or week, and load checks for
+proposed visits.
+
+- `timeline()` counts each agent's visits per day or week bucket, split by
+  status, with one grouped query over (agent, visit_date, status). The
+  visit_agent_date_idx index covers it: a range per agent for an agent's own
+  schedule, a skip-scan across agents otherwise, reading no visit rows.
+- `LoadChecker` reads the open visits around the proposals once, grouped by
+  (agent, farm, day), into counters. Each proposed visit is then answered
+  with a few dict lookups, and accepted proposals are counted in, so a
+  planner can check hundreds of visits against the schedule and each other
+  in one request.
+
+An agent is overloaded past SCHEDULE_MAX_VISITS_PER_DAY open visits on a
+day or SCHEDULE_MAX_VISITS_PER_WEEK in a (Monday-based) week; a farm with an
+open visit on a day conflicts with a second one that day.
+"""
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.db.models.functions import TruncWeek
+
+from farm.models import SiteVisit
+
+User = get_user_model()
+OPEN_STATUSES = ("Planned", "Pending", "In Progress")
+BUCKETS = ("day", "week")
+
+
+def max_per_day():
+    return getattr(settings, "SCHEDULE_MAX_VISITS_PER_DAY", 4)
+
+
+def max_per_week():
+    return getattr(settings, "SCHEDULE_MAX_VISITS_PER_WEEK", 15)
+
+
+def max_days():
+    return getattr(settings, "SCHEDULE_MAX_DAYS", 366)
+
+
+def max_proposal_days():
+    return getattr(settings, "SCHEDULE_MAX_PROPOSAL_DAYS", 366)
+
+
+def week_start(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def visits_for(user):
+    """The visits `user` may plan around: their farm scope, and an agent's own visits."""
+    qs = SiteVisit.objects.for_user(user)
+    if getattr(user, "role", None) == "Designated Agent":
+        qs = qs.filter(agent=user)
+    return qs
+
+
+def parse_window(params, default_weeks=4):
+    """
+    (start, end, bucket) from `start` / `end` (YYYY-MM-DD) and `by` query
+    parameters; defaults to `default_weeks` weeks from this Monday, by day.
+    Raises ValueError with a message for the user.
+    """
+    bucket = params.get("by") or "day"
+    if bucket not in BUCKETS:
+        raise ValueError("`by` must be day or week.")
+    try:
+        start = datetime.date.fromisoformat(params["start"]) if params.get("start") else None
+        end = datetime.date.fromisoformat(params["end"]) if params.get("end") else None
+    except ValueError:
+        raise ValueError("`start` and `end` must be dates (YYYY-MM-DD).")
+    start = start or week_start(datetime.date.today())
+    end = end or start + datetime.timedelta(weeks=default_weeks, days=-1)
+    if bucket == "week":
+        start = week_start(start)
+    if end < start:
+        raise ValueError("`end` must not be before `start`.")
+    if (end - start).days >= max_days():
+        raise ValueError(f"Show at most {max_days()} days at a time.")
+    return start, end, bucket
+
+
+def _slots(start, end, bucket):
+    step = datetime.timedelta(days=7 if bucket == "week" else 1)
+    slots, day = [], start
+    while day <= end:
+        slots.append(day)
+        day += step
+    return slots
+
+
+def timeline(queryset, start, end, bucket="day"):
+    """
+    Visits per agent and bucket from `start` to `end`, as
+    `{"buckets": [date], "agents": [{"id", "name", "open", "total", "cells"}]}`
+    where each cell has the bucket's `date`, `open`, `total`, `by_status` and
+    `overloaded`. Agents without visits in the window are left out; visits
+    without an agent are listed under id None.
+    """
+    slot = TruncWeek("visit_date") if bucket == "week" else F("visit_date")
+    rows = (
+        queryset.filter(visit_date__range=(start, end)).order_by()
+        .values("agent_id", "status", slot=slot).annotate(visits=Count("pk"))
+    )
+    counts = {}
+    for row in rows:
+        day = row["slot"]
+        if isinstance(day, datetime.datetime):
+            day = day.date()
+        counts.setdefault(row["agent_id"], {}).setdefault(day, Counter())[row["status"]] += row["visits"]
+
+    names = dict(User.objects.filter(pk__in=[pk for pk in counts if pk is not None]).values_list("pk", "username"))
+    limit = max_per_week() if bucket == "week" else max_per_day()
+    slots = _slots(start, end, bucket)
+    agents = []
+    for agent_id, per_slot in counts.items():
+        cells = []
+        for day in slots:
+            by_status = per_slot.get(day, Counter())
+            open_visits = sum(by_status[status] for status in OPEN_STATUSES)
+            cells.append({
+                "date": day, "open": open_visits, "total": sum(by_status.values()),
+                "by_status": dict(by_status), "overloaded": open_visits > limit,
+            })
+        agents.append({
+            "id": agent_id,
+            "name": names.get(agent_id, "Unassigned"),
+            "open": sum(cell["open"] for cell in cells),
+            "total": sum(cell["total"] for cell in cells),
+            "cells": cells,
+        })
+    agents.sort(key=lambda agent: (agent["id"] is None, agent["name"].lower()))
+    return {"buckets": slots, "agents": agents}
+
+
+class LoadChecker:
+    """
+    Open-visit load per agent and day, per agent and week, and the farm-days
+    already visited, between `start` and `end` (widened to whole weeks).
+    """
+
+    def __init__(self, start, end):
+        self.start = week_start(start)
+        self.end = week_start(end) + datetime.timedelta(days=6)
+        self.per_day = Counter()
+        self.per_week = Counter()
+        self.farm_days = set()
+        rows = (
+            SiteVisit.objects.filter(visit_date__range=(self.start, self.end), status__in=OPEN_STATUSES)
+            .order_by().values("agent_id", "farm_id", "visit_date").annotate(visits=Count("pk"))
+        )
+        for row in rows:
+            self._count(row["agent_id"], row["farm_id"], row["visit_date"], row["visits"])
+
+    def _count(self, agent_id, farm_id, day, visits=1):
+        if agent_id is not None:
+            self.per_day[agent_id, day] += visits
+            self.per_week[agent_id, week_start(day)] += visits
+        self.farm_days.add((farm_id, day))
+
+    def check(self, agent_id, farm_id, day):
+        """The problems with one more open visit by `agent_id` to `farm_id` on `day` (empty when it fits)."""
+        if not self.start <= day <= self.end:
+            raise ValueError(f"{day} is outside the checked window.")
+        problems = []
+        if (farm_id, day) in self.farm_days:
+            problems.append("The farm already has an open visit that day.")
+        if agent_id is not None:
+            if self.per_day[agent_id, day] >= max_per_day():
+                problems.append(f"The agent already has {self.per_day[agent_id, day]} open visits that day.")
+            if self.per_week[agent_id, week_start(day)] >= max_per_week():
+                problems.append(f"The agent already has {self.per_week[agent_id, week_start(day)]} "
+                                "open visits that week.")
+        return problems
+
+    def add(self, agent_id, farm_id, day):
+        """Count a visit that has been accepted into the schedule."""
+        self._count(agent_id, farm_id, day)
+
+
+def check_proposals(proposals):
+    """
+    Check `proposals` (dicts with `agent`, `farm` and `visit_date`) in order;
+    each one that fits is counted against the ones after it. Returns one
+    `{"ok", "problems"}` per proposal. Raises ValueError with a message for
+    the user when the dates span more than SCHEDULE_MAX_PROPOSAL_DAYS, the
+    window LoadChecker reads.
+    """
+    parsed, results = [], []
+    for proposal in proposals:
+        try:
+            agent = proposal.get("agent")
+            parsed.append((
+                int(agent) if agent not in (None, "") else None,
+                int(proposal["farm"]),
+                datetime.date.fromisoformat(proposal["visit_date"]),
+            ))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            parsed.append(None)
+    days = [item[2] for item in parsed if item]
+    if days and (max(days) - min(days)).days >= max_proposal_days():
+        raise ValueError(f"Check visits within at most {max_proposal_days()} days at a time.")
+    checker = LoadChecker(min(days), max(days)) if days else None
+    for item in parsed:
+        if item is None:
+            results.append({"ok": False, "problems": ["Each visit needs a farm id and a visit_date (YYYY-MM-DD)."]})
+            continue
+        problems = checker.check(*item)
+        if not problems:
+            checker.add(*item)
+        results.append({"ok": not problems, "problems": problems})
+    return results
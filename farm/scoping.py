@@ -0,0 +1,165 @@
+"""
+Role scoping for farm data.
+
+Managers only see their own farms and the rows that belong to them; every
+other role sees the whole portfolio. Every farm-bound model's manager offers
+`.for_user(user)`, which applies that rule as `farm_id IN (<ids>)` on the
+model's own column, so scoped lists need neither a join to the farm table
+nor a subquery.
+
+The id set of a manager's farms is resolved at most once per request
+(memoised on the user object, which Django builds per request). With a cache
+every serving process shares (settings.CACHE_SHARED) it is also cached across
+requests: the cache entry of an owner is dropped whenever one of their farms
+is created, deleted or changes owner, and a bulk change to farms retires
+every entry by bumping a version. A per-process cache with several workers
+would only be invalidated in the worker that made the change and keep
+serving the old set, which is authorization data, in the others, so then
+every request reads the set from the database.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+
+CACHE_PREFIX = "farm:scope"
+VERSION_KEY = f"{CACHE_PREFIX}:version"
+MEMO_ATTR = "_farm_scope_ids"
+
+
+def is_restricted(user):
+    """True when `user` only sees the farms they own."""
+    return getattr(user, "role", None) == "Manager"
+
+
+def _shared():
+    return getattr(settings, "CACHE_SHARED", False)
+
+
+def _new_version():
+    # Seed from the clock so a lost version key never resurrects stale entries
+    return int(time.time())
+
+
+def _cache_key(owner_id, version=None):
+    if version is None:
+        version = cache.get_or_set(VERSION_KEY, _new_version, None)
+    return f"{CACHE_PREFIX}:{version}:owner:{owner_id}"
+
+
+def owned_farm_ids(owner_id):
+    """The ids of the farms `owner_id` owns, cached when the cache is shared."""
+    from farm.models import Farm
+
+    if not _shared():
+        return frozenset(Farm.objects.filter(owner_id=owner_id).values_list("pk", flat=True))
+    key = _cache_key(owner_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(Farm.objects.filter(owner_id=owner_id).values_list("pk", flat=True))
+        cache.set(key, ids, getattr(settings, "FARM_SCOPE_CACHE_TIMEOUT", 600))
+    return ids
+
+
+def farm_ids_for(user):
+    """
+    The ids of the farms `user` may see, or None for "all farms". Memoised on
+    the user object so a request resolves it once.
+    """
+    if not is_restricted(user):
+        return None
+    ids = getattr(user, MEMO_ATTR, None)
+    if ids is None:
+        ids = owned_farm_ids(user.pk)
+        setattr(user, MEMO_ATTR, ids)
+    return ids
+
+
+async def aowned_farm_ids(owner_id):
+    """owned_farm_ids() through the async cache and ORM."""
+    from farm.models import Farm
+
+    if not _shared():
+        return frozenset([pk async for pk in Farm.objects.filter(owner_id=owner_id).values_list("pk", flat=True)])
+    key = _cache_key(owner_id, await cache.aget_or_set(VERSION_KEY, _new_version, None))
+    ids = await cache.aget(key)
+    if ids is None:
+        ids = frozenset([pk async for pk in Farm.objects.filter(owner_id=owner_id).values_list("pk", flat=True)])
+        await cache.aset(key, ids, getattr(settings, "FARM_SCOPE_CACHE_TIMEOUT", 600))
+    return ids
+
+
+async def afarm_ids_for(user):
+    """
+    farm_ids_for() for async views. Resolving the ids up front lets the sync
+    `.for_user()` calls later in the request use the memo without querying.
+    """
+    if not is_restricted(user):
+        return None
+    ids = getattr(user, MEMO_ATTR, None)
+    if ids is None:
+        ids = await aowned_farm_ids(user.pk)
+        setattr(user, MEMO_ATTR, ids)
+    return ids
+
+
+class FarmScopedQuerySet(models.QuerySet):
+    """QuerySet of a model that belongs to a farm through `farm_field`."""
+    farm_field = "farm"
+
+    def for_user(self, user):
+        ids = farm_ids_for(user)
+        if ids is None:
+            return self
+        if not ids:
+            return self.none()
+        return self.filter(**{f"{self.farm_field}__in": ids})
+
+
+class FarmQuerySet(FarmScopedQuerySet):
+    farm_field = "pk"
+
+
+class UnscopedQuerySet(models.QuerySet):
+    """Shared rows (e.g. notices) that every role sees."""
+
+    def for_user(self, user):
+        return self
+
+
+# Invalidation ----------------------------------------------------------------
+
+def forget_owners(*owner_ids):
+    keys = [_cache_key(owner_id) for owner_id in owner_ids if owner_id is not None]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # A request that read the old set before our commit may have re-cached it
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def farm_pre_save(sender, instance, raw=False, **kwargs):
+    instance._scope_previous_owner = None
+    if raw or instance.pk is None:
+        return
+    instance._scope_previous_owner = (
+        sender.objects.filter(pk=instance.pk).values_list("owner_id", flat=True).first()
+    )
+
+
+def farm_post_save(sender, instance, created=False, **kwargs):
+    previous = getattr(instance, "_scope_previous_owner", None)
+    if created or previous != instance.owner_id:
+        forget_owners(previous, instance.owner_id)
+
+
+def farm_post_delete(sender, instance, **kwargs):
+    forget_owners(instance.owner_id)
+
+
+def farms_bulk_changed(sender, **kwargs):
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), None)
@@ -0,0 +1,271 @@
+"""
+Full-text search over farms, site visits, notices and statements.
+
+Every indexed object has one SearchEntry row (title + body + owning farm),
+written by the signal receivers below. The database keeps its own full-text
+index of those rows (see migration 0008):
+
+- SQLite: an external-content FTS5 table maintained by triggers, ranked with bm25().
+- PostgreSQL: a generated tsvector column with a GIN index, ranked with ts_rank_cd().
+- Anything else falls back to `icontains` over the SearchEntry table.
+
+Queries are split into words and every word must match; the last word is
+matched as a prefix so results appear while the user is still typing.
+"""
+import re
+from dataclasses import dataclass
+from functools import reduce
+from operator import and_
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from farm.models import Farm, Notice, SearchEntry, SiteVisit, Statement
+from farm.signals import deleted_with_farm
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+MAX_WORDS = 8
+# snippet() highlight markers, swapped for <mark> after HTML escaping
+HL_START, HL_END = "\x02", "\x03"
+
+
+# Documents -------------------------------------------------------------------
+
+def _join(*parts):
+    return " ".join(str(p) for p in parts if p)
+
+
+def farm_document(farm):
+    return {"farm_id": farm.pk, "title": farm.name, "body": _join(farm.account_number, farm.address, farm.sector)}
+
+
+def visit_document(visit):
+    return {
+        "farm_id": visit.farm_id,
+        "title": f"{visit.purpose}: {visit.farm.name} ({visit.visit_date})",
+        "body": _join(visit.notes, visit.resolution_notes),
+    }
+
+
+def notice_document(notice):
+    return {"farm_id": None, "title": notice.title, "body": notice.message}
+
+
+def statement_document(statement):
+    return {
+        "farm_id": statement.farm_id,
+        "title": f"Statement: {statement.farm.name} ({statement.period_start} - {statement.period_end})",
+        "body": _join(statement.farm.name, statement.currency),
+    }
+
+
+# kind -> (model, document builder, related fields the builder reads, detail url name)
+KINDS = {
+    "farm": (Farm, farm_document, (), "farm:farm_detail"),
+    "sitevisit": (SiteVisit, visit_document, ("farm",), "farm:sitevisit_detail"),
+    "notice": (Notice, notice_document, (), "farm:notice_detail"),
+    "statement": (Statement, statement_document, ("farm",), "farm:statement_detail"),
+}
+# kind -> the columns the document builder reads (with its related fields'), and nothing else, so
+# the index can be built by migration 0008 from tables that later migrations add columns to
+DOCUMENT_FIELDS = {
+    "farm": ("name", "account_number", "address", "sector"),
+    "sitevisit": ("farm", "farm__name", "purpose", "visit_date", "notes", "resolution_notes"),
+    "notice": ("title", "message"),
+    "statement": ("farm", "farm__name", "period_start", "period_end", "currency"),
+}
+KIND_LABELS = {"farm": "Farm", "sitevisit": "Site visit", "notice": "Notice", "statement": "Statement"}
+
+
+def kind_of(model):
+    for kind, (kind_model, *_) in KINDS.items():
+        if model is kind_model:
+            return kind
+    return None
+
+
+def index_objects(kind, objects):
+    """Upsert the SearchEntry rows of `objects` (all of one kind)."""
+    build = KINDS[kind][1]
+    entries = [SearchEntry(kind=kind, object_id=obj.pk, **build(obj)) for obj in objects]
+    if entries:
+        SearchEntry.objects.bulk_create(
+            entries, update_conflicts=True, unique_fields=["kind", "object_id"],
+            update_fields=["farm", "title", "body", "updated"], batch_size=500,
+        )
+    return len(entries)
+
+
+def unindex(kind, pks):
+    SearchEntry.objects.filter(kind=kind, object_id__in=list(pks)).delete()
+
+
+def rebuild(kinds=None, chunk_size=2000):
+    """Re-index every object of the given kinds (default: all). Returns entries written."""
+    written = 0
+    for kind in kinds or KINDS:
+        model, _, related, _ = KINDS[kind]
+        with transaction.atomic():
+            SearchEntry.objects.filter(kind=kind).delete()
+            qs = model.objects.select_related(*related).only(*DOCUMENT_FIELDS[kind]).order_by("pk")
+            chunk = []
+            for obj in qs.iterator(chunk_size=chunk_size):
+                chunk.append(obj)
+                if len(chunk) >= chunk_size:
+                    written += index_objects(kind, chunk)
+                    chunk = []
+            written += index_objects(kind, chunk)
+    return written
+
+
+# Querying --------------------------------------------------------------------
+
+@dataclass
+class SearchResult:
+    kind: str
+    object_id: int
+    title: str
+    snippet: str
+    rank: float
+
+    @property
+    def label(self):
+        return KIND_LABELS[self.kind]
+
+    @property
+    def url(self):
+        return reverse(KINDS[self.kind][3], args=[self.object_id])
+
+
+def words(query):
+    return WORD_RE.findall(query or "")[:MAX_WORDS]
+
+
+def _highlight(text):
+    return mark_safe(escape(text).replace(HL_START, "<mark>").replace(HL_END, "</mark>"))
+
+
+def _scope_sql(owner_id, kinds):
+    where, params = [], []
+    if owner_id is not None:
+        where.append("(e.farm_id IS NULL OR e.farm_id IN (SELECT id FROM farm_farm WHERE owner_id = %s))")
+        params.append(owner_id)
+    if kinds:
+        where.append(f"e.kind IN ({', '.join(['%s'] * len(kinds))})")
+        params.extend(kinds)
+    return "".join(f" AND {clause}" for clause in where), params
+
+
+def _sqlite_search(terms, owner_id, kinds, limit, offset):
+    # Each word quoted (no FTS operators from user input), the last one as a prefix
+    match = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+    scope, params = _scope_sql(owner_id, kinds)
+    sql = (
+        "SELECT e.kind, e.object_id, e.title, "
+        f"snippet(farm_searchentry_fts, 1, '{HL_START}', '{HL_END}', '…', 16), "
+        "bm25(farm_searchentry_fts, 10.0, 1.0) AS rank "
+        "FROM farm_searchentry_fts JOIN farm_searchentry e ON e.id = farm_searchentry_fts.rowid "
+        f"WHERE farm_searchentry_fts MATCH %s{scope} "
+        "ORDER BY rank LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *params, limit, offset])
+        return [
+            SearchResult(kind, object_id, title, _highlight(snippet), -rank)
+            for kind, object_id, title, snippet, rank in cursor.fetchall()
+        ]
+
+
+def _postgres_search(terms, owner_id, kinds, limit, offset):
+    tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    scope, params = _scope_sql(owner_id, kinds)
+    sql = (
+        "SELECT e.kind, e.object_id, e.title, "
+        "ts_headline('simple', e.body, q, %s), ts_rank_cd(e.document, q) AS rank "
+        "FROM farm_searchentry e, to_tsquery('simple', %s) q "
+        f"WHERE e.document @@ q{scope} "
+        "ORDER BY rank DESC, e.id DESC LIMIT %s OFFSET %s"
+    )
+    options = f"StartSel={HL_START}, StopSel={HL_END}, MaxFragments=1, MaxWords=16, MinWords=6"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [options, tsquery, *params, limit, offset])
+        return [
+            SearchResult(kind, object_id, title, _highlight(snippet), rank)
+            for kind, object_id, title, snippet, rank in cursor.fetchall()
+        ]
+
+
+def _fallback_search(terms, owner_id, kinds, limit, offset):
+    qs = SearchEntry.objects.filter(reduce(and_, [Q(title__icontains=t) | Q(body__icontains=t) for t in terms]))
+    if owner_id is not None:
+        qs = qs.filter(Q(farm__isnull=True) | Q(farm__owner_id=owner_id))
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+    rows = qs.order_by("-updated", "-id").values_list("kind", "object_id", "title", "body")[offset:offset + limit]
+    return [SearchResult(kind, object_id, title, body[:160], 0.0) for kind, object_id, title, body in rows]
+
+
+BACKENDS = {"sqlite": _sqlite_search, "postgresql": _postgres_search}
+
+
+def search(query, owner_id=None, kinds=None, limit=20, offset=0):
+    """
+    Ranked results for `query`, best first. `owner_id` restricts farm-bound
+    documents to that owner's farms (notices stay visible); `kinds` limits the
+    object types searched.
+    """
+    terms = words(query)
+    if not terms:
+        return []
+    backend = BACKENDS.get(connection.vendor, _fallback_search)
+    return backend(terms, owner_id, list(kinds or []), limit, offset)
+
+
+def matching_ids(kind, query, limit=1000):
+    """Primary keys of `kind` objects matching `query`, best first (used by the admin)."""
+    return [result.object_id for result in search(query, kinds=[kind], limit=limit)]
+
+
+# Signal receivers ------------------------------------------------------------
+
+def object_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_objects(kind_of(sender), [instance])
+
+
+def object_post_delete(sender, instance, origin=None, **kwargs):
+    # A farm's entries cascade with it (SearchEntry.farm)
+    if deleted_with_farm(instance, origin):
+        return
+    unindex(kind_of(sender), [instance.pk])
+
+
+def farm_pre_save(sender, instance, raw=False, **kwargs):
+    instance._search_previous_name = None
+    if raw or instance.pk is None:
+        return
+    instance._search_previous_name = Farm.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+
+
+def farm_post_save(sender, instance, raw=False, **kwargs):
+    # Visit and statement documents carry the farm name
+    previous = getattr(instance, "_search_previous_name", None)
+    if raw or previous is None or previous == instance.name:
+        return
+    index_objects("sitevisit", instance.visits.select_related("farm"))
+    index_objects("statement", instance.statements.select_related("farm"))
+
+
+def objects_bulk_changed(sender, pks=None, **kwargs):
+    kind = kind_of(sender)
+    if pks is None:
+        rebuild([kind])
+    else:
+        model, _, related, _ = KINDS[kind]
+        found = list(model.objects.select_related(*related).only(*DOCUMENT_FIELDS[kind]).filter(pk__in=pks))
+        index_objects(kind, found)
+        unindex(kind, set(pks) - {obj.pk for obj in found})
@@ -0,0 +1,41 @@
+import threading
+
+from django.db.models import QuerySet
+from django.dispatch import Signal
+
+# Sent once after a bulk write (bulk_create/update/delete) that bypassed the
+# per-row post_save/post_delete signals. Receivers get `sender=<model class>`
+# and `pks` (the affected primary keys, or None when unknown). SiteVisit and
+# FarmEmployeeStats senders may pass `farm_ids`, the farms touched, and
+# FarmEmployeeStats senders `months`, the reporting months touched (either None
+# when unknown). Statement senders that deleted rows may pass `removed`, the
+# ledger snapshots of those rows.
+bulk_changed = Signal()
+
+# Farms between their pre_delete and post_delete in this thread
+_deleting = threading.local()
+
+
+def deleted_with_farm(instance, origin=None):
+    """
+    True when `instance` is removed in the cascade of its farm's delete. The
+    per-row post_delete receivers of a farm's children return early then: the
+    farm's own pre_delete receivers settle whatever the cascade does not
+    remove, once for the whole farm instead of once per child row.
+    """
+    if getattr(instance, "farm_id", None) not in getattr(_deleting, "farm_ids", ()):
+        return False
+    # A row deleted on its own while its farm is going (origin is the row or
+    # a queryset of its model) is not part of the cascade
+    started = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return started is not type(instance)
+
+
+def farm_pre_delete(sender, instance, **kwargs):
+    if not hasattr(_deleting, "farm_ids"):
+        _deleting.farm_ids = set()
+    _deleting.farm_ids.add(instance.pk)
+
+
+def farm_post_delete(sender, instance, **kwargs):
+    getattr(_deleting, "farm_ids", set()).discard(instance.pk)
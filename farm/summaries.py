@@ -0,0 +1,226 @@
+"""
+Per-farm summary records (FarmSummary) behind the farm detail page.
+
+A write to one of a farm's SiteVisit or FarmEmployeeStats rows is applied to
+that farm's summary as a delta: the old row's values are taken out and the new
+row's put in. Latest dates only grow that way, so a change that removes the
+farm's latest visit day or the last return of its latest month, or that moves
+the end of the month series, refreshes the summary instead, with a few grouped
+queries over the farm's own rows served by the (farm, ...) indexes. Rows going
+in their farm's cascade delete are skipped; the summary goes with the farm.
+The detail page then reads one row instead of counting and charting on every
+view.
+"""
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+
+from farm.models import Farm, FarmEmployeeStats, FarmSummary, SiteVisit
+from farm.signals import deleted_with_farm
+
+SERIES_MONTHS = 12
+
+HEADCOUNT_FIELDS = ["citizen_male", "citizen_female", "expatriate_male", "expatriate_female"]
+
+# Columns snapshot() reads, per child model
+SNAPSHOT_FIELDS = {
+    SiteVisit: ["farm_id", "visit_date", "status"],
+    FarmEmployeeStats: ["farm_id", "reporting_month", *HEADCOUNT_FIELDS],
+}
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def _months_back(end, count):
+    months = [end]
+    for _ in range(count - 1):
+        months.append(month_of(months[-1] - datetime.timedelta(days=1)))
+    return months[::-1]
+
+
+def compute(farm_id):
+    """The FarmSummary field values for one farm, read from its source rows."""
+    visits = SiteVisit.objects.filter(farm_id=farm_id).order_by()
+    by_status = dict(visits.values_list("status").annotate(n=Count("pk")))
+    last_visit_date = visits.aggregate(last=Max("visit_date"))["last"]
+
+    headcount_by_month, returns = {}, 0
+    monthly = (
+        FarmEmployeeStats.objects.filter(farm_id=farm_id).order_by()
+        .values_list("reporting_month")
+        .annotate(
+            n=Sum(F("citizen_male") + F("citizen_female") + F("expatriate_male") + F("expatriate_female")),
+            rows=Count("pk"),
+        )
+    )
+    for day, n, rows in monthly:
+        headcount_by_month[month_of(day)] = headcount_by_month.get(month_of(day), 0) + (n or 0)
+        returns += rows
+    latest_month = max(headcount_by_month, default=None)
+
+    series = []
+    ends = [d for d in (latest_month, last_visit_date and month_of(last_visit_date)) if d]
+    if ends:
+        months = _months_back(max(ends), SERIES_MONTHS)
+        visit_counts = dict(
+            visits.filter(visit_date__gte=months[0])
+            .values_list("visit_date").annotate(n=Count("pk"))
+        )
+        per_month = {}
+        for day, n in visit_counts.items():
+            per_month[month_of(day)] = per_month.get(month_of(day), 0) + n
+        series = [
+            {"month": m.isoformat(), "headcount": headcount_by_month.get(m, 0), "visits": per_month.get(m, 0)}
+            for m in months
+        ]
+
+    return {
+        "visits_total": sum(by_status.values()),
+        "visits_by_status": by_status,
+        "last_visit_date": last_visit_date,
+        "employee_returns": returns,
+        "latest_month": latest_month,
+        "latest_headcount": headcount_by_month.get(latest_month, 0),
+        "series": series,
+    }
+
+
+def refresh(farm_id):
+    """Recompute one farm's summary from its source rows."""
+    values = compute(farm_id)
+    if Farm.objects.filter(pk=farm_id).exists():
+        FarmSummary.objects.update_or_create(farm_id=farm_id, defaults=values)
+
+
+def for_farm(farm):
+    """The farm's summary, computed on first use for farms written before summaries existed."""
+    try:
+        return farm.summary
+    except FarmSummary.DoesNotExist:
+        refresh(farm.pk)
+        return FarmSummary.objects.get(farm_id=farm.pk)
+
+
+def rebuild(farm_ids=None):
+    """Refresh the summaries of the given farms, or of every farm. Returns the count."""
+    if farm_ids is None:
+        farm_ids = Farm.objects.values_list("pk", flat=True).iterator()
+    count = 0
+    for farm_id in farm_ids:
+        refresh(farm_id)
+        count += 1
+    return count
+
+
+def snapshot(row):
+    """The summary-relevant values of a SiteVisit or FarmEmployeeStats row."""
+    if isinstance(row, SiteVisit):
+        return {"farm_id": row.farm_id, "visit_date": row.visit_date, "status": row.status}
+    headcount = sum(getattr(row, name) or 0 for name in HEADCOUNT_FIELDS)
+    return {"farm_id": row.farm_id, "month": month_of(row.reporting_month), "headcount": headcount}
+
+
+def _series_end(latest_month, last_visit_date):
+    ends = [d for d in (latest_month, last_visit_date and month_of(last_visit_date)) if d]
+    return max(ends, default=None)
+
+
+def _patch(summary, changes):
+    """
+    Apply (values, sign) changes to `summary` in place. Returns False, without
+    touching it, when they cannot be applied without re-reading the farm.
+    """
+    statuses, visit_days, visit_months = Counter(), Counter(), Counter()
+    returns, headcounts = Counter(), Counter()
+    for values, sign in changes:
+        if "visit_date" in values:
+            statuses[values["status"]] += sign
+            visit_days[values["visit_date"]] += sign
+            visit_months[month_of(values["visit_date"])] += sign
+        else:
+            returns[values["month"]] += sign
+            headcounts[values["month"]] += sign * values["headcount"]
+
+    # The latest visit day and return month can only be moved forward here
+    if visit_days[summary.last_visit_date] < 0 or returns[summary.latest_month] < 0:
+        return False
+    last_visit_date = max(
+        [day for day in (summary.last_visit_date,) if day] + [day for day, n in visit_days.items() if n > 0],
+        default=None,
+    )
+    latest_month = max(
+        [m for m in (summary.latest_month,) if m] + [m for m, n in returns.items() if n > 0],
+        default=None,
+    )
+    if _series_end(latest_month, last_visit_date) != _series_end(summary.latest_month, summary.last_visit_date):
+        return False
+
+    by_status = Counter(summary.visits_by_status)
+    by_status.update(statuses)
+    summary.visits_by_status = {status: n for status, n in by_status.items() if n}
+    summary.visits_total += sum(statuses.values())
+    summary.last_visit_date = last_visit_date
+    summary.employee_returns += sum(returns.values())
+    if latest_month != summary.latest_month:
+        summary.latest_headcount = 0
+    summary.latest_month = latest_month
+    summary.latest_headcount += headcounts[latest_month]
+    for point in summary.series:
+        month = datetime.date.fromisoformat(point["month"])
+        point["headcount"] += headcounts[month]
+        point["visits"] += visit_months[month]
+    return True
+
+
+def apply_changes(farm_id, changes):
+    """Apply (values, sign) changes of one farm's rows to its summary, or refresh it."""
+    with transaction.atomic():
+        summary = FarmSummary.objects.select_for_update().filter(farm_id=farm_id).first()
+        if summary is not None and _patch(summary, changes):
+            summary.save()
+            return
+    refresh(farm_id)
+
+
+# Signal receivers ------------------------------------------------------------
+
+def child_pre_save(sender, instance, raw=False, **kwargs):
+    instance._summary_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).only(*SNAPSHOT_FIELDS[sender]).first()
+    if previous is not None:
+        instance._summary_previous = snapshot(previous)
+
+
+def child_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = snapshot(instance)
+    previous = getattr(instance, "_summary_previous", None)
+    if previous is None:
+        apply_changes(current["farm_id"], [(current, 1)])
+    elif previous["farm_id"] != current["farm_id"]:
+        # Moving a row to another farm changes both farms' summaries
+        apply_changes(previous["farm_id"], [(previous, -1)])
+        apply_changes(current["farm_id"], [(current, 1)])
+    elif previous != current:
+        apply_changes(current["farm_id"], [(previous, -1), (current, 1)])
+
+
+def child_post_delete(sender, instance, origin=None, **kwargs):
+    if deleted_with_farm(instance, origin):
+        return
+    apply_changes(instance.farm_id, [(snapshot(instance), -1)])
+
+
+def children_bulk_changed(sender, farm_ids=None, months=None, **kwargs):
+    if farm_ids is None and months is not None:
+        farm_ids = set(
+            FarmEmployeeStats.objects.filter(reporting_month__in=months).values_list("farm_id", flat=True)
+        )
+    rebuild(farm_ids)
@@ -0,0 +1,328 @@
+"""
+Delta sync for offline clients (the service worker's local copy).
+
+`changes()` returns the rows of each sync resource whose `updated` falls in
+the window (watermark, now - SYNC_SETTLE_SECONDS], plus tombstones of rows
+that left the user's scope in that window: deleted, or moved out of it when a
+farm changed owner or a visit its agent. Tombstones record whose scope the row
+was in, so a user only learns the ids of rows they could see. The window's upper bound trails the clock a little so
+a transaction that stamped `updated` but has not committed yet is picked up by
+the next sync instead of being skipped. Large windows are paged per resource
+with an (updated, id) keyset; the opaque token carries the watermark and the
+page cursors. A client with no token, or one older than the tombstone
+retention, gets a full download flagged `reset`.
+
+`apply_visit_operations()` applies a batch of queued SiteVisit creates and
+updates from the outbox. Each operation runs in its own savepoint. Creates
+carry a client UUID, so a replayed batch does not duplicate visits.
+"""
+import base64
+import datetime
+import json
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.forms.models import model_to_dict
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from farm import scoping
+from farm.forms import SiteVisitForm
+from farm.models import Farm, Notice, SiteVisit, Tombstone
+from farm.signals import deleted_with_farm
+
+# resource -> (model, fields sent to clients); a trimmed field set keeps deltas small
+RESOURCES = {
+    "farms": (Farm, ("id", "name", "address", "account_number", "sector", "telephone", "updated")),
+    "sitevisits": (SiteVisit, ("id", "farm", "agent", "purpose", "visit_date", "notes", "status",
+                               "resolution_notes", "client_id", "updated")),
+    "notices": (Notice, ("id", "title", "message", "is_active", "created", "updated")),
+}
+DELETED = "_deleted"
+MAX_OPERATIONS = 200
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def encode_token(state):
+    payload = json.dumps(state, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+    try:
+        state = json.loads(base64.urlsafe_b64decode((token + "=" * (-len(token) % 4)).encode()))
+        for key in ("t", "u"):
+            if state.get(key):
+                state[key] = parse_datetime(state[key])
+        return state
+    except Exception as exc:
+        raise InvalidToken(token) from exc
+
+
+def scoped(resource, user):
+    """The rows of `resource` this user syncs."""
+    qs = RESOURCES[resource][0]._default_manager.for_user(user)
+    if user.role == "Designated Agent" and resource == "sitevisits":
+        qs = qs.filter(agent=user)
+    return qs
+
+
+def tombstones(user):
+    """The tombstones of rows that were in `user`'s sync scope (see scoped())."""
+    if scoping.is_restricted(user):
+        # Their farms' rows, deleted or handed to another owner, and shared rows
+        mine = Q(owner_id=user.pk) | Q(owner_id__isnull=True, moved=False)
+    else:
+        # Every row, but only deletes: a move keeps it in the portfolio
+        mine = Q(moved=False)
+    if user.role == "Designated Agent":
+        visits = Q(resource="sitevisits")
+        mine = (mine & ~visits) | (visits & Q(agent_id=user.pk))
+    return Tombstone.objects.filter(mine)
+
+
+def serialize(obj, fields):
+    data = {}
+    for name in fields:
+        value = getattr(obj, obj._meta.get_field(name).attname)
+        data[name] = str(value) if isinstance(value, uuid.UUID) else value
+    return data
+
+
+def _after(field, cursor):
+    moment, pk = parse_datetime(cursor[0]), cursor[1]
+    return Q(**{f"{field}__gt": moment}) | Q(**{field: moment, "id__gt": pk})
+
+
+def changes(user, token=None, limit=None):
+    limit = limit or _setting("SYNC_PAGE_SIZE", 500)
+    state = decode_token(token) if token else {}
+    now = timezone.now()
+
+    since = state.get("t")
+    horizon = now - datetime.timedelta(days=_setting("SYNC_TOMBSTONE_DAYS", 90))
+    cursors = state.get("c")
+    continuing = cursors is not None
+    reset = not continuing and (since is None or since < horizon)
+    if reset:
+        since = None
+    upto = state.get("u") or now - datetime.timedelta(seconds=_setting("SYNC_SETTLE_SECONDS", 5))
+
+    streams = {name: scoped(name, user) for name in RESOURCES}
+    if since is not None:
+        streams[DELETED] = tombstones(user)
+
+    result = {"reset": reset, "changes": {}, "deleted": {}}
+    next_cursors = {}
+    for name, qs in streams.items():
+        if continuing and name not in cursors:
+            continue
+        field = "deleted" if name == DELETED else "updated"
+        qs = qs.filter(**{f"{field}__lte": upto})
+        if since is not None:
+            qs = qs.filter(**{f"{field}__gt": since})
+        if continuing:
+            qs = qs.filter(_after(field, cursors[name]))
+        rows = list(qs.order_by(field, "id")[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursors[name] = [getattr(rows[-1], field).isoformat(), rows[-1].pk]
+
+        if name == DELETED:
+            returned = _back_in_scope(user, [tombstone for tombstone in rows if tombstone.moved])
+            for tombstone in rows:
+                if (tombstone.resource, tombstone.object_id) not in returned:
+                    result["deleted"].setdefault(tombstone.resource, []).append(tombstone.object_id)
+        else:
+            result["changes"][name] = [serialize(obj, RESOURCES[name][1]) for obj in rows]
+
+    if next_cursors:
+        next_state = {"t": since and since.isoformat(), "u": upto.isoformat(), "c": next_cursors}
+    else:
+        next_state = {"t": upto.isoformat()}
+    result["more"] = bool(next_cursors)
+    result["watermark"] = encode_token(next_state)
+    return result
+
+
+def _back_in_scope(user, moved):
+    """(resource, id) of moved rows that have since come back into `user`'s scope."""
+    ids = {}
+    for tombstone in moved:
+        ids.setdefault(tombstone.resource, set()).add(tombstone.object_id)
+    return {
+        (resource, pk)
+        for resource, pks in ids.items() if resource in RESOURCES
+        for pk in scoped(resource, user).filter(pk__in=pks).values_list("pk", flat=True)
+    }
+
+
+# Outbox ------------------------------------------------------------------------
+
+def _operation_error(op, status, errors):
+    return {"client_id": op.get("client_id"), "status": status, "errors": errors}
+
+
+def apply_visit_operation(user, op):
+    kind = op.get("op")
+    data = op.get("data") or {}
+    try:
+        client_id = uuid.UUID(str(op.get("client_id")))
+    except ValueError:
+        return _operation_error(op, "error", {"client_id": ["A UUID is required."]})
+
+    instance = None
+    if kind == "create":
+        existing = SiteVisit.objects.filter(client_id=client_id).first()
+        if existing is not None:
+            # A replay of a create that already went through
+            return {"client_id": str(client_id), "status": "ok", "id": existing.pk,
+                    "updated": existing.updated}
+    elif kind == "update":
+        instance = scoped("sitevisits", user).filter(pk=op.get("id")).first()
+        if instance is None:
+            return _operation_error(op, "error", {"id": ["Unknown or not permitted site visit."]})
+        base = parse_datetime(str(op.get("base_updated") or ""))
+        if base and instance.updated > base:
+            # Changed on the server since the client last saw it; the client decides
+            return {"client_id": str(client_id), "status": "conflict", "id": instance.pk,
+                    "current": serialize(instance, RESOURCES["sitevisits"][1])}
+        # Fields the client did not send keep their current values
+        data = {**model_to_dict(instance, fields=SiteVisitForm._meta.fields), **data}
+    else:
+        return _operation_error(op, "error", {"op": ["Expected 'create' or 'update'."]})
+    if user.role == "Designated Agent":
+        # Agents record their own visits and cannot hand them to someone else
+        data = {**data, "agent": user.pk}
+
+    form = SiteVisitForm(data, instance=instance)
+    if form.is_valid() and not scoped("farms", user).filter(pk=form.cleaned_data["farm"].pk).exists():
+        form.add_error("farm", "Unknown or not permitted farm.")
+    if not form.is_valid():
+        return _operation_error(op, "error", form.errors.get_json_data())
+
+    visit = form.save(commit=False)
+    if kind == "create":
+        visit.client_id = client_id
+    visit.save()
+    return {"client_id": str(client_id), "status": "ok", "id": visit.pk, "updated": visit.updated}
+
+
+def apply_visit_operations(user, operations):
+    """Apply queued SiteVisit operations in order; returns one result per operation."""
+    results = []
+    for op in operations[:MAX_OPERATIONS]:
+        op = op if isinstance(op, dict) else {}
+        try:
+            with transaction.atomic():
+                results.append(apply_visit_operation(user, op))
+        except IntegrityError:
+            # e.g. the same client_id created concurrently; a retry resolves it
+            results.append(_operation_error(op, "retry", {"__all__": ["Conflicting write, retry later."]}))
+    return results
+
+
+def prune_tombstones(days=None):
+    days = days if days is not None else _setting("SYNC_TOMBSTONE_DAYS", 90)
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    return Tombstone.objects.filter(deleted__lt=cutoff).delete()[0]
+
+
+# Signal receivers ------------------------------------------------------------
+
+def resource_of(model):
+    for name, (resource_model, _) in RESOURCES.items():
+        if model is resource_model:
+            return name
+    return None
+
+
+def scope_of(instance):
+    """{owner_id, agent_id} of a synced row: whose scope it is in."""
+    if isinstance(instance, Farm):
+        return {"owner_id": instance.owner_id, "agent_id": None}
+    if isinstance(instance, SiteVisit):
+        owner_id = Farm.objects.filter(pk=instance.farm_id).values_list("owner_id", flat=True).first()
+        return {"owner_id": owner_id, "agent_id": instance.agent_id}
+    return {"owner_id": None, "agent_id": None}
+
+
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # A farm's visits are tombstoned together by farm_pre_delete
+    if deleted_with_farm(instance, origin):
+        return
+    Tombstone.objects.create(resource=resource_of(sender), object_id=instance.pk, **scope_of(instance))
+
+
+def record_tombstones(model, rows, moved=False):
+    """
+    Tombstones for rows removed without delete signals (farm.bulk), or moved
+    out of a scope. `rows` are dicts with `pk` and, for scoped resources,
+    `owner_id` and `agent_id`.
+    """
+    resource = resource_of(model)
+    if resource is not None:
+        Tombstone.objects.bulk_create([
+            Tombstone(resource=resource, object_id=row["pk"], owner_id=row.get("owner_id"),
+                      agent_id=row.get("agent_id"), moved=moved)
+            for row in rows
+        ])
+
+
+def farm_pre_delete(sender, instance, **kwargs):
+    visits = SiteVisit.objects.filter(farm_id=instance.pk).order_by().values("pk", "agent_id")
+    record_tombstones(SiteVisit, [{**row, "owner_id": instance.owner_id} for row in visits])
+
+
+def farm_pre_save(sender, instance, raw=False, **kwargs):
+    instance._sync_previous_owner = None
+    if raw or instance.pk is None:
+        return
+    instance._sync_previous_owner = Farm.objects.filter(pk=instance.pk).values_list("owner_id", flat=True).first()
+
+
+def farm_post_save(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, "_sync_previous_owner", None)
+    if raw or previous is None or previous == instance.owner_id:
+        return
+    # The farm and its visits leave the previous owner's scope and enter the
+    # new one's; touching the visits has the new owner's clients pull them
+    visits = SiteVisit.objects.filter(farm_id=instance.pk)
+    record_tombstones(Farm, [{"pk": instance.pk, "owner_id": previous}], moved=True)
+    record_tombstones(
+        SiteVisit, [{"pk": pk, "owner_id": previous} for pk in visits.values_list("pk", flat=True)], moved=True,
+    )
+    visits.update(updated=timezone.now())
+
+
+def visit_pre_save(sender, instance, raw=False, **kwargs):
+    instance._sync_previous_scope = None
+    if raw or instance.pk is None:
+        return
+    instance._sync_previous_scope = (
+        SiteVisit.objects.filter(pk=instance.pk).values("agent_id", "farm_id", "farm__owner_id").first()
+    )
+
+
+def visit_post_save(sender, instance, raw=False, **kwargs):
+    # A visit handed to another agent, or moved to another owner's farm,
+    # leaves the previous agent's or owner's scope
+    previous = getattr(instance, "_sync_previous_scope", None)
+    if raw or previous is None:
+        return
+    left = {}
+    if previous["agent_id"] is not None and previous["agent_id"] != instance.agent_id:
+        left["agent_id"] = previous["agent_id"]
+    if previous["farm_id"] != instance.farm_id and previous["farm__owner_id"] != scope_of(instance)["owner_id"]:
+        left["owner_id"] = previous["farm__owner_id"]
+    if left:
+        record_tombstones(SiteVisit, [{"pk": instance.pk, **left}], moved=True)
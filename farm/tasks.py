@@ -0,0 +1,155 @@
+"""Background job handlers for the farm app (see jobs.registry)."""
+import csv
+import datetime
+import os
+import uuid
+from itertools import islice
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+
+from farm import compliance, ledger, rollups, search, summaries
+from farm.exports import EXPORT_CHUNK_SIZE, EXPORTABLE_MODELS, export_columns
+from farm.imports import ImportFileError, import_employee_stats
+from farm.models import Farm
+from jobs.registry import TaskError, enqueue, output_dir, output_path, task
+
+# Row errors kept on the job result; the full count is always reported
+MAX_REPORTED_ERRORS = 200
+# Rows an export job reads per `pk IN (...)` query
+EXPORT_PK_BATCH = 500
+
+
+def enqueue_export(queryset, field_names=None, created_by=None):
+    """
+    Queue a CSV export of `queryset`. The job records plain data, never the
+    query itself: the model label, the field names and, for a filtered
+    queryset, a file of the rows' pks in the queryset's order (resolved now,
+    so its filters and scoping apply), or for an unfiltered one its ordering.
+    """
+    model = queryset.model
+    if model._meta.label not in EXPORTABLE_MODELS:
+        raise ValueError(f"{model._meta.label} cannot be exported.")
+    fields = list(field_names) if field_names else None
+    export_columns(model, fields)
+    kwargs = {"model": model._meta.label, "fields": fields, "pks_file": None, "ordering": None}
+    if queryset.query.has_filters() or queryset.query.is_sliced:
+        # One pk per line in the jobs output directory, not in the job row; the job removes the file
+        kwargs["pks_file"] = f"pks-{uuid.uuid4().hex}.txt"
+        with open(os.path.join(output_dir(), kwargs["pks_file"]), "w") as fh:
+            for pk in queryset.values_list("pk", flat=True).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                fh.write(f"{pk}\n")
+    elif all(isinstance(name, str) for name in queryset.query.order_by):
+        kwargs["ordering"] = list(queryset.query.order_by)
+    return enqueue("farm.export_csv", created_by=created_by, **kwargs)
+
+
+def _read_pks(fh):
+    """The pks of a `pks_file`, EXPORT_PK_BATCH at a time."""
+    while batch := [int(line) for line in islice(fh, EXPORT_PK_BATCH)]:
+        yield batch
+
+
+def _export_rows(model, lookups, pk_batches=None, ordering=None):
+    """The rows to export: every row (in `ordering`), or the rows of each batch of pks in their order."""
+    if pk_batches is None:
+        qs = model._default_manager.all()
+        if ordering:
+            qs = qs.order_by(*ordering)
+        yield from qs.values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return
+    for batch in pk_batches:
+        rows = {row[0]: row[1:] for row in model._default_manager.filter(pk__in=batch).values_list("pk", *lookups)}
+        # Rows deleted since the export was queued are skipped
+        yield from (rows[pk] for pk in batch if pk in rows)
+
+
+@task("farm.export_csv")
+def export_csv(job, model, fields=None, pks_file=None, ordering=None):
+    if pks_file is None:
+        return _export_csv(job, model, fields, None, ordering)
+    path = os.path.join(output_dir(), os.path.basename(pks_file))
+    try:
+        with open(path) as fh:
+            total = sum(1 for _ in fh)
+            fh.seek(0)
+            return _export_csv(job, model, fields, _read_pks(fh), ordering, total)
+    finally:
+        os.remove(path)
+
+
+def _export_csv(job, model, fields, pk_batches, ordering, total=None):
+    if model not in EXPORTABLE_MODELS:
+        raise ValueError(f"{model} cannot be exported.")
+    model = apps.get_model(model)
+    total = model._default_manager.count() if total is None else total
+    headers, lookups = export_columns(model, fields)
+    path = output_path(job, f"{model._meta.label_lower}.csv")
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(headers)
+        for row in _export_rows(model, lookups, pk_batches, ordering):
+            writer.writerow(row)
+            written += 1
+            if written % EXPORT_CHUNK_SIZE == 0 and total:
+                job.set_progress(written * 100 // total, f"{written} of {total} rows written")
+    return {"rows": written}
+
+
+@task("farm.import_employee_stats")
+def import_stats(job, path, filename, scope="all", user_id=None):
+    """`scope` is "all", "owner" (the user's own farms) or "none", as decided by the upload view."""
+    user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+    if scope == "all":
+        farm_qs = Farm.objects.all()
+    elif scope == "owner" and user is not None:
+        farm_qs = Farm.objects.filter(owner=user)
+    else:
+        farm_qs = Farm.objects.none()
+
+    def progress(result):
+        job.set_progress(0, f"{result.rows} rows read, {result.imported} imported, {result.failed} rejected")
+
+    try:
+        with open(path, "rb") as fh:
+            result = import_employee_stats(fh, filename, farm_qs=farm_qs, created_by=user, progress=progress)
+    except ImportFileError as exc:
+        raise TaskError(str(exc)) from exc
+    finally:
+        os.remove(path)
+    return {
+        "rows": result.rows,
+        "imported": result.imported,
+        "failed": result.failed,
+        "errors": [
+            {"line": e.line, "messages": e.messages} for e in result.errors[:MAX_REPORTED_ERRORS]
+        ],
+    }
+
+
+@task("farm.rebuild_rollups")
+def rebuild_rollups(job, months=None):
+    if months is not None:
+        months = [datetime.date.fromisoformat(m) for m in months]
+    return {"rows": rollups.rebuild(months)}
+
+
+@task("farm.rebuild_compliance")
+def rebuild_compliance(job):
+    return {"rows": compliance.rebuild()}
+
+
+@task("farm.rebuild_ledger")
+def rebuild_ledger(job):
+    return {"rows": ledger.rebuild()}
+
+
+@task("farm.rebuild_summaries")
+def rebuild_summaries(job, farm_ids=None):
+    return {"farms": summaries.rebuild(farm_ids)}
+
+
+@task("farm.rebuild_search_index")
+def rebuild_search_index(job, kinds=None):
+    return {"documents": search.rebuild(kinds)}
@@ -0,0 +1,69 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from farm import rendercache
+
+register = template.Library()
+
+
+def _csrf_token(context):
+    token = context.get("csrf_token")
+    return str(token) if token else ""
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        cached = context.get("cached_fragment")
+        if cached is not None:
+            return cached
+        html = self.nodelist.render(context)
+        key = context.get("fragment_key")
+        if key:
+            rendercache.store(key, html, _csrf_token(context))
+        return html
+
+
+class CachedRowNode(template.Node):
+    def __init__(self, nodelist, obj):
+        self.nodelist = nodelist
+        self.obj = obj
+
+    def render(self, context):
+        obj = self.obj.resolve(context)
+        request = context.get("request")
+        if not rendercache.enabled() or obj is None or request is None:
+            return self.nodelist.render(context)
+        key = rendercache.row_key(
+            obj, rendercache.capabilities(request.user, context.get("bulk_actions") or ()), context.get("row_version", ""),
+        )
+        token = _csrf_token(context)
+        html = rendercache.fetch(key, token)
+        if html is None:
+            html = self.nodelist.render(context)
+            rendercache.store(key, html, token)
+        return mark_safe(html)
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    `{% fragment %}...{% endfragment %}`: the page body cached by
+    FragmentCacheMixin. Renders the cached copy when the view found one.
+    """
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(nodelist)
+
+
+@register.tag
+def cachedrow(parser, token):
+    """`{% cachedrow obj %}...{% endcachedrow %}`: one list row, cached on obj.pk + obj.updated + capabilities."""
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes one argument, the row's object.")
+    nodelist = parser.parse(("endcachedrow",))
+    parser.delete_first_token()
+    return CachedRowNode(nodelist, parser.compile_filter(bits[1]))
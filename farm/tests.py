@@ -1,3 +1,1219 @@
-from django.test import TestCase
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser as User
+from core.pagination import EstimatedCountPaginator
+from farm import bulk, compliance, ledger, rendercache, rollups, schedule, search, summaries
+from farm.exports import export_columns, stream_csv
+from farm.imports import ImportFileError, import_employee_stats
+from farm.models import (
+    Farm, SiteVisit, Notice, Statement, FarmEmployeeStats, EmployeeStatsRollup, MissingEmployeeReturn,
+    ComplianceMonth, StatementLedger, StatementPeriodSummary, Tombstone,
+)
+
+
+def make_farm(owner, name="Farm"):
+    return Farm.objects.create(
+        name=name, owner=owner, address="1 Main Road", account_number="ACC-1", sector="Agro"
+    )
+
+
+class ListViewQueryCountTests(TestCase):
+    """
+    Pin each list page to a constant number of queries, whatever the page size,
+    so a template dereferencing a relation row by row shows up as a failure.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.agent = User.objects.create_user(username="agent", password="x", role="Designated Agent")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_rows(self, n):
+        start = Farm.objects.count()
+        for i in range(start, start + n):
+            owner = User.objects.create(username=f"owner{i}")
+            farm = make_farm(owner, name=f"Farm {i}")
+            SiteVisit.objects.create(farm=farm, agent=self.agent, visit_date=datetime.date(2025, 1, 1))
+            Statement.objects.create(
+                farm=farm, period_start=datetime.date(2025, 1, 1), period_end=datetime.date(2025, 1, 31)
+            )
+            FarmEmployeeStats.objects.create(
+                farm=farm, reporting_month=datetime.date(2025, 1, 1), employment_type="Permanent"
+            )
+
+    def count_queries(self, url_name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def assertConstantQueries(self, url_name, expected):
+        self.create_rows(1)
+        self.assertEqual(self.count_queries(url_name), expected)
+        self.create_rows(19)
+        self.assertEqual(self.count_queries(url_name), expected)
+
+    def test_farm_list(self):
+        self.assertConstantQueries("farm:farm_list", 4)
+
+    def test_sitevisit_list(self):
+        # one more for the bulk "Reassign to" agent choices
+        self.assertConstantQueries("farm:sitevisit_list", 5)
+
+    def test_statement_list(self):
+        self.assertConstantQueries("farm:statement_list", 4)
+
+    def test_employee_stats_list(self):
+        self.assertConstantQueries("farm:farmemployeestats_list", 4)
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        farm = make_farm(cls.admin)
+        for day in range(1, 26):
+            SiteVisit.objects.create(farm=farm, visit_date=datetime.date(2025, 1, day))
+        # a tie on visit_date must be broken by id, not skipped or repeated
+        SiteVisit.objects.create(farm=farm, visit_date=datetime.date(2025, 1, 5))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_walks_every_row_once_in_both_directions(self):
+        url = reverse("farm:sitevisit_list")
+        seen, pages, cursor = [], [], None
+        while True:
+            response = self.client.get(url, {"cursor": cursor} if cursor else {})
+            page = response.context["cursor_page"]
+            pages.append(page)
+            seen.extend(v.pk for v in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        expected = list(SiteVisit.objects.order_by("-visit_date", "-id").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages[0].approximate_total, 26)
+
+        previous = self.client.get(url, {"cursor": pages[-1].previous_cursor}).context["cursor_page"]
+        self.assertEqual([v.pk for v in previous], [v.pk for v in pages[-2]])
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse("farm:sitevisit_list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_parameter_keeps_offset_pagination(self):
+        response = self.client.get(reverse("farm:sitevisit_list"), {"page": 2})
+        self.assertTrue(response.context["is_paginated"])
+        self.assertNotIn("cursor_page", response.context)
+
+
+class ImportTests(TestCase):
+
+    HEADER = "farm,reporting_month,employment_type,citizen_male,employees_contribution_usd,arrears_usd\n"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.accountant = User.objects.create_user(username="accountant", password="x", role="Accountant")
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        cls.farm = make_farm(cls.manager, "Imported")
+        cls.foreign = make_farm(cls.admin, "Foreign")
+
+    def run_import(self, rows, farm_qs=None):
+        return import_employee_stats(io.StringIO(self.HEADER + rows), "stats.csv", farm_qs=farm_qs)
+
+    def test_upsert_normalizes_months_and_reports_row_errors(self):
+        result = self.run_import(
+            f"{self.farm.pk},2025-03-17,Permanent,5,10.00,1.00\n"
+            f"{self.farm.pk},2025-03-01,Casual,-1,0,0\n"
+            f"999999,2025-03-01,Permanent,1,0,0\n"
+        )
+        self.assertEqual((result.rows, result.imported, [error.line for error in result.errors]), (3, 1, [3, 4]))
+        stats = FarmEmployeeStats.objects.get(farm=self.farm)
+        self.assertEqual(stats.reporting_month, datetime.date(2025, 3, 1))
+        self.assertEqual(stats.total_contribution_usd, Decimal("11.00"))
+
+        result = self.run_import(f"{self.farm.pk},2025-03-31,Permanent,7,20.00,0\n")
+        self.assertEqual(result.imported, 1)
+        stats = FarmEmployeeStats.objects.get(farm=self.farm)
+        self.assertEqual((stats.citizen_male, stats.total_contribution_usd), (7, Decimal("20.00")))
+
+    def test_blank_cells_keep_stored_values(self):
+        self.run_import(f"{self.farm.pk},2025-03-01,Permanent,5,10.00,1.00\n")
+        result = self.run_import(f"{self.farm.pk},2025-03-01,Permanent,6,,\n{self.farm.pk},2025-04-01,Permanent,,,\n")
+        self.assertEqual(result.imported, 2)
+        march, april = FarmEmployeeStats.objects.filter(farm=self.farm).order_by("reporting_month")
+        self.assertEqual((march.citizen_male, march.employees_contribution_usd, march.total_contribution_usd),
+                         (6, Decimal("10.00"), Decimal("11.00")))
+        self.assertEqual((april.citizen_male, april.total_contribution_usd), (0, Decimal("0")))
+
+    def test_rows_are_limited_to_the_farms_the_user_may_pick(self):
+        upload = io.BytesIO(f"{self.HEADER}{self.foreign.pk},2025-03-01,Permanent,1,0,0\n".encode())
+        upload.name = "stats.csv"
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse("farm:farmemployeestats_import"), {"file": upload})
+        self.assertEqual(response.context["result"].failed, 1)
+        self.assertFalse(FarmEmployeeStats.objects.exists())
+
+        upload.seek(0)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse("farm:farmemployeestats_import"), {"file": upload})
+        self.assertEqual(response.context["result"].imported, 1)
+
+
+    def test_only_farm_editors_may_upload(self):
+        upload = io.BytesIO(f"{self.HEADER}{self.farm.pk},2025-03-01,Permanent,1,0,0\n".encode())
+        upload.name = "stats.csv"
+        url = reverse("farm:farmemployeestats_import")
+        with mock.patch("farm.views.enqueue") as enqueue:
+            response = self.client.post(url, {"file": upload, "background": "on"})
+            self.assertRedirects(response, f"{settings.LOGIN_URL}?next={url}", fetch_redirect_response=False)
+            self.client.force_login(self.accountant)
+            upload.seek(0)
+            self.assertEqual(self.client.post(url, {"file": upload, "background": "on"}).status_code, 403)
+        enqueue.assert_not_called()
+
+    def test_unreadable_files_are_reported(self):
+        for content, name in ((self.HEADER.encode() + b"\xff\xfe\n", "stats.csv"), (b"not a workbook", "stats.xlsx")):
+            with self.assertRaises(ImportFileError):
+                import_employee_stats(io.BytesIO(content), name)
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="root", password="x", email="root@example.com")
+        cls.farm = make_farm(cls.admin, "Exported")
+        for day in (1, 2, 3):
+            SiteVisit.objects.create(farm=cls.farm, agent=cls.admin, visit_date=datetime.date(2025, 1, day))
+
+    def test_stream_joins_foreign_keys(self):
+        response = stream_csv(SiteVisit.objects.order_by("visit_date"), ["pk", "farm", "agent", "visit_date"])
+        with self.assertNumQueries(1):
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,farm,agent,visit_date")
+        self.assertEqual(lines[1:], [f"{pk},Exported,root,2025-01-0{day}" for pk, day in zip(
+            SiteVisit.objects.order_by("visit_date").values_list("pk", flat=True), (1, 2, 3))])
+
+    def test_unknown_fields_are_rejected(self):
+        for names in (["visit_date", "no_such_field"], ["farm__name"]):
+            with self.assertRaises(FieldDoesNotExist):
+                export_columns(SiteVisit, names)
+        with self.assertRaises(FieldDoesNotExist):
+            export_columns(Farm, ["visits"])
+        with self.assertRaises(FieldDoesNotExist):
+            stream_csv(SiteVisit.objects.all(), ["nope"])
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse("admin:farm_sitevisit_changelist"), {
+            "action": "export_as_csv", "_selected_action": list(SiteVisit.objects.values_list("pk", flat=True)[:2]),
+        })
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("id,farm,"))
+
+
+class RollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="x", role="Manager")
+        cls.agro = make_farm(cls.owner, "Agro Farm")
+        cls.timber = Farm.objects.create(
+            name="Timber Farm", owner=cls.owner, address="2 Main Road", account_number="ACC-2", sector="Timber"
+        )
+
+    def rollup_rows(self):
+        columns = ["month", "sector", "employment_type", "records"] + rollups.METRIC_FIELDS
+        return sorted(EmployeeStatsRollup.objects.values_list(*columns))
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollup_rows()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+        return incremental
+
+    def add(self, farm, month, employment_type="Permanent", **values):
+        return FarmEmployeeStats.objects.create(
+            farm=farm, reporting_month=month, employment_type=employment_type, **values
+        )
+
+    def test_incremental_maintenance_matches_rebuild(self):
+        jan, feb = datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)
+        first = self.add(self.agro, jan, citizen_male=4, employees_contribution_usd=Decimal("10.50"))
+        self.add(self.agro, jan, "Casual", citizen_female=2, arrears_usd=Decimal("3"))
+        moved = self.add(self.timber, feb, expatriate_male=1)
+        self.assertMatchesRebuild()
+
+        first.citizen_male = 9
+        first.save()
+        moved.farm, moved.reporting_month, moved.employment_type = self.agro, jan, "Seasonal"
+        moved.save()
+        self.assertMatchesRebuild()
+
+        self.agro.sector = "Timber"
+        with CaptureQueriesContext(connection) as ctx:
+            self.agro.save()
+        # only this farm's rows are read; no month is rebuilt across farms
+        reads = [q["sql"] for q in ctx.captured_queries if 'FROM "farm_farmemployeestats"' in q["sql"]]
+        self.assertTrue(reads and all('"farm_id" = ' in sql for sql in reads))
+        self.assertMatchesRebuild()
+
+        first.delete()
+        rows = self.assertMatchesRebuild()
+        self.assertNotIn("Agro", {row[1] for row in rows})
+
+    def test_edit_touches_only_its_buckets(self):
+        stats = self.add(self.agro, datetime.date(2025, 1, 1), citizen_male=1)
+        stats.citizen_male = 3
+        with CaptureQueriesContext(connection) as ctx:
+            stats.save()
+        updates = [q["sql"] for q in ctx.captured_queries if "farm_employeestatsrollup" in q["sql"]]
+        self.assertEqual(len(updates), 3)
+        self.assertTrue(all(sql.startswith("UPDATE") for sql in updates))
+        self.assertEqual(EmployeeStatsRollup.objects.get(sector="", employment_type="").citizen_male, 3)
+
+
+class LedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.accountant = User.objects.create_user(username="accountant", password="x", role="Accountant")
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        cls.mine = make_farm(cls.manager, "Mine")
+        cls.theirs = make_farm(cls.accountant, "Theirs")
+
+    def statement(self, farm, month, sales, expenses=0, currency="USD"):
+        return Statement.objects.create(
+            farm=farm, currency=currency, period_start=datetime.date(2025, month, 1),
+            period_end=datetime.date(2025, month, 28), total_sales=sales, total_expenses=expenses,
+        )
+
+    def ledger_rows(self):
+        columns = ("currency", "month", "statements", "total_sales", "total_expenses", "net", "running_balance")
+        return (sorted(StatementLedger.objects.values_list("farm_id", *columns)),
+                sorted(StatementPeriodSummary.objects.values_list(*columns)))
+
+    def assertMatchesRebuild(self):
+        incremental = self.ledger_rows()
+        ledger.rebuild()
+        self.assertEqual(incremental, self.ledger_rows())
+
+    def test_incremental_maintenance_matches_rebuild(self):
+        january = self.statement(self.mine, 1, 100, 40)
+        self.statement(self.mine, 3, 50)
+        self.statement(self.theirs, 2, 30, 10, currency="ZWL")
+        self.assertMatchesRebuild()
+        self.assertEqual(StatementLedger.objects.get(farm=self.mine, month=datetime.date(2025, 3, 1)).running_balance,
+                         110)
+
+        january.period_end, january.total_expenses = datetime.date(2025, 4, 30), 0
+        january.save()
+        self.assertMatchesRebuild()
+        january.delete()
+        self.assertMatchesRebuild()
+        self.mine.delete()
+        self.assertMatchesRebuild()
+
+    def test_missing_rows_rebuild_the_account(self):
+        january = self.statement(self.mine, 1, 100, 40)
+        march = self.statement(self.mine, 3, 50)
+        self.statement(self.theirs, 3, 30)
+        # Rows lost (or never backfilled): a delta can't be applied to them
+        StatementLedger.objects.filter(farm=self.mine, month=datetime.date(2025, 1, 1)).delete()
+
+        january.total_sales = 80
+        january.save()
+        self.assertMatchesRebuild()
+        StatementPeriodSummary.objects.all().delete()
+        march.delete()
+        self.assertMatchesRebuild()
+        StatementPeriodSummary.objects.all().delete()
+        self.mine.delete()
+        self.assertMatchesRebuild()
+
+    def test_view_is_scoped(self):
+        url = reverse("farm:statement_ledger")
+        self.statement(self.mine, 1, 100)
+        self.statement(self.mine, 2, 10, 30)
+        self.statement(self.theirs, 1, 500)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.manager)
+        series = self.client.get(url).json()["series"]["USD"]
+        self.assertEqual([(Decimal(row["net"]), Decimal(row["running_balance"])) for row in series], [(100, 100), (-20, 80)])
+        self.assertEqual(self.client.get(url, {"farm": self.theirs.pk}).status_code, 404)
+
+        self.client.force_login(self.accountant)
+        series = self.client.get(url).json()["series"]["USD"]
+        self.assertEqual([Decimal(row["running_balance"]) for row in series], [600, 580])
+
+
+class FarmSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.farm = make_farm(self.admin)
+
+    def add_stats(self, month, employment_type="Permanent", **counts):
+        return FarmEmployeeStats.objects.create(
+            farm=self.farm, reporting_month=month, employment_type=employment_type, **counts
+        )
+
+    def test_maintained_on_writes(self):
+        visit = SiteVisit.objects.create(farm=self.farm, visit_date=datetime.date(2025, 2, 10))
+        SiteVisit.objects.create(farm=self.farm, visit_date=datetime.date(2025, 3, 1), status="Completed")
+        self.add_stats(datetime.date(2025, 2, 1), citizen_male=4)
+        stats = self.add_stats(datetime.date(2025, 3, 1), citizen_male=5, expatriate_female=1)
+        self.add_stats(datetime.date(2025, 3, 1), "Casual", citizen_female=2)
+
+        summary = Farm.objects.get(pk=self.farm.pk).summary
+        self.assertEqual(summary.visits_total, 2)
+        self.assertEqual(summary.visits_by_status, {"Pending": 1, "Completed": 1})
+        self.assertEqual(summary.last_visit_date, datetime.date(2025, 3, 1))
+        self.assertEqual(summary.latest_month, datetime.date(2025, 3, 1))
+        self.assertEqual(summary.latest_headcount, 8)
+        self.assertEqual(len(summary.series), 12)
+        self.assertEqual(summary.series[-2:], [
+            {"month": "2025-02-01", "headcount": 4, "visits": 1},
+            {"month": "2025-03-01", "headcount": 8, "visits": 1},
+        ])
+
+        stats.delete()
+        visit.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.visits_total, 1)
+        self.assertEqual(summary.latest_headcount, 2)
+        self.assertEqual(summary.employee_returns, 2)
+
+        expected = summaries.compute(self.farm.pk)
+        for name, value in expected.items():
+            self.assertEqual(getattr(summary, name), value)
+
+    def test_farm_delete_cascades(self):
+        SiteVisit.objects.create(farm=self.farm, visit_date=datetime.date(2025, 2, 10))
+        self.add_stats(datetime.date(2025, 2, 1), citizen_male=4)
+        self.farm.delete()
+        self.assertFalse(Farm.objects.exists())
+
+    def test_edits_patch_the_summary(self):
+        other = make_farm(self.admin, "Other")
+        visit = SiteVisit.objects.create(farm=self.farm, visit_date=datetime.date(2025, 2, 10))
+        SiteVisit.objects.create(farm=self.farm, visit_date=datetime.date(2025, 3, 5))
+        stats = self.add_stats(datetime.date(2025, 3, 1), citizen_male=4)
+        self.add_stats(datetime.date(2025, 2, 1), citizen_male=1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            visit.status = "Completed"
+            visit.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "farm_sitevisit"' in q["sql"] and "COUNT" in q["sql"]])
+        stats.citizen_female = 3
+        stats.save()
+        visit.farm = other
+        visit.save()
+        # the latest month's only return moves back: re-read from the rows
+        stats.reporting_month = datetime.date(2025, 1, 1)
+        stats.save()
+
+        for farm in (self.farm, other):
+            summary = summaries.for_farm(Farm.objects.get(pk=farm.pk))
+            for name, value in summaries.compute(farm.pk).items():
+                self.assertEqual(getattr(summary, name), value, name)
+
+    def populate(self, farm, per_month):
+        SiteVisit.objects.bulk_create([
+            SiteVisit(farm=farm, visit_date=datetime.date(2025, 1 + n % 12, 1)) for n in range(12 * per_month)
+        ])
+        FarmEmployeeStats.objects.bulk_create([
+            FarmEmployeeStats(farm=farm, reporting_month=datetime.date(2024, 1 + n, 1),
+                              employment_type="Permanent", citizen_male=n * per_month)
+            for n in range(12)
+        ])
+        Statement.objects.bulk_create([
+            Statement(farm=farm, currency="USD", period_start=datetime.date(2025, 1 + n % 6, 1),
+                      period_end=datetime.date(2025, 1 + n % 6, 28), total_sales=10, total_expenses=0)
+            for n in range(6 * per_month)
+        ])
+
+    def test_farm_delete_settles_derived_rows_once(self):
+        # Same months, eight times the rows: the delete costs the same queries
+        big = make_farm(self.admin, "Big")
+        self.populate(self.farm, 1)
+        self.populate(big, 8)
+        rollups.rebuild()
+        ledger.rebuild()
+        visit_ids = set(big.visits.values_list("pk", flat=True))
+
+        with CaptureQueriesContext(connection) as small_delete:
+            self.farm.delete()
+        with CaptureQueriesContext(connection) as big_delete:
+            big.delete()
+        self.assertEqual(len(big_delete), len(small_delete))
+        self.assertFalse(EmployeeStatsRollup.objects.exists())
+        self.assertFalse(StatementPeriodSummary.objects.exists())
+        self.assertTrue(visit_ids <= set(
+            Tombstone.objects.filter(resource="sitevisits").values_list("object_id", flat=True)
+        ))
+
+    def test_detail_page_reads_summary(self):
+        SiteVisit.objects.create(farm=self.farm, visit_date=datetime.date(2025, 2, 10))
+        url = reverse("farm:farm_detail", args=[self.farm.pk])
+        with override_settings(RENDER_CACHE_ENABLED=False):
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+        self.assertContains(response, "Site visits: 1")
+        # session + user, farm with owner and summary, ledger series
+        self.assertEqual(len(ctx), 4)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        cls.farm = make_farm(cls.manager, name="Mazowe Citrus Estate")
+        cls.other = make_farm(cls.admin, name="Chipinge Tea Estate")
+        cls.visit = SiteVisit.objects.create(
+            farm=cls.farm, visit_date=datetime.date(2025, 1, 1), notes="Irrigation pump broken near the orchard"
+        )
+        cls.notice = Notice.objects.create(title="Payroll deadline", message="Returns are due for every estate")
+        Statement.objects.create(
+            farm=cls.other, period_start=datetime.date(2025, 1, 1), period_end=datetime.date(2025, 1, 31)
+        )
+
+    def kinds(self, query, **kwargs):
+        return [(r.kind, r.object_id) for r in search.search(query, **kwargs)]
+
+    def test_ranked_prefix_search(self):
+        self.assertEqual(self.kinds("irrigation pu"), [("sitevisit", self.visit.pk)])
+        # title matches outrank body matches
+        self.assertEqual(self.kinds("estate")[0][0], "farm")
+        self.assertIn(("notice", self.notice.pk), self.kinds("estate"))
+        self.assertEqual(self.kinds('"); DROP TABLE farm_farm; --'), [])
+
+    def test_kept_in_sync(self):
+        self.farm.name = "Bindura Orchards"
+        self.farm.save()
+        self.assertIn(("sitevisit", self.visit.pk), self.kinds("bindura"))
+        self.assertNotIn(("sitevisit", self.visit.pk), self.kinds("mazowe"))
+
+        self.visit.delete()
+        self.assertEqual(self.kinds("irrigation"), [])
+
+    def test_manager_scope(self):
+        results = self.kinds("estate", owner_id=self.manager.pk)
+        self.assertIn(("farm", self.farm.pk), results)
+        self.assertIn(("notice", self.notice.pk), results)
+        self.assertNotIn(("farm", self.other.pk), results)
+
+    def test_endpoint(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse("farm:search"), {"q": "estate", "kind": "farm", "format": "json"})
+        data = response.json()
+        self.assertEqual([r["id"] for r in data["results"]], [self.farm.pk])
+        self.assertFalse(data["has_next"])
+
+        response = self.client.get(reverse("farm:search"), {"q": "orchard"})
+        self.assertContains(response, "<mark>orchard</mark>")
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        cls.farm = make_farm(cls.manager, name="Own")
+        cls.other = make_farm(cls.admin, name="Other")
+        for farm in (cls.farm, cls.other):
+            for day in (1, 15):
+                SiteVisit.objects.create(farm=farm, visit_date=datetime.date(2025, 1, day))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse("api-v1:sitevisits_list")
+
+    def test_fields_filters_and_pagination(self):
+        response = self.client.get(self.url, {"fields": "farm,visit_date", "farm": self.farm.pk, "limit": 1})
+        data = response.json()
+        self.assertEqual(data["results"], [{"id": data["results"][0]["id"], "farm": self.farm.pk, "visit_date": "2025-01-15"}])
+
+        data = self.client.get(data["next"]).json()
+        self.assertEqual(data["results"][0]["visit_date"], "2025-01-01")
+        self.assertIsNone(data["next"])
+
+        data = self.client.get(self.url, {"since": "2025-01-10"}).json()
+        self.assertEqual(len(data["results"]), 2)
+
+        self.assertEqual(self.client.get(self.url, {"fields": "password"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"since": "yesterday"}).status_code, 400)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # session, user, then the aggregate only; no rows are read
+        self.assertEqual(len(ctx), 3)
+
+        self.assertNotIn("Last-Modified", response)
+
+        SiteVisit.objects.filter(farm=self.other).first().delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_conditional_get_from_model_versions(self):
+        cache.clear()
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # session and user only; the collection is not queried
+        self.assertEqual(len(ctx), 2)
+
+        SiteVisit.objects.filter(farm=self.other).first().delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_manager_scope(self):
+        self.client.force_login(self.manager)
+        data = self.client.get(reverse("api-v1:farms_list")).json()
+        self.assertEqual([row["id"] for row in data["results"]], [self.farm.pk])
+        response = self.client.get(reverse("api-v1:farms_detail", args=[self.other.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(username="agent", password="x", role="Designated Agent")
+        cls.other_agent = User.objects.create_user(username="agent2", password="x", role="Designated Agent")
+        cls.farm = make_farm(cls.agent)
+
+    def setUp(self):
+        self.client.force_login(self.agent)
+        self.url = reverse("api-v1:sync")
+
+    def pull(self, watermark=None, **params):
+        if watermark:
+            params["since"] = watermark
+        return self.client.get(self.url, params).json()
+
+    def test_delta_and_tombstones(self):
+        mine = SiteVisit.objects.create(farm=self.farm, agent=self.agent, visit_date=datetime.date(2025, 1, 1))
+        SiteVisit.objects.create(farm=self.farm, agent=self.other_agent, visit_date=datetime.date(2025, 1, 2))
+
+        first = self.pull()
+        self.assertTrue(first["reset"])
+        self.assertEqual([v["id"] for v in first["changes"]["sitevisits"]], [mine.pk])
+        self.assertEqual(len(first["changes"]["farms"]), 1)
+
+        unchanged = self.pull(first["watermark"])
+        self.assertFalse(unchanged["reset"])
+        self.assertEqual(unchanged["changes"], {"farms": [], "sitevisits": [], "notices": []})
+
+        pk = mine.pk
+        mine.delete()
+        self.assertTrue(Tombstone.objects.filter(resource="sitevisits", object_id=pk).exists())
+        delta = self.pull(first["watermark"])
+        self.assertEqual(delta["deleted"], {"sitevisits": [pk]})
+
+    def test_tombstones_follow_scope(self):
+        owner = User.objects.create_user(username="owner", password="x", role="Manager")
+        buyer = User.objects.create_user(username="buyer", password="x", role="Manager")
+        admin = User.objects.create_user(username="syncadmin", password="x", role="Admin")
+        farm = make_farm(owner, "Sold")
+        visit = SiteVisit.objects.create(farm=farm, agent=self.agent, visit_date=datetime.date(2025, 1, 1))
+        gone = SiteVisit.objects.create(farm=farm, agent=self.agent, visit_date=datetime.date(2025, 1, 2))
+        watermarks = {}
+        for user in (owner, buyer, admin, self.agent, self.other_agent):
+            self.client.force_login(user)
+            watermarks[user.pk] = self.pull()["watermark"]
+
+        gone_pk = gone.pk
+        gone.delete()
+        farm.owner = buyer
+        farm.save()
+
+        def delta(user):
+            self.client.force_login(user)
+            return self.pull(watermarks[user.pk])
+
+        self.assertEqual(delta(owner)["deleted"], {"sitevisits": [gone_pk, visit.pk], "farms": [farm.pk]})
+        bought = delta(buyer)
+        self.assertEqual(bought["deleted"], {})
+        self.assertEqual([v["id"] for v in bought["changes"]["sitevisits"]], [visit.pk])
+        self.assertEqual(delta(admin)["deleted"], {"sitevisits": [gone_pk]})
+        self.assertEqual(delta(self.agent)["deleted"], {"sitevisits": [gone_pk]})
+        self.assertEqual(delta(self.other_agent)["deleted"], {})
+
+        # Reassigned visits leave the previous agent's copy
+        bulk.reassign_visits(SiteVisit.objects.filter(pk=visit.pk), {"agent": str(self.other_agent.pk)})
+        self.assertEqual(delta(self.agent)["deleted"], {"sitevisits": [gone_pk, visit.pk]})
+        self.assertEqual(delta(self.other_agent)["deleted"], {})
+
+        # ... until they come back
+        bulk.reassign_visits(SiteVisit.objects.filter(pk=visit.pk), {"agent": str(self.agent.pk)})
+        self.assertEqual(delta(self.agent)["deleted"], {"sitevisits": [gone_pk]})
+
+    def test_paging(self):
+        for day in range(1, 6):
+            SiteVisit.objects.create(farm=self.farm, agent=self.agent, visit_date=datetime.date(2025, 1, day))
+        seen, data = [], {"more": True, "watermark": None}
+        while data["more"]:
+            data = self.pull(data["watermark"], limit=2)
+            seen += [v["id"] for v in data["changes"].get("sitevisits", [])]
+        self.assertEqual(sorted(seen), sorted(SiteVisit.objects.values_list("pk", flat=True)))
+
+    def test_outbox_is_idempotent(self):
+        op = {"op": "create", "client_id": str(uuid.uuid4()), "data": {
+            "farm": self.farm.pk, "visit_date": "2025-03-01", "purpose": "Inspection", "status": "Pending",
+        }}
+        bad = {"op": "create", "client_id": str(uuid.uuid4()), "data": {"farm": self.farm.pk}}
+        url = reverse("api-v1:sync_sitevisits")
+        for _ in range(2):
+            response = self.client.post(url, {"operations": [op, bad]}, content_type="application/json")
+            ok, error = response.json()["results"]
+            self.assertEqual(ok["status"], "ok")
+            self.assertEqual(error["status"], "error")
+        visit = SiteVisit.objects.get()
+        self.assertEqual(visit.agent, self.agent)
+
+        # An agent can't record a visit, or hand one over, for someone else
+        other = {"op": "create", "client_id": str(uuid.uuid4()), "data": {
+            **op["data"], "agent": self.other_agent.pk,
+        }}
+        handover = {"op": "update", "id": visit.pk, "client_id": str(uuid.uuid4()),
+                    "data": {"agent": self.other_agent.pk}}
+        self.client.post(url, {"operations": [other, handover]}, content_type="application/json")
+        self.assertFalse(SiteVisit.objects.filter(agent=self.other_agent).exists())
+        SiteVisit.objects.exclude(pk=visit.pk).delete()
+        visit.refresh_from_db()
+
+        update = {"op": "update", "id": visit.pk, "client_id": str(uuid.uuid4()), "data": {"status": "Completed"},
+                  "base_updated": (visit.updated - datetime.timedelta(seconds=1)).isoformat()}
+        result = self.client.post(url, {"operations": [update]}, content_type="application/json").json()
+        self.assertEqual(result["results"][0]["status"], "conflict")
+        update["base_updated"] = visit.updated.isoformat()
+        self.client.post(url, {"operations": [update]}, content_type="application/json")
+        visit.refresh_from_db()
+        self.assertEqual(visit.status, "Completed")
+        self.assertEqual(visit.purpose, "Inspection")
+
+
+class ScopingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="mgr", password="x", role="Manager")
+        cls.other = User.objects.create_user(username="other", password="x", role="Manager")
+        cls.admin = User.objects.create_user(username="adm", password="x", role="Admin")
+        cls.mine = make_farm(cls.manager, "Mine")
+        cls.theirs = make_farm(cls.other, "Theirs")
+        for farm in (cls.mine, cls.theirs):
+            SiteVisit.objects.create(farm=farm, visit_date=datetime.date(2025, 1, 1))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_for_user(self):
+        self.assertEqual(list(SiteVisit.objects.for_user(self.manager).values_list("farm", flat=True)), [self.mine.pk])
+        self.assertEqual(SiteVisit.objects.for_user(self.admin).count(), 2)
+        self.assertEqual(Notice.objects.for_user(self.manager).count(), Notice.objects.count())
+
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse("farm:sitevisit_list"))
+        self.assertEqual([v.farm_id for v in response.context["site_visits"]], [self.mine.pk])
+        visit = self.theirs.visits.get()
+        self.assertEqual(self.client.get(reverse("farm:sitevisit_detail", args=[visit.pk])).status_code, 404)
+
+    def test_farm_ids_cached_and_invalidated(self):
+        Farm.objects.for_user(User.objects.get(pk=self.manager.pk)).count()
+        fresh = User.objects.get(pk=self.manager.pk)
+        with self.assertNumQueries(1):
+            # the id set comes from the cache; only the scoped query itself runs
+            self.assertEqual(list(Farm.objects.for_user(fresh).values_list("pk", flat=True)), [self.mine.pk])
+
+        self.theirs.owner = self.manager
+        self.theirs.save()
+        fresh = User.objects.get(pk=self.manager.pk)
+        self.assertEqual(Farm.objects.for_user(fresh).count(), 2)
+        self.assertEqual(Farm.objects.for_user(User.objects.get(pk=self.other.pk)).count(), 0)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_farm_ids_not_cached_per_process(self):
+        Farm.objects.for_user(User.objects.get(pk=self.manager.pk)).count()
+        fresh = User.objects.get(pk=self.manager.pk)
+        with self.assertNumQueries(2):
+            # another worker's cache could still hold an old set: read it again
+            self.assertEqual(list(Farm.objects.for_user(fresh).values_list("pk", flat=True)), [self.mine.pk])
+        with self.assertNumQueries(1):
+            # ... once per request
+            Farm.objects.for_user(fresh).count()
+
+
+class RenderCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="adm", password="x", role="Admin")
+        cls.manager = User.objects.create_user(username="mgr", password="x", role="Manager")
+        cls.farm = make_farm(cls.manager, "Cached Farm")
+        cls.visit = SiteVisit.objects.create(farm=cls.farm, agent=cls.admin, visit_date=datetime.date(2025, 1, 1))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_render_skips_orm_until_a_change(self):
+        self.client.force_login(self.admin)
+        url = reverse("farm:farm_list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertContains(response, "Cached Farm")
+        # session + user only: no farm queries
+        self.assertEqual(len(ctx), 2)
+
+        self.farm.name = "Renamed Farm"
+        self.farm.save()
+        self.assertContains(self.client.get(url), "Renamed Farm")
+        # the visit list shows the farm name too
+        self.assertContains(self.client.get(reverse("farm:sitevisit_list")), "Renamed Farm")
+
+    @override_settings(CACHE_SHARED=False)
+    def test_not_cached_without_a_shared_cache(self):
+        self.client.force_login(self.admin)
+        url = reverse("farm:farm_list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertContains(self.client.get(url), "Cached Farm")
+        self.assertTrue([q for q in ctx.captured_queries if 'FROM "farm_farm"' in q["sql"]])
+        self.assertFalse([key for key in cache._cache if ":render:" in key and ":render:version:" not in key])
+
+    def test_pages_are_kept_per_role_and_csrf_token_per_request(self):
+        url = reverse("farm:farm_list")
+        self.client.force_login(self.admin)
+        self.assertNotContains(self.client.get(url), "Add Farm")
+        self.client.force_login(self.manager)
+        self.assertContains(self.client.get(url), "Add Farm")
+
+        # staff get the bulk-action checkboxes whatever their role
+        visits = reverse("farm:sitevisit_list")
+        users = [User.objects.create_user(username=f"acc-{is_staff}", password="x", role="Accountant",
+                                          is_staff=is_staff) for is_staff in (False, True)]
+        for user in users:
+            self.client.force_login(user)
+            response = self.client.get(visits)
+            self.assertContains(response, "Cached Farm")
+            self.assertEqual(f'name="pk" value="{self.visit.pk}"' in response.content.decode(), user.is_staff)
+
+        detail = reverse("farm:sitevisit_detail", args=[self.visit.pk])
+        for _ in range(2):
+            response = self.client.get(detail)
+            self.assertNotContains(response, rendercache.CSRF_PLACEHOLDER)
+            self.assertContains(response, 'name="csrfmiddlewaretoken"')
+
+
+class AsyncViewTests(TestCase):
+    """The list/detail views served through ASGI (AsyncClient)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="mgr", password="x", role="Manager")
+        cls.other = User.objects.create_user(username="other", password="x", role="Manager")
+        cls.mine = make_farm(cls.manager, "Mine")
+        cls.theirs = make_farm(cls.other, "Theirs")
+        for farm in (cls.mine, cls.theirs):
+            SiteVisit.objects.create(farm=farm, visit_date=datetime.date(2025, 1, 1))
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_lists_and_details_are_scoped(self):
+        await self.async_client.aforce_login(self.manager)
+        url = reverse("farm:sitevisit_list")
+        for query in ({}, {"page": 1}):
+            response = await self.async_client.get(url, query)
+            self.assertEqual([v.farm_id for v in response.context["site_visits"]], [self.mine.pk])
+        self.assertEqual(response.context["paginator"].count, 1)
+
+        response = await self.async_client.get(reverse("farm:farm_detail", args=[self.mine.pk]))
+        self.assertContains(response, "Mine")
+        response = await self.async_client.get(reverse("farm:farm_detail", args=[self.theirs.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_export_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.manager)
+        response = await self.async_client.get(reverse("farm:farm_list"), {"export": "csv"})
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn("Mine", body)
+        self.assertNotIn("Theirs", body)
+
+
+class BulkActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="adm", password="x", role="Admin")
+        cls.agent = User.objects.create_user(username="agent", password="x", role="Designated Agent")
+        cls.manager = User.objects.create_user(username="mgr", password="x", role="Manager")
+        cls.other = User.objects.create_user(username="other", password="x", role="Manager")
+        cls.mine = make_farm(cls.manager, "Mine")
+        cls.theirs = make_farm(cls.other, "Theirs")
+        cls.visits = [
+            SiteVisit.objects.create(farm=cls.mine, visit_date=datetime.date(2025, 1, day)) for day in (1, 2, 3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, url, action, pks, **data):
+        return self.client.post(url, {"action": action, "pk": [obj.pk for obj in pks], **data})
+
+    def test_update_runs_one_update_and_refreshes_derived_rows(self):
+        self.client.force_login(self.admin)
+        url = reverse("farm:sitevisit_list")
+        before = self.visits[0].updated
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(url, "set_status", self.visits[:2], status="Completed")
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "farm_sitevisit"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(SiteVisit.objects.filter(status="Completed").count(), 2)
+        self.assertGreater(SiteVisit.objects.get(pk=self.visits[0].pk).updated, before)
+        self.assertEqual(summaries.for_farm(Farm.objects.get(pk=self.mine.pk)).visits_by_status.get("Completed"), 2)
+
+        self.post(url, "reassign", self.visits, agent=self.agent.pk)
+        self.assertEqual(SiteVisit.objects.filter(agent=self.agent).count(), 3)
+        self.assertContains(self.client.get(url), "3 site visits reassigned.")
+
+    def test_delete_checks_role_and_scope(self):
+        mine = Statement.objects.create(farm=self.mine, period_start=datetime.date(2025, 1, 1),
+                                        period_end=datetime.date(2025, 1, 31), total_sales=100)
+        theirs = Statement.objects.create(farm=self.theirs, period_start=datetime.date(2025, 1, 1),
+                                          period_end=datetime.date(2025, 1, 31), total_sales=50)
+        url = reverse("farm:statement_list")
+        self.client.force_login(self.manager)
+        self.assertEqual(self.post(url, "delete", [mine]).status_code, 403)
+
+        self.client.force_login(self.admin)
+        self.post(url, "delete", [mine])
+        self.assertFalse(Statement.objects.filter(pk=mine.pk).exists())
+        self.assertEqual(ledger.totals()["USD"]["sales"], 50)
+        self.assertEqual(ledger.totals(self.mine.owner_id), {})
+
+        self.post(reverse("farm:sitevisit_list"), "delete", self.visits[:1])
+        self.assertTrue(Tombstone.objects.filter(resource="sitevisits", object_id=self.visits[0].pk).exists())
+
+    def test_agents_only_change_their_own_visits(self):
+        SiteVisit.objects.filter(pk=self.visits[0].pk).update(agent=self.agent)
+        self.client.force_login(self.agent)
+        self.post(reverse("farm:sitevisit_list"), "set_status", self.visits, status="Resolved")
+        self.assertEqual(list(SiteVisit.objects.filter(status="Resolved").values_list("pk", flat=True)),
+                         [self.visits[0].pk])
+
+
+class AdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="root", password="x", email="root@example.com")
+        cls.farm = make_farm(cls.admin, "Big Farm")
+        for day in range(1, 26):
+            SiteVisit.objects.create(farm=cls.farm, agent=cls.admin, visit_date=datetime.date(2025, 1, day))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_joins_shown_relations_and_filters_by_search(self):
+        url = reverse("admin:farm_sitevisit_changelist")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # no per-row farm/agent lookups
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "farm_farm" WHERE' in q["sql"]])
+        self.assertContains(response, 'name="farm"')
+        self.assertEqual(self.client.get(url, {"farm": "big"}).context["cl"].result_count, 25)
+        self.assertEqual(self.client.get(url, {"farm": "nothing"}).context["cl"].result_count, 0)
+
+    def test_farm_inlines_are_capped(self):
+        response = self.client.get(reverse("admin:farm_farm_change", args=[self.farm.pk]))
+        formset = next(f for f in response.context["inline_admin_formsets"] if f.formset.model is SiteVisit)
+        self.assertEqual(len(formset.formset.forms), 20)
+
+    def test_estimated_count(self):
+        SiteVisit.objects.filter(pk=SiteVisit.objects.order_by("pk").first().pk).delete()
+        paginator = EstimatedCountPaginator(SiteVisit.objects.order_by("pk"), 10)
+        paginator.estimate_threshold = 1
+        highest = SiteVisit.objects.order_by("-pk").values_list("pk", flat=True).first()
+        self.assertEqual(paginator.count, highest)
+        exact = EstimatedCountPaginator(SiteVisit.objects.filter(farm=self.farm).order_by("pk"), 10)
+        exact.estimate_threshold = 1
+        self.assertEqual(exact.count, 24)
+
+
+class AutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        cls.agent = User.objects.create_user(username="jdoe", password="x", role="Designated Agent",
+                                             first_name="Tendai", last_name="Moyo")
+        cls.farm = make_farm(cls.manager, name="Apple Orchard")
+        cls.other = make_farm(cls.admin, name="Avocado Estate")
+        make_farm(cls.admin, name="Banana Grove")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_prefix_lookup_scope_and_cache(self):
+        url = reverse("api-v1:autocomplete", args=["farms"])
+        data = self.client.get(url, {"q": "a"}).json()
+        self.assertEqual([row["text"] for row in data["results"]], ["Apple Orchard", "Avocado Estate"])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {"q": "A"})
+        # session and user only; the choices come from the cache
+        self.assertEqual(len(ctx), 2)
+
+        agents = self.client.get(reverse("api-v1:autocomplete", args=["agents"]), {"q": "moy"}).json()
+        self.assertEqual(agents["results"], [{"id": self.agent.pk, "text": "jdoe"}])
+
+        self.client.force_login(self.manager)
+        data = self.client.get(url, {"q": "a"}).json()
+        self.assertEqual([row["id"] for row in data["results"]], [self.farm.pk])
+        self.assertEqual(self.client.get(reverse("api-v1:autocomplete", args=["nope"])).status_code, 404)
+
+    def test_rename_retires_cached_choices(self):
+        url = reverse("api-v1:autocomplete", args=["farms"])
+        self.client.get(url, {"q": "b"})
+        self.other.name = "Blueberry Hill"
+        self.other.save()
+        data = self.client.get(url, {"q": "b"}).json()
+        self.assertEqual([row["text"] for row in data["results"]], ["Banana Grove", "Blueberry Hill"])
+
+    def test_form_renders_selected_choice_only_and_validates_pk(self):
+        visit = SiteVisit.objects.create(farm=self.farm, agent=self.agent, visit_date=datetime.date(2025, 1, 1))
+        response = self.client.get(reverse("farm:sitevisit_update", args=[visit.pk]))
+        self.assertContains(response, "Apple Orchard")
+        self.assertNotContains(response, "Banana Grove")
+        self.assertContains(response, 'data-autocomplete="/api/v1/autocomplete/farms/"')
+
+        data = {"purpose": visit.purpose, "farm": self.other.pk, "agent": self.manager.pk,
+                "visit_date": "2025-01-02", "status": visit.status}
+        response = self.client.post(reverse("farm:sitevisit_update", args=[visit.pk]), data)
+        self.assertIn("agent", response.context["form"].errors)
+        data["agent"] = self.agent.pk
+        self.client.post(reverse("farm:sitevisit_update", args=[visit.pk]), data)
+        visit.refresh_from_db()
+        self.assertEqual(visit.farm, self.other)
+
+
+@override_settings(SCHEDULE_MAX_VISITS_PER_DAY=2, SCHEDULE_MAX_VISITS_PER_WEEK=3)
+class ScheduleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.agent = User.objects.create_user(username="agent", password="x", role="Designated Agent")
+        cls.farm = make_farm(cls.admin, "North")
+        cls.other = make_farm(cls.admin, "South")
+        cls.monday = datetime.date(2025, 3, 3)
+        for status in ("Planned", "Pending", "Completed"):
+            SiteVisit.objects.create(farm=cls.farm, agent=cls.agent, visit_date=cls.monday, status=status)
+        SiteVisit.objects.create(farm=cls.other, visit_date=cls.monday + datetime.timedelta(days=8))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_timeline_by_day_and_week(self):
+        end = self.monday + datetime.timedelta(days=13)
+        with self.assertNumQueries(2):
+            days = schedule.timeline(SiteVisit.objects.all(), self.monday, end, "day")
+        self.assertEqual(len(days["buckets"]), 14)
+        agent, unassigned = days["agents"]
+        self.assertEqual((agent["name"], agent["open"], agent["total"]), ("agent", 2, 3))
+        self.assertEqual(agent["cells"][0]["by_status"], {"Planned": 1, "Pending": 1, "Completed": 1})
+        self.assertEqual((unassigned["id"], unassigned["cells"][8]["total"]), (None, 1))
+
+        weeks = schedule.timeline(SiteVisit.objects.all(), self.monday, end, "week")
+        self.assertEqual(weeks["buckets"], [self.monday, self.monday + datetime.timedelta(days=7)])
+        self.assertEqual([cell["total"] for cell in weeks["agents"][0]["cells"]], [3, 0])
+
+        response = self.client.get(reverse("farm:sitevisit_schedule"), {"start": "2025-03-03", "by": "week"})
+        self.assertContains(response, "2 / 3")
+
+    def test_load_check_counts_accepted_proposals(self):
+        tuesday = (self.monday + datetime.timedelta(days=1)).isoformat()
+        visits = [
+            {"farm": self.farm.pk, "agent": self.agent.pk, "visit_date": self.monday.isoformat()},
+            {"farm": self.other.pk, "agent": self.agent.pk, "visit_date": tuesday},
+            {"farm": self.farm.pk, "agent": self.agent.pk, "visit_date": tuesday},
+            {"farm": self.farm.pk},
+        ]
+        with self.assertNumQueries(1):
+            results = schedule.check_proposals(visits)
+        self.assertEqual([result["ok"] for result in results], [False, True, False, False])
+        self.assertEqual(len(results[0]["problems"]), 2)  # farm conflict and a full day
+        self.assertIn("3 open visits that week", results[2]["problems"][0])
+
+        response = self.client.post(reverse("api-v1:schedule_check"), {"visits": visits[1:2]},
+                                    content_type="application/json")
+        self.assertEqual(response.json()["results"], [{"ok": True, "problems": []}])
+        data = self.client.get(reverse("api-v1:schedule"), {"start": "2025-03-03", "end": "2025-03-09"}).json()
+        self.assertEqual(data["agents"][0]["cells"][0]["open"], 2)
+        self.assertEqual(self.client.get(reverse("api-v1:schedule"), {"by": "month"}).status_code, 400)
+
+    @override_settings(SCHEDULE_MAX_PROPOSAL_DAYS=7)
+    def test_load_check_rejects_a_long_span(self):
+        visits = [{"farm": self.farm.pk, "visit_date": day} for day in ("2025-03-03", "2025-03-10")]
+        response = self.client.post(reverse("api-v1:schedule_check"), {"visits": visits},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("7 days", response.json()["error"])
+
+
+@override_settings(COMPLIANCE_MONTHS=3)
+class ComplianceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        cls.filer = make_farm(cls.manager, "Filer")
+        cls.late = make_farm(cls.admin, "Late")
+        cls.late.sector = "Timber"
+        cls.late.save()
+        cls.months = compliance.due_months()
+        Farm.objects.update(created=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+        for month in cls.months:
+            cls.file(cls.filer, month)
+
+    @staticmethod
+    def file(farm, month, employment_type="Permanent"):
+        return FarmEmployeeStats.objects.create(farm=farm, reporting_month=month.replace(day=15),
+                                                employment_type=employment_type)
+
+    def setUp(self):
+        cache.clear()
+
+    def missing(self):
+        return set(MissingEmployeeReturn.objects.values_list("farm__name", "month"))
+
+    def test_rebuild_and_incremental_refresh(self):
+        self.assertEqual(compliance.rebuild(), 3)
+        self.assertEqual(self.missing(), {("Late", month) for month in self.months})
+
+        stats = self.file(self.late, self.months[0])
+        self.assertEqual(len(self.missing()), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            stats.delete()
+        self.assertEqual(len(self.missing()), 3)
+
+        bulk.delete(FarmEmployeeStats.objects.filter(farm=self.filer, reporting_month__gte=self.months[-1]))
+        self.assertIn(("Filer", self.months[-1]), self.missing())
+
+    def test_filters_and_report(self):
+        compliance.rebuild()
+        latest = self.months[-1]
+        self.assertEqual(list(compliance.missing_farms(self.admin, latest, sector="Timber")), [self.late])
+        self.assertEqual(list(compliance.missing_farms(self.admin, latest, owner=self.manager)), [])
+        self.assertEqual(list(compliance.missing_farms(self.manager, latest)), [])
+        self.assertEqual(set(compliance.missing_farms(self.admin, latest, employment_type="Seasonal")),
+                         {self.filer, self.late})
+        self.assertEqual(compliance.month_counts(self.admin), {month: 1 for month in self.months})
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("farm:farmemployeestats_compliance"))
+        self.assertEqual([farm.name for farm in response.context["farms"]], ["Late"])
+        response = self.client.get(reverse("farm:farmemployeestats_compliance"),
+                                   {"month": latest.strftime("%Y-%m"), "employment_type": "Seasonal"})
+        self.assertEqual(response.context["paginator"].count, 2)
+
+    def test_ensure_current_builds_every_missing_month(self):
+        ComplianceMonth.objects.all().delete()
+        compliance.ensure_current()
+        self.assertEqual(self.missing(), {("Late", month) for month in self.months})
+
+        # A lost cache re-checks the built months instead of trusting the latest one
+        ComplianceMonth.objects.filter(month__in=self.months[:2]).delete()
+        MissingEmployeeReturn.objects.filter(month__in=self.months[:2]).delete()
+        cache.clear()
+        with mock.patch.object(compliance, "rebuild", wraps=compliance.rebuild) as rebuild:
+            compliance.ensure_current()
+        rebuild.assert_called_once_with(months=self.months[:2])
+        self.assertEqual(self.missing(), {("Late", month) for month in self.months})
+
+
+class ReportingMonthTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        cls.farm = make_farm(cls.manager, "Monthly")
+        cls.other = make_farm(cls.manager, "Other")
+        for farm, day, employment_type in (
+            (cls.farm, datetime.date(2025, 1, 20), "Permanent"),
+            (cls.farm, datetime.date(2025, 3, 5), "Permanent"),
+            (cls.farm, datetime.date(2025, 3, 31), "Casual"),
+            (cls.other, datetime.date(2025, 2, 14), "Permanent"),
+        ):
+            FarmEmployeeStats.objects.create(farm=farm, reporting_month=day, employment_type=employment_type)
+
+    def test_months_are_normalized_on_write(self):
+        self.assertEqual(set(FarmEmployeeStats.objects.values_list("reporting_month", flat=True)),
+                         {datetime.date(2025, 1, 1), datetime.date(2025, 2, 1), datetime.date(2025, 3, 1)})
+
+        self.client.force_login(self.manager)
+        data = {"farm": self.farm.pk, "reporting_month": "2025-03", "employment_type": "Casual"}
+        for name in ("citizen_male", "citizen_female", "expatriate_male", "expatriate_female"):
+            data[name] = 0
+        response = self.client.post(reverse("farm:farmemployeestats_create"), data)
+        # the same farm, month and type as the 31 March return
+        self.assertIn("__all__", response.context["form"].errors)
+
+    def test_month_lookups(self):
+        stats = FarmEmployeeStats.objects
+        self.assertIn('"reporting_month" = ', str(stats.for_month(datetime.date(2025, 3, 17)).query))
+        self.assertEqual(stats.for_month(datetime.date(2025, 3, 17)).count(), 2)
+        self.assertEqual(stats.between_months(datetime.date(2025, 1, 31), datetime.date(2025, 2, 2)).count(), 2)
+        latest = stats.latest_per_farm().order_by("farm__name", "employment_type")
+        self.assertEqual(
+            list(latest.values_list("farm__name", "reporting_month", "employment_type")),
+            [("Monthly", datetime.date(2025, 3, 1), "Casual"), ("Monthly", datetime.date(2025, 3, 1), "Permanent"),
+             ("Other", datetime.date(2025, 2, 1), "Permanent")],
+        )
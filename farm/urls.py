@@ -4,6 +4,7 @@ from . import views
 
 urlpatterns = [
     # Farm
+    path('search/', views.SearchView.as_view(), name='search'),
     path('farms/', views.FarmListView.as_view(), name='farm_list'),
     path('farms/create/', views.FarmCreateView.as_view(), name='farm_create'),
     path('farms/<int:pk>/', views.FarmDetailView.as_view(), name='farm_detail'),
@@ -13,6 +14,7 @@ urlpatterns = [
     # SiteVisit
     path('sitevisits/', views.SiteVisitListView.as_view(), name='sitevisit_list'),
     path('sitevisits/create/', views.SiteVisitCreateView.as_view(), name='sitevisit_create'),
+    path('sitevisits/schedule/', views.SiteVisitScheduleView.as_view(), name='sitevisit_schedule'),
     path('sitevisits/<int:pk>/', views.SiteVisitDetailView.as_view(), name='sitevisit_detail'),
     path('sitevisits/<int:pk>/update/', views.SiteVisitUpdateView.as_view(), name='sitevisit_update'),
     path('sitevisits/<int:pk>/delete/', views.SiteVisitDeleteView.as_view(), name='sitevisit_delete'),
@@ -28,6 +30,7 @@ urlpatterns = [
     # Statement
     path('statements/', views.StatementListView.as_view(), name='statement_list'),
     path('statements/create/', views.StatementCreateView.as_view(), name='statement_create'),
+    path('statements/ledger/', views.StatementLedgerView.as_view(), name='statement_ledger'),
     path('statements/<int:pk>/', views.StatementDetailView.as_view(), name='statement_detail'),
     path('statements/<int:pk>/update/', views.StatementUpdateView.as_view(), name='statement_update'),
     path('statements/<int:pk>/delete/', views.StatementDeleteView.as_view(), name='statement_delete'),
@@ -35,6 +38,9 @@ urlpatterns = [
     # FarmEmployeeStats
     path('farm-employee-stats/', views.FarmEmployeeStatsListView.as_view(), name='farmemployeestats_list'),
     path('farm-employee-stats/create/', views.FarmEmployeeStatsCreateView.as_view(), name='farmemployeestats_create'),
+    path('farm-employee-stats/import/', views.FarmEmployeeStatsImportView.as_view(), name='farmemployeestats_import'),
+    path('farm-employee-stats/report/', views.EmployeeStatsReportView.as_view(), name='farmemployeestats_report'),
+    path('farm-employee-stats/compliance/', views.ComplianceReportView.as_view(), name='farmemployeestats_compliance'),
     path('farm-employee-stats/<int:pk>/', views.FarmEmployeeStatsDetailView.as_view(), name='farmemployeestats_detail'),
     path('farm-employee-stats/<int:pk>/update/', views.FarmEmployeeStatsUpdateView.as_view(), name='farmemployeestats_update'),
     path('farm-employee-stats/<int:pk>/delete/', views.FarmEmployeeStatsDeleteView.as_view(), name='farmemployeestats_delete'),
@@ -1,36 +1,79 @@
+import os
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.views import generic
 from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth import get_user_model
 from django.views import View
-from farm.models import Farm, SiteVisit, Notice, Statement, FarmEmployeeStats
-from farm.forms import FarmForm, StatementForm, SiteVisitForm, FarmEmployeeStatsForm, NoticeForm
-from django.core.exceptions import FieldError
+from farm.models import Farm, SiteVisit, Notice, Statement, FarmEmployeeStats, EmployeeStatsRollup, FarmSummary
+from farm.forms import (
+    ComplianceFilterForm, FarmForm, StatementForm, SiteVisitForm, FarmEmployeeStatsForm, NoticeForm,
+    FarmEmployeeStatsImportForm,
+)
+from farm.imports import ImportFileError, import_employee_stats
+from farm import compliance, ledger, schedule, search, summaries
+from jobs.registry import enqueue, output_dir
+from django.core.exceptions import FieldError, PermissionDenied
+from farm.mixins import (
+    BulkActionMixin, FarmChoiceMixin, FragmentCacheMixin, RelatedListMixin, ScopedQuerysetMixin,
+)
+from farm.exports import CSVExportMixin
+from core.asyncviews import AsyncDetailView, AsyncListView
+from core.pagination import CursorPaginationMixin
+
+User = get_user_model()
 
 
 # Farm views
-class FarmListView(generic.ListView):
+class FarmListView(CSVExportMixin, FragmentCacheMixin, CursorPaginationMixin, ScopedQuerysetMixin, RelatedListMixin,
+                   AsyncListView):
     model = Farm
     template_name = "farm/farm_list.html"
     context_object_name = "farms"
     paginate_by = 20
-
-    def get_queryset(self):
-        qs = super().get_queryset()
-        user = self.request.user
-
-        # Only show farms managed by this user if they’re a Manager
-        if user.is_authenticated and user.role == "Manager":
-            qs = qs.filter(owner=user)
-
-        # Admins see all farms
-        return qs
+    list_select_related = ("owner",)
+    fragment_models = (Farm, User)
+    row_models = (User,)
+    cursor_ordering = ("-created", "-id")
+    cursor_approximate_total = 1000
 
 
-class FarmDetailView(generic.DetailView):
+class FarmDetailView(FragmentCacheMixin, ScopedQuerysetMixin, AsyncDetailView):
     model = Farm
     template_name = "farm/detail.html"
     context_object_name = "farm"
+    # The summary follows visits and returns; the ledger panel follows statements
+    fragment_models = (Farm, User, SiteVisit, FarmEmployeeStats, FarmSummary, Statement)
+
+    def get_queryset(self):
+        # Counts and chart series come from the farm's FarmSummary row
+        return super().get_queryset().select_related("owner", "summary")
+
+    async def aget_context_data(self, **kwargs):
+        # for_farm() computes and saves a missing summary, so it stays sync
+        self.summary = await sync_to_async(summaries.for_farm)(self.object)
+        self.ledger_series = await ledger.afarm_series(self.object)
+        return await super().aget_context_data(**kwargs)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        summary = self.summary
+        ctx["summary"] = summary
+        ctx["summary_chart"] = {
+            "labels": [point["month"][:7] for point in summary.series],
+            "headcount": [point["headcount"] for point in summary.series],
+            "visits": [point["visits"] for point in summary.series],
+        }
+        series = self.ledger_series
+        ctx["ledger"] = {currency: points[-1] for currency, points in series.items()}
+        ctx["ledger_series"] = series
+        return ctx
 
 
 class FarmCreateView(generic.CreateView):
@@ -44,14 +87,14 @@ class FarmCreateView(generic.CreateView):
         form.instance.owner = self.request.user
         return super().form_valid(form)
 
-class FarmUpdateView(generic.UpdateView):
+class FarmUpdateView(ScopedQuerysetMixin, generic.UpdateView):
     model = Farm
     form_class = FarmForm
     template_name = "farm/update.html"
     success_url = reverse_lazy("farm:farm_list")
 
 
-class FarmDeleteView(generic.DeleteView):
+class FarmDeleteView(ScopedQuerysetMixin, generic.DeleteView):
     model = Farm
     success_url = reverse_lazy("farm:farm_list")
 
@@ -61,11 +104,17 @@ class FarmDeleteView(generic.DeleteView):
 
 
 # SiteVisit views
-class SiteVisitListView(generic.ListView):
+class SiteVisitListView(CSVExportMixin, BulkActionMixin, FragmentCacheMixin, CursorPaginationMixin, ScopedQuerysetMixin,
+                        RelatedListMixin, AsyncListView):
     model = SiteVisit
     template_name = "visits/index.html"
     context_object_name = "site_visits"
     paginate_by = 20
+    list_select_related = ("farm", "agent")
+    fragment_models = (SiteVisit, Farm, User)
+    row_models = (Farm, User)
+    cursor_ordering = ("-visit_date", "-id")
+    cursor_approximate_total = 1000
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -83,10 +132,30 @@ class SiteVisitListView(generic.ListView):
                 return qs
 
 
-class SiteVisitDetailView(generic.DetailView):
+class SiteVisitScheduleView(LoginRequiredMixin, generic.TemplateView):
+    """Agent workload timeline (farm.schedule): open and total visits per agent by day or week."""
+    template_name = "visits/schedule.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        try:
+            start, end, bucket = schedule.parse_window(self.request.GET)
+        except ValueError as exc:
+            messages.error(self.request, str(exc))
+            start, end, bucket = schedule.parse_window({})
+        ctx.update(schedule.timeline(schedule.visits_for(self.request.user), start, end, bucket))
+        ctx.update({
+            "start": start, "end": end, "bucket": bucket,
+            "limit": schedule.max_per_week() if bucket == "week" else schedule.max_per_day(),
+        })
+        return ctx
+
+
+class SiteVisitDetailView(FragmentCacheMixin, ScopedQuerysetMixin, AsyncDetailView):
     model = SiteVisit
     template_name = "visits/detail.html"
     context_object_name = "sitevisit"
+    fragment_models = (SiteVisit, Farm, User)
 
 
 class SiteVisitCreateView(generic.CreateView):
@@ -96,7 +165,7 @@ class SiteVisitCreateView(generic.CreateView):
     success_url = reverse_lazy("farm:sitevisit_list")
 
 
-class SiteVisitUpdateView(generic.UpdateView):
+class SiteVisitUpdateView(ScopedQuerysetMixin, generic.UpdateView):
     model = SiteVisit
     form_class = SiteVisitForm
     template_name = "visits/update.html"
@@ -104,7 +173,7 @@ class SiteVisitUpdateView(generic.UpdateView):
     success_url = reverse_lazy("farm:sitevisit_list")
 
 
-class SiteVisitDeleteView(generic.DeleteView):
+class SiteVisitDeleteView(ScopedQuerysetMixin, generic.DeleteView):
     model = SiteVisit
     success_url = reverse_lazy("farm:sitevisit_list")
 
@@ -113,14 +182,14 @@ class SiteVisitDeleteView(generic.DeleteView):
 
 
 # Notice views
-class NoticeListView(generic.ListView):
+class NoticeListView(CSVExportMixin, BulkActionMixin, AsyncListView):
     model = Notice
     template_name = "notices/index.html"
     context_object_name = "notices"
     paginate_by = 20
 
 
-class NoticeDetailView(generic.DetailView):
+class NoticeDetailView(AsyncDetailView):
     model = Notice
     template_name = "notices/detail.html"
     context_object_name = "notice"
@@ -167,11 +236,17 @@ class NoticeStatusView(View):
         return redirect(self.success_url)
     
 # Statement views
-class StatementListView(generic.ListView):
+class StatementListView(CSVExportMixin, BulkActionMixin, FragmentCacheMixin, CursorPaginationMixin, ScopedQuerysetMixin,
+                        RelatedListMixin, AsyncListView):
     model = Statement
     template_name = "statements/index.html"
     context_object_name = "statements"
     paginate_by = 20
+    list_select_related = ("farm",)
+    fragment_models = (Statement, Farm)
+    row_models = (Farm,)
+    cursor_ordering = ("-created", "-id")
+    cursor_approximate_total = 1000
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -189,10 +264,11 @@ class StatementListView(generic.ListView):
                 return qs
 
 
-class StatementDetailView(generic.DetailView):
+class StatementDetailView(FragmentCacheMixin, ScopedQuerysetMixin, AsyncDetailView):
     model = Statement
     template_name = "statements/detail.html"
     context_object_name = "statement"
+    fragment_models = (Statement, Farm, User)
 
 
 class StatementCreateView(generic.CreateView):
@@ -203,14 +279,14 @@ class StatementCreateView(generic.CreateView):
 
 
 
-class StatementUpdateView(generic.UpdateView):
+class StatementUpdateView(ScopedQuerysetMixin, generic.UpdateView):
     model = Statement
     form_class = StatementForm
     template_name = "statements/update.html"
     success_url = reverse_lazy("farm:statement_list")
 
 
-class StatementDeleteView(generic.DeleteView):
+class StatementDeleteView(ScopedQuerysetMixin, generic.DeleteView):
     model = Statement
     success_url = reverse_lazy("farm:statement_list")
     def get(self, request, *args, **kwargs):
@@ -218,12 +294,88 @@ class StatementDeleteView(generic.DeleteView):
         return self.post(request, *args, **kwargs)
 
 
+class StatementLedgerView(LoginRequiredMixin, View):
+    """
+    JSON time series of statement totals and running balances per currency,
+    for one farm (?farm=<pk>) or every farm the user may see.
+    """
+
+    def get(self, request, *args, **kwargs):
+        currency = request.GET.get("currency") or None
+        try:
+            months = max(1, min(int(request.GET.get("months", 12)), 120))
+        except ValueError:
+            months = 12
+
+        farm = request.GET.get("farm")
+        if farm:
+            farm = get_object_or_404(Farm.objects.for_user(request.user), pk=farm) if farm.isdigit() else None
+            if farm is None:
+                return JsonResponse({"error": "Invalid farm."}, status=400)
+            series = ledger.farm_series(farm, currency, months)
+        else:
+            series = ledger.user_series(request.user, currency, months)
+        return JsonResponse({"farm": getattr(farm, "pk", None), "months": months, "series": series})
+
+
+# Search
+class SearchView(generic.TemplateView):
+    """
+    Global full-text search (see farm.search). `?q=` is the query, `?kind=` may
+    repeat to limit object types and `?page=` pages through the ranked results.
+    `?format=json` returns the same page as JSON for the header box.
+    """
+    template_name = "farm/search.html"
+    paginate_by = 20
+
+    def get_owner_id(self):
+        # Managers only find documents belonging to their own farms
+        user = self.request.user
+        if user.is_authenticated and user.role == "Manager":
+            return user.pk
+        return None
+
+    def get_results(self):
+        query = self.request.GET.get("q", "").strip()
+        kinds = [k for k in self.request.GET.getlist("kind") if k in search.KINDS]
+        try:
+            page = max(1, int(self.request.GET.get("page", 1)))
+        except ValueError:
+            page = 1
+        # One extra row tells us whether there is a next page without a COUNT
+        results = search.search(
+            query, owner_id=self.get_owner_id(), kinds=kinds,
+            limit=self.paginate_by + 1, offset=(page - 1) * self.paginate_by,
+        )
+        return query, kinds, page, results[:self.paginate_by], len(results) > self.paginate_by
+
+    def get(self, request, *args, **kwargs):
+        query, kinds, page, results, has_next = self.get_results()
+        if request.GET.get("format") == "json":
+            return JsonResponse({
+                "query": query, "page": page, "has_next": has_next,
+                "results": [
+                    {"kind": r.kind, "label": r.label, "id": r.object_id, "title": r.title,
+                     "snippet": str(r.snippet), "url": r.url}
+                    for r in results
+                ],
+            })
+        return self.render_to_response(self.get_context_data(
+            query=query, kinds=kinds, page=page, results=results, has_next=has_next,
+            kind_choices=search.KIND_LABELS.items(),
+        ))
+
+
 # FarmEmployeeStats views
-class FarmEmployeeStatsListView(generic.ListView):
+class FarmEmployeeStatsListView(CSVExportMixin, BulkActionMixin, CursorPaginationMixin, ScopedQuerysetMixin,
+                                RelatedListMixin, AsyncListView):
     model = FarmEmployeeStats
     template_name = "employees/index.html"
     context_object_name = "farm_employee_stats"
     paginate_by = 20
+    list_select_related = ("farm",)
+    cursor_ordering = ("-created", "-id")
+    cursor_approximate_total = 1000
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -241,59 +393,151 @@ class FarmEmployeeStatsListView(generic.ListView):
                 return qs
 
 
-class FarmEmployeeStatsDetailView(generic.DetailView):
+class FarmEmployeeStatsDetailView(ScopedQuerysetMixin, AsyncDetailView):
     model = FarmEmployeeStats
     template_name = "employees/detail.html"
     context_object_name = "stat"
 
 
-class FarmEmployeeStatsCreateView(generic.CreateView):
+class FarmEmployeeStatsCreateView(FarmChoiceMixin, generic.CreateView):
     model = FarmEmployeeStats
     form_class = FarmEmployeeStatsForm
     template_name = "employees/create.html"
     success_url = reverse_lazy("farm:farmemployeestats_list")
 
-    def get_form(self, form_class=None):
-        form = super().get_form(form_class)
-        user = self.request.user
-
-        # Filter farm options based on the logged-in user's role
-        if user.is_authenticated:
-            if user.role == "Manager":
-                form.fields["farm"].queryset = user.farms.all()
-            elif user.role == "Admin":
-                form.fields["farm"].queryset = Farm.objects.all()
-            else:
-                form.fields["farm"].queryset = Farm.objects.none()  # restrict others
-
-        return form
-
-
 
-class FarmEmployeeStatsUpdateView(generic.UpdateView):
+class FarmEmployeeStatsUpdateView(FarmChoiceMixin, ScopedQuerysetMixin, generic.UpdateView):
     model = FarmEmployeeStats
     form_class = FarmEmployeeStatsForm
     template_name = "employees/update.html"
     success_url = reverse_lazy("farm:farmemployeestats_list")
 
-    def get_form(self, form_class=None):
-        form = super().get_form(form_class)
-        user = self.request.user
 
-        # Filter farm options based on the logged-in user's role
-        if user.is_authenticated:
-            if user.role == "Manager":
-                form.fields["farm"].queryset = user.farms.all()
-            elif user.role == "Admin":
-                form.fields["farm"].queryset = Farm.objects.all()
-            else:
-                form.fields["farm"].queryset = Farm.objects.none()  # restrict others
+class FarmEmployeeStatsImportView(LoginRequiredMixin, FarmChoiceMixin, generic.FormView):
+    """Managers import returns for their own farms, `farm_editor_roles` for any farm."""
+    form_class = FarmEmployeeStatsImportForm
+    template_name = "employees/import.html"
 
-        return form
+    def dispatch(self, request, *args, **kwargs):
+        user = request.user
+        if user.is_authenticated and not (user.role == "Manager" or user.role in self.farm_editor_roles):
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
 
+    def form_valid(self, form):
+        upload = form.cleaned_data["file"]
+        if form.cleaned_data.get("background"):
+            return self.enqueue(upload)
+        try:
+            result = import_employee_stats(
+                upload, upload.name, farm_qs=self.get_farm_queryset(), created_by=self.request.user,
+            )
+        except ImportFileError as exc:
+            form.add_error("file", str(exc))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(form=form, result=result))
+
+    def get_farm_scope(self):
+        """The farm queryset rules (FarmChoiceMixin), in a JSON-serialisable form for the worker."""
+        return "owner" if self.request.user.role == "Manager" else "all"
+
+    def enqueue(self, upload):
+        # Keep the upload on disk for the worker; the job removes it when done
+        path = os.path.join(output_dir(), f"upload-{uuid.uuid4().hex}-{os.path.basename(upload.name)}")
+        with open(path, "wb") as fh:
+            for chunk in upload.chunks():
+                fh.write(chunk)
 
+        user = self.request.user
+        job = enqueue(
+            "farm.import_employee_stats", created_by=user,
+            path=path, filename=upload.name, scope=self.get_farm_scope(), user_id=user.pk,
+        )
+        return redirect("jobs:job_detail", pk=job.pk)
+
+
+class EmployeeStatsReportView(generic.TemplateView):
+    """Sector / employment type / national monthly totals, read from the rollup table."""
+    template_name = "employees/report.html"
+    levels = {
+        "national": {"sector": "", "employment_type": ""},
+        "sector": {"employment_type": ""},
+        "employment_type": {"sector": ""},
+    }
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        level = self.request.GET.get("by")
+        if level not in self.levels:
+            level = "national"
+        try:
+            months = max(1, min(int(self.request.GET.get("months", 12)), 120))
+        except ValueError:
+            months = 12
+
+        qs = EmployeeStatsRollup.objects.filter(**self.levels[level])
+        if level == "sector":
+            qs = qs.exclude(sector="")
+        elif level == "employment_type":
+            qs = qs.exclude(employment_type="")
+        recent = qs.order_by().values_list("month", flat=True).distinct().order_by("-month")[:months]
+        rows = qs.filter(month__in=list(recent)).order_by("-month", "sector", "employment_type")
+
+        ctx.update({"rows": rows, "level": level, "months": months, "levels": list(self.levels)})
+        return ctx
+
+    def post(self, request, *args, **kwargs):
+        # Admins can rebuild the rollups; the work runs on the job worker
+        if getattr(request.user, "role", None) != "Admin" and not request.user.is_staff:
+            return redirect("farm:farmemployeestats_report")
+        job = enqueue("farm.rebuild_rollups", created_by=request.user)
+        return redirect("jobs:job_detail", pk=job.pk)
+
+
+class ComplianceReportView(LoginRequiredMixin, generic.ListView):
+    """
+    Farms that filed no employee return for a month (farm.compliance), with
+    the number missing in each month of the window.
+    """
+    template_name = "employees/compliance.html"
+    context_object_name = "farms"
+    paginate_by = 50
+
+    def get(self, request, *args, **kwargs):
+        compliance.ensure_current()
+        self.form = ComplianceFilterForm(request.GET or None)
+        self.filters = self.form.cleaned_data if self.form.is_valid() else {}
+        month = self.filters.get("month")
+        self.month = compliance.month_of(month) if month else compliance.due_months()[-1]
+        return super().get(request, *args, **kwargs)
 
-class FarmEmployeeStatsDeleteView(generic.DeleteView):
+    def get_queryset(self):
+        return compliance.missing_farms(
+            self.request.user, self.month, employment_type=self.filters.get("employment_type"),
+            sector=self.filters.get("sector"), owner=self.filters.get("owner"),
+        ).select_related("owner").order_by("name", "pk")
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx.update({
+            "form": self.form,
+            "month": self.month,
+            "in_window": self.month in compliance.due_months(),
+            "month_counts": compliance.month_counts(
+                self.request.user, sector=self.filters.get("sector"), owner=self.filters.get("owner"),
+            ),
+        })
+        return ctx
+
+    def post(self, request, *args, **kwargs):
+        # Admins can rebuild the table; the work runs on the job worker
+        if getattr(request.user, "role", None) != "Admin" and not request.user.is_staff:
+            return redirect("farm:farmemployeestats_compliance")
+        job = enqueue("farm.rebuild_compliance", created_by=request.user)
+        return redirect("jobs:job_detail", pk=job.pk)
+
+
+class FarmEmployeeStatsDeleteView(ScopedQuerysetMixin, generic.DeleteView):
     model = FarmEmployeeStats
     template_name = "farm/farmemployeestats_confirm_delete.html"
     success_url = reverse_lazy("farm:farmemployeestats_list")
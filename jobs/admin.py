@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'progress', 'created_by', 'created', 'finished')
+    list_filter = ('status', 'name')
+    list_select_related = ('created_by',)
+    # A job's handler and arguments are fixed when it is queued; editing them would run other code on the worker
+    readonly_fields = ('name', 'kwargs', 'created', 'started', 'finished', 'updated')
+    ordering = ('-pk',)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Run the background job worker (no external broker needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2, help="Jobs to run in parallel (default: 2).")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds between queue polls when idle.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+        parser.add_argument(
+            "--requeue-stale", type=int, default=3600, metavar="SECONDS",
+            help="On start, requeue Running jobs without a heartbeat for this long (default: 3600, 0 disables).",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_stale"]:
+            requeued = requeue_stale(options["requeue_stale"])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale job(s)."))
+        self.stdout.write(f"Worker started with concurrency {options['concurrency']}.")
+        Worker(options["concurrency"], options["poll"]).run(once=options["once"])
+        self.stdout.write("Worker stopped.")
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+User = settings.AUTH_USER_MODEL
+
+
+class Job(models.Model):
+    """
+    A unit of background work, picked up by `manage.py run_jobs`.
+    `name` selects a handler registered with `jobs.registry.task`.
+    """
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    SUCCEEDED = "Succeeded"
+    FAILED = "Failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    output_file = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs")
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # the worker's claim query: oldest queued job first
+            models.Index(fields=["status", "id"], name="job_status_id_idx"),
+            models.Index(fields=["created_by", "-id"], name="job_owner_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    @property
+    def duration(self):
+        if self.started:
+            return (self.finished or timezone.now()) - self.started
+        return None
+
+    def set_progress(self, progress, message=""):
+        """Record progress (0-100) from inside a running handler."""
+        self.progress = max(0, min(int(progress), 100))
+        self.message = message[:255]
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress, message=self.message, updated=timezone.now()
+        )
@@ -0,0 +1,65 @@
+"""
+Job handler registry and the enqueue API.
+
+Handlers are plain functions taking the running Job as first argument plus the
+keyword arguments it was enqueued with (which must be JSON-serialisable):
+
+    @task("farm.rebuild_rollups")
+    def rebuild_rollups(job, months=None):
+        ...
+        return {"rows": 42}          # stored as job.result
+
+Call `job.set_progress(pct, message)` to report progress, and write large
+outputs under `output_path(job, filename)` so the status page can offer them.
+Raise TaskError to fail with a message for the user instead of a traceback.
+"""
+import os
+
+from django.conf import settings
+
+TASKS = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+class TaskError(Exception):
+    """A task failed in a way its user can act on; the message is recorded as the job's error."""
+
+
+def task(name):
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise UnknownTask(name)
+
+
+def enqueue(name, created_by=None, **kwargs):
+    """Queue `name` to run on a worker and return the Job."""
+    from jobs.models import Job
+
+    get_task(name)
+    return Job.objects.create(
+        name=name, kwargs=kwargs,
+        created_by=created_by if getattr(created_by, "is_authenticated", False) else None,
+    )
+
+
+def output_dir():
+    path = getattr(settings, "JOBS_OUTPUT_DIR", settings.BASE_DIR / "job_files")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def output_path(job, filename):
+    """Absolute path for a job output file; the basename is recorded on the job."""
+    job.output_file = f"{job.pk}-{os.path.basename(filename)}"
+    return os.path.join(output_dir(), job.output_file)
@@ -0,0 +1,104 @@
+import csv
+import os
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser as User
+from farm.models import Farm
+from farm.tasks import enqueue_export
+from jobs.models import Job
+from jobs.registry import enqueue, task
+from jobs.worker import Heartbeat, claim_next, requeue_stale, run_job
+
+
+@task("jobs.tests.fail")
+def fail(job):
+    raise RuntimeError("boom")
+
+
+class JobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x", role="Admin")
+        cls.manager = User.objects.create_user(username="manager", password="x", role="Manager")
+        for owner, name in ((cls.manager, "Mine"), (cls.admin, "Theirs"), (cls.manager, "Also mine")):
+            Farm.objects.create(name=name, owner=owner, address="1 Main Road", account_number="ACC-1", sector="Agro")
+
+    def setUp(self):
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+        settings = override_settings(JOBS_OUTPUT_DIR=self.output.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def read_output(self, job):
+        with open(os.path.join(self.output.name, job.output_file), newline="", encoding="utf-8") as fh:
+            return list(csv.reader(fh))
+
+    def test_export_runs_to_an_output_file(self):
+        queryset = Farm.objects.for_user(self.manager).order_by("-name")
+        job = enqueue_export(queryset, ["name", "owner"], created_by=self.manager)
+        # plain JSON arguments, never a pickled query: the scoped rows' pks in order, in a file
+        with open(os.path.join(self.output.name, job.kwargs["pks_file"])) as fh:
+            self.assertEqual(fh.read().split(), [str(pk) for pk in queryset.values_list("pk", flat=True)])
+
+        run_job(claim_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress), (Job.SUCCEEDED, {"rows": 2}, 100))
+        self.assertFalse(os.path.exists(os.path.join(self.output.name, job.kwargs["pks_file"])))
+        self.assertEqual(self.read_output(job), [["name", "owner"], ["Mine", "manager"], ["Also mine", "manager"]])
+
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse("jobs:job_download", args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_unfiltered_export_keeps_its_ordering(self):
+        job = enqueue_export(Farm.objects.order_by("name"), ["name"])
+        self.assertEqual((job.kwargs["pks_file"], job.kwargs["ordering"]), (None, ["name"]))
+        run_job(claim_next())
+        job.refresh_from_db()
+        self.assertEqual(self.read_output(job), [["name"], ["Also mine"], ["Mine"], ["Theirs"]])
+
+    def test_background_export_requires_login(self):
+        response = self.client.get(reverse("farm:farm_list"), {"export": "csv", "background": "1"})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Job.objects.exists())
+
+    def test_export_arguments_are_checked(self):
+        with self.assertRaises(ValueError):
+            enqueue_export(User.objects.all())
+        job = enqueue("farm.export_csv", model="accounts.CustomUser", fields=["password"])
+        run_job(claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertFalse(job.output_file)
+
+    def test_failure_is_recorded(self):
+        job = enqueue("jobs.tests.fail", created_by=self.admin)
+        run_job(claim_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn("RuntimeError: boom", job.error)
+        self.assertIsNotNone(job.finished)
+
+    def test_requeue_only_jobs_without_a_heartbeat(self):
+        stale, alive = enqueue("jobs.tests.fail"), enqueue("jobs.tests.fail")
+        claim_next(), claim_next()
+        Job.objects.filter(pk=stale.pk).update(updated=timezone.now() - timedelta(hours=2))
+        self.assertEqual(requeue_stale(3600), 1)
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, Job.QUEUED)
+        self.assertEqual(Job.objects.get(pk=alive.pk).status, Job.RUNNING)
+
+    def test_heartbeat_keeps_a_long_job_from_being_requeued(self):
+        job = enqueue("jobs.tests.fail")
+        claim_next()
+        Job.objects.filter(pk=job.pk).update(updated=timezone.now() - timedelta(hours=2))
+        Heartbeat(job.pk, 60).beat()
+        self.assertEqual(requeue_stale(3600), 0)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.RUNNING)
@@ -0,0 +1,50 @@
+import os
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import FileResponse, Http404, JsonResponse
+from django.views import generic
+
+from jobs.models import Job
+from jobs.registry import output_dir
+
+
+class JobScopeMixin(LoginRequiredMixin):
+    """Admins see every job; everyone else only the jobs they started."""
+
+    def get_queryset(self):
+        qs = Job.objects.select_related("created_by")
+        user = self.request.user
+        if not (user.is_staff or getattr(user, "role", None) == "Admin"):
+            qs = qs.filter(created_by=user)
+        return qs
+
+
+class JobListView(JobScopeMixin, generic.ListView):
+    template_name = "jobs/index.html"
+    context_object_name = "jobs"
+    paginate_by = 25
+    ordering = ("-id",)
+
+
+class JobDetailView(JobScopeMixin, generic.DetailView):
+    template_name = "jobs/detail.html"
+    context_object_name = "job"
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get("format") == "json":
+            job = self.object
+            return JsonResponse({
+                "id": job.pk, "name": job.name, "status": job.status, "progress": job.progress,
+                "message": job.message, "result": job.result, "finished": job.is_finished,
+                "has_output": bool(job.output_file),
+            })
+        return super().render_to_response(context, **response_kwargs)
+
+
+class JobDownloadView(JobScopeMixin, generic.DetailView):
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        path = os.path.join(output_dir(), job.output_file) if job.output_file else None
+        if job.status != Job.SUCCEEDED or not path or not os.path.exists(path):
+            raise Http404("No output for this job.")
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=job.output_file.split("-", 1)[-1])
@@ -0,0 +1,140 @@
+"""
+Local job worker: claims queued Job rows and runs them on a thread pool.
+
+Claiming is a conditional `UPDATE ... WHERE id = %s AND status = 'Queued'`, so any
+number of worker processes can share one database (SQLite or PostgreSQL)
+without an external broker; whoever updates the row first owns the job. While
+a job runs, a heartbeat thread touches its `updated` every
+JOBS_HEARTBEAT_SECONDS, so requeue_stale() only picks up jobs whose worker
+is gone, not long ones that never report progress.
+"""
+import signal
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import TaskError, get_task
+
+
+def claim_next():
+    """Atomically move the oldest queued job to Running and return it (or None)."""
+    while True:
+        pk = Job.objects.filter(status=Job.QUEUED).order_by("id").values_list("pk", flat=True).first()
+        if pk is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, started=now, updated=now, progress=0, attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+
+def heartbeat_interval():
+    return getattr(settings, "JOBS_HEARTBEAT_SECONDS", 60)
+
+
+class Heartbeat(threading.Thread):
+    """Touches a running job's `updated` every `interval` seconds until stopped."""
+
+    def __init__(self, job_pk, interval):
+        super().__init__(name=f"job-{job_pk}-heartbeat", daemon=True)
+        self.job_pk = job_pk
+        self.interval = interval
+        self.done = threading.Event()
+
+    def beat(self):
+        Job.objects.filter(pk=self.job_pk, status=Job.RUNNING).update(updated=timezone.now())
+
+    def run(self):
+        try:
+            while not self.done.wait(self.interval):
+                self.beat()
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+def run_job(job):
+    """Run one claimed job, recording its outcome on the row."""
+    LOGGER = settings.LOGGER
+    LOGGER.info("job {} ({}) started", job.pk, job.name)
+    heartbeat = Heartbeat(job.pk, heartbeat_interval())
+    heartbeat.start()
+    try:
+        result = get_task(job.name)(job, **job.kwargs)
+    except TaskError as exc:
+        job.status, job.error = Job.FAILED, str(exc)
+        LOGGER.info("job {} ({}) failed: {}", job.pk, job.name, exc)
+    except Exception:
+        job.status, job.error = Job.FAILED, traceback.format_exc()
+        LOGGER.exception("job {} ({}) failed", job.pk, job.name)
+    else:
+        job.status, job.result, job.progress = Job.SUCCEEDED, result, 100
+        LOGGER.info("job {} ({}) succeeded", job.pk, job.name)
+    finally:
+        heartbeat.stop()
+        job.finished = timezone.now()
+        Job.objects.filter(pk=job.pk).update(
+            status=job.status, result=job.result, error=job.error, progress=job.progress,
+            message=job.message, output_file=job.output_file, finished=job.finished, updated=job.finished,
+        )
+        close_old_connections()
+    return job
+
+
+def requeue_stale(seconds):
+    """
+    Put Running jobs whose heartbeat stopped `seconds` ago back in the queue
+    (their worker died). `seconds` must exceed JOBS_HEARTBEAT_SECONDS.
+    """
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    return Job.objects.filter(status=Job.RUNNING, updated__lt=cutoff).update(
+        status=Job.QUEUED, started=None, message="Requeued after worker loss",
+    )
+
+
+class Worker:
+    def __init__(self, concurrency=1, poll_interval=1.0):
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.slots = threading.Semaphore(self.concurrency)
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def _run(self, job):
+        try:
+            run_job(job)
+        finally:
+            self.slots.release()
+
+    def run(self, once=False):
+        """Process jobs until stopped; with once=True, exit when the queue is empty."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stopping.is_set():
+                self.slots.acquire()
+                job = claim_next()
+                if job is None:
+                    self.slots.release()
+                    if once:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                pool.submit(self._run, job)
+        close_old_connections()
@@ -0,0 +1,64 @@
+/*
+ * Searchable pickers (farm.autocomplete.AutocompleteSelect): each
+ * <select data-autocomplete="url"> gets a search box above it; typing fetches
+ * matching choices from the endpoint and lists them in the select, keeping
+ * the current choice.
+ */
+(function () {
+    "use strict";
+
+    function replaceOptions(select, results) {
+        var keep = Array.prototype.filter.call(select.options, function (option) {
+            return option.value === "" || option.selected;
+        });
+        select.innerHTML = "";
+        keep.forEach(function (option) { select.appendChild(option); });
+        results.forEach(function (item) {
+            if (String(item.id) === select.value) {
+                return;
+            }
+            var option = document.createElement("option");
+            option.value = item.id;
+            option.textContent = item.text;
+            select.appendChild(option);
+        });
+    }
+
+    function attach(select) {
+        var search = document.createElement("input");
+        var timer = null;
+        var latest = 0;
+        search.type = "search";
+        search.className = "form-control mb-1";
+        search.placeholder = "Type to search…";
+        search.setAttribute("autocomplete", "off");
+        select.parentNode.insertBefore(search, select);
+
+        function load() {
+            var ticket = ++latest;
+            var url = select.dataset.autocomplete + "?q=" + encodeURIComponent(search.value.trim());
+            fetch(url, {credentials: "same-origin", headers: {"Accept": "application/json"}})
+                .then(function (response) { return response.ok ? response.json() : {results: []}; })
+                .then(function (data) {
+                    // Ignore answers to queries the user has already typed past
+                    if (ticket === latest) {
+                        replaceOptions(select, data.results || []);
+                    }
+                });
+        }
+
+        search.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(load, 200);
+        });
+        search.addEventListener("focus", function () {
+            if (select.options.length <= 2) {
+                load();
+            }
+        }, {once: true});
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("select[data-autocomplete]").forEach(attach);
+    });
+})();
@@ -1,68 +1,296 @@
-const CACHE_NAME = 'gds-pwa-cache-v1';
+// Served from /service-worker.js (core.views.service_worker) so it controls the whole site.
+const VERSION = 'v2';
+const STATIC_CACHE = `gds-static-${VERSION}`;
+const PAGE_CACHE = `gds-pages-${VERSION}`;
+const MAX_STATIC_ENTRIES = 150;
+const MAX_PAGE_ENTRIES = 30;
+
+const SYNC_URL = '/api/v1/sync/';
+const OUTBOX_URL = '/api/v1/sync/sitevisits/';
+const OUTBOX_TAG = 'gds-outbox';
+const SYNC_RESOURCES = ['farms', 'sitevisits', 'notices'];
+
 const urlsToCache = [
-  '/',
-  '/static/css/styles.css',
-  '/static/js/main.js',
   '/static/images/favicon.png',
   '/static/images/logo-dark-small2x.png',
 ];
 
-// Install Event
-self.addEventListener('install', (event) => {
-  event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then((cache) => {
-        return cache.addAll(urlsToCache.map((url) => new Request(url, { cache: "reload" })));
-      })
-      .catch((error) => {
-        console.error('Failed to cache resources during installation:', error);
-        // Log each URL that fails to cache
-        urlsToCache.forEach((url) => {
-          fetch(url).catch((fetchError) => {
-            console.error(`Failed to fetch ${url}:`, fetchError);
-          });
-        });
-      })
-  );
-});
+// IndexedDB --------------------------------------------------------------------
+// outbox: queued SiteVisit writes; meta: the sync watermark; one store per
+// synced resource holding the local copy kept current by delta sync.
 
-// Fetch Event
-self.addEventListener('fetch', (event) => {
-  event.respondWith(
-    caches.match(event.request)
-      .then((response) => {
-        if (response) {
-          return response; // Return cached resource
+function openDb() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open('gds-sync', 1);
+    request.onupgradeneeded = () => {
+      const db = request.result;
+      db.createObjectStore('outbox', { keyPath: 'key', autoIncrement: true });
+      db.createObjectStore('meta');
+      SYNC_RESOURCES.forEach((name) => db.createObjectStore(name, { keyPath: 'id' }));
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function tx(db, stores, mode, work) {
+  return new Promise((resolve, reject) => {
+    const transaction = db.transaction(stores, mode);
+    const result = work(transaction);
+    transaction.oncomplete = () => resolve(result);
+    transaction.onerror = () => reject(transaction.error);
+  });
+}
+
+function getAll(store) {
+  return new Promise((resolve, reject) => {
+    const request = store.getAll();
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function getValue(store, key) {
+  return new Promise((resolve, reject) => {
+    const request = store.get(key);
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+// Outbox ------------------------------------------------------------------------
+
+async function queueOperations(operations, csrf) {
+  const db = await openDb();
+  await tx(db, ['outbox'], 'readwrite', (t) => {
+    operations.forEach((op) => t.objectStore('outbox').add({ ...op, csrf, queued: Date.now() }));
+  });
+  if (self.registration.sync) {
+    try {
+      await self.registration.sync.register(OUTBOX_TAG);
+    } catch (error) {
+      // Background Sync unavailable; pages trigger a flush when they come online
+    }
+  }
+}
+
+async function flushOutbox() {
+  const db = await openDb();
+  const queued = await tx(db, ['outbox'], 'readonly', (t) => getAll(t.objectStore('outbox')));
+  if (!queued.length) {
+    return [];
+  }
+
+  // Every queued write goes up in one request
+  const operations = queued.map(({ key, csrf, queued: _, ...op }) => op);
+  const response = await fetch(OUTBOX_URL, {
+    method: 'POST',
+    credentials: 'same-origin',
+    headers: { 'Content-Type': 'application/json', 'X-CSRFToken': queued[queued.length - 1].csrf },
+    body: JSON.stringify({ operations }),
+  });
+  if (!response.ok) {
+    throw new Error(`Outbox flush failed: ${response.status}`);
+  }
+  const { results } = await response.json();
+
+  // Keep only operations the server asked us to retry
+  await tx(db, ['outbox'], 'readwrite', (t) => {
+    results.forEach((result, i) => {
+      if (result.status !== 'retry') {
+        t.objectStore('outbox').delete(queued[i].key);
+      }
+    });
+  });
+  await notifyClients({ type: 'outbox-flushed', results });
+  return results;
+}
+
+function formToOperation(url, form) {
+  const data = Object.fromEntries(form.entries());
+  const csrf = data.csrfmiddlewaretoken;
+  delete data.csrfmiddlewaretoken;
+  const update = url.pathname.match(/^\/farm\/sitevisits\/(\d+)\/update\/$/);
+  const op = update
+    ? { op: 'update', id: Number(update[1]), client_id: self.crypto.randomUUID(), data }
+    : { op: 'create', client_id: self.crypto.randomUUID(), data };
+  return { op, csrf };
+}
+
+function isVisitForm(url) {
+  return /^\/farm\/sitevisits\/(create|\d+\/update)\/$/.test(url.pathname);
+}
+
+async function handleVisitForm(request, url) {
+  const copy = request.clone();
+  try {
+    return await fetch(request);
+  } catch (error) {
+    const { op, csrf } = formToOperation(url, await copy.formData());
+    await queueOperations([op], csrf);
+    return new Response(
+      '<!DOCTYPE html><meta name="viewport" content="width=device-width, initial-scale=1">' +
+      '<title>Saved offline</title><p>You are offline. The site visit was saved on this device ' +
+      'and will be sent automatically when you are back online.</p>' +
+      '<p><a href="/farm/sitevisits/">Back to site visits</a></p>',
+      { headers: { 'Content-Type': 'text/html; charset=utf-8' } },
+    );
+  }
+}
+
+async function handleOutboxPost(request) {
+  const copy = request.clone();
+  try {
+    return await fetch(request);
+  } catch (error) {
+    const { operations = [] } = await copy.json();
+    await queueOperations(operations, request.headers.get('X-CSRFToken'));
+    return new Response(JSON.stringify({ queued: operations.length }), {
+      status: 202, headers: { 'Content-Type': 'application/json' },
+    });
+  }
+}
+
+// Delta sync --------------------------------------------------------------------
+
+async function pullChanges() {
+  const db = await openDb();
+  let watermark = await tx(db, ['meta'], 'readonly', (t) => getValue(t.objectStore('meta'), 'watermark'));
+  let more = true;
+  while (more) {
+    const url = watermark ? `${SYNC_URL}?since=${encodeURIComponent(watermark)}` : SYNC_URL;
+    const response = await fetch(url, { credentials: 'same-origin' });
+    if (!response.ok) {
+      return;
+    }
+    const data = await response.json();
+    await tx(db, ['meta', ...SYNC_RESOURCES], 'readwrite', (t) => {
+      SYNC_RESOURCES.forEach((name) => {
+        const store = t.objectStore(name);
+        if (data.reset) {
+          store.clear();
         }
-        return fetch(event.request).then((networkResponse) => {
-          // Cache the new resource and return it
-          return caches.open(CACHE_NAME).then((cache) => {
-            if (event.request.url.startsWith('http')) {
-              cache.put(event.request, networkResponse.clone());
-            }
-            return networkResponse;
-          });
-        });
-      }).catch((error) => {
-        console.error('Failed to fetch resource:', error);
-        // Optionally, return a fallback page or resource here
-      })
+        (data.changes[name] || []).forEach((row) => store.put(row));
+        (data.deleted[name] || []).forEach((id) => store.delete(id));
+      });
+      t.objectStore('meta').put(data.watermark, 'watermark');
+    });
+    watermark = data.watermark;
+    more = data.more;
+  }
+  await notifyClients({ type: 'synced' });
+}
+
+async function syncAll(pull) {
+  await flushOutbox();
+  if (pull) {
+    await pullChanges();
+  }
+}
+
+async function notifyClients(message) {
+  const clients = await self.clients.matchAll();
+  clients.forEach((client) => client.postMessage(message));
+}
+
+// Caching -----------------------------------------------------------------------
+
+async function trimCache(name, maxEntries) {
+  const cache = await caches.open(name);
+  const keys = await cache.keys();
+  // keys() is in insertion order: drop the oldest
+  await Promise.all(keys.slice(0, Math.max(0, keys.length - maxEntries)).map((key) => cache.delete(key)));
+}
+
+async function cacheFirst(request) {
+  const cached = await caches.match(request);
+  if (cached) {
+    return cached;
+  }
+  const response = await fetch(request);
+  if (response.ok) {
+    const cache = await caches.open(STATIC_CACHE);
+    await cache.put(request, response.clone());
+    trimCache(STATIC_CACHE, MAX_STATIC_ENTRIES);
+  }
+  return response;
+}
+
+async function networkFirst(request) {
+  try {
+    const response = await fetch(request);
+    if (response.ok) {
+      const cache = await caches.open(PAGE_CACHE);
+      await cache.put(request, response.clone());
+      trimCache(PAGE_CACHE, MAX_PAGE_ENTRIES);
+    }
+    return response;
+  } catch (error) {
+    const cached = await caches.match(request);
+    if (cached) {
+      return cached;
+    }
+    return new Response('<!DOCTYPE html><title>Offline</title><p>You are offline and this page has not been saved yet.</p>', {
+      status: 503, headers: { 'Content-Type': 'text/html; charset=utf-8' },
+    });
+  }
+}
+
+// Events ------------------------------------------------------------------------
+
+self.addEventListener('install', (event) => {
+  event.waitUntil(
+    caches.open(STATIC_CACHE)
+      .then((cache) => cache.addAll(urlsToCache.map((url) => new Request(url, { cache: 'reload' }))))
+      .catch((error) => console.error('Failed to cache resources during installation:', error))
+      .then(() => self.skipWaiting())
   );
 });
 
-// Activate Event
 self.addEventListener('activate', (event) => {
-  const cacheWhitelist = [CACHE_NAME];
+  const keep = [STATIC_CACHE, PAGE_CACHE];
   event.waitUntil(
-    caches.keys().then((cacheNames) => {
-      return Promise.all(
-        cacheNames.map((cacheName) => {
-          if (cacheWhitelist.indexOf(cacheName) === -1) {
-            console.log(`Deleting old cache: ${cacheName}`);
-            return caches.delete(cacheName);
-          }
-        })
-      );
-    })
+    caches.keys()
+      .then((names) => Promise.all(names.filter((name) => !keep.includes(name)).map((name) => caches.delete(name))))
+      .then(() => self.clients.claim())
   );
 });
+
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (request.method === 'POST') {
+    if (url.pathname === OUTBOX_URL) {
+      event.respondWith(handleOutboxPost(request));
+    } else if (isVisitForm(url)) {
+      event.respondWith(handleVisitForm(request, url));
+    }
+    return;
+  }
+  if (request.method !== 'GET' || url.pathname.startsWith('/api/') || url.pathname.startsWith('/optimus/')) {
+    // API responses revalidate with ETags through the HTTP cache
+    return;
+  }
+
+  if (url.pathname.startsWith('/static/')) {
+    event.respondWith(cacheFirst(request));
+  } else if (request.mode === 'navigate') {
+    event.respondWith(networkFirst(request));
+  }
+});
+
+self.addEventListener('sync', (event) => {
+  if (event.tag === OUTBOX_TAG) {
+    event.waitUntil(syncAll(false));
+  }
+});
+
+self.addEventListener('message', (event) => {
+  if (event.data && event.data.type === 'sync') {
+    event.waitUntil(syncAll(event.data.pull).catch((error) => console.error('Sync failed:', error)));
+  }
+});